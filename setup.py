@@ -19,9 +19,13 @@
     url='https://github.com/mcieno/spotify-sort-by-release',
     package_dir={'spotify_sort_by_release': 'spotify_sort_by_release'},
     packages=['spotify_sort_by_release'],
+    python_requires='>=3.9',
     install_requires=[
         'requests',
     ],
+    extras_require={
+        'async': ['httpx'],
+    },
     entry_points={
         'console_scripts': [
             'spotify-sort-by-release = spotify_sort_by_release:main',
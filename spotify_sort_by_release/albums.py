@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+import concurrent.futures
+import json
+import requests
+import sys
+
+from . import cache
+from . import models
+from . import session
+
+
+# Maximum number of albums the "Get Several Albums" endpoint returns at once.
+MAX_ALBUMS = 20
+
+
+def get_albums(album_ids : list) -> dict:
+    '''Get the details of albums needed to sort their tracks.
+
+    Albums are read from the cache when possible. The others are requested
+    from the API, several at a time, and cached.
+
+
+    Parameters
+    ----------
+    album_ids : list
+        Identifiers of the albums. May hold repeated identifiers.
+
+
+    Returns
+    -------
+    dict
+        For each album found, by identifier, its name, the name of its first
+        artist, its release date and the precision of the release date.
+    '''
+    album_ids = list(dict.fromkeys(album_ids))
+    albums = cache.get_albums(album_ids)
+
+    missing = [album_id for album_id in album_ids if album_id not in albums]
+    batches = [missing[i:i + MAX_ALBUMS] for i in range(0, len(missing), MAX_ALBUMS)]
+
+    def get_batch(batch):
+        response = session.get(F"{session.API_URL}/albums",
+                               params={'ids': ','.join(batch)})
+        assert response.status_code is requests.codes.OK, response.text
+        return json.loads(response.text)['albums']
+
+    fetched = {}
+    if batches:
+        with concurrent.futures.ThreadPoolExecutor(session.workers) as executor:
+            for batch, found in zip(batches, executor.map(session.bind(get_batch), batches)):
+                for album_id, album in zip(batch, found):
+                    # Unknown albums are `null`.
+                    if album and album.get('release_date'):
+                        track = models.parse_track({'album': album})
+                        fetched[album_id] = [track.album, track.artist, track.release_date,
+                                             track.release_date_precision]
+
+    cache.put_albums(fetched)
+
+    return {**albums, **fetched}
+
+
+def enrich(tracks : list) -> list:
+    '''Fill in the release date of the tracks whose album lacks it, e.g.
+    because the API returned a partial album.
+
+    The albums of all such tracks are resolved at once, see `get_albums()`.
+    Tracks without an album, like local files and tracks removed from the
+    catalog, and tracks whose album cannot be found, are left unresolved, see
+    `models.is_resolved()`.
+
+
+    Parameters
+    ----------
+    tracks : list
+        List of tracks, as `models.Track`.
+
+
+    Returns
+    -------
+    list
+        The tracks, resolved where possible, in the same order.
+    '''
+    needed = [t.album_id for t in tracks if not models.is_resolved(t) and t.album_id]
+    if not needed:
+        return tracks
+
+    albums = get_albums(needed)
+
+    def resolved(t):
+        album = None if models.is_resolved(t) else albums.get(t.album_id)
+        if album is None:
+            return t
+
+        name, artist, release_date, precision = album
+        return t._replace(album=sys.intern(name), artist=sys.intern(artist),
+                          release_date=sys.intern(release_date),
+                          release_date_precision=sys.intern(precision))
+
+    return list(map(resolved, tracks))
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from . import cache
+from . import library
+from . import playlists
+from . import session
+from . import sorting
+from .spotify_sort_by_release import sort_library_by_release, sort_playlist_by_release
+
+
+# Runs that can be benchmarked: sorting the library, sorting a playlist into
+# a new one and sorting a playlist in-place.
+SCENARIOS = ('library', 'playlist', 'playlist-inplace')
+
+
+@contextlib.contextmanager
+def mock_server(size : int, scenario : str, args):
+    '''Run the mock API in a separate process, so that it does not affect
+    the time and memory measured for the client.
+
+
+    Parameters
+    ----------
+    size : int
+        Number of tracks of the library or playlist to sort.
+
+    scenario : str
+        Name of the scenario, from `SCENARIOS`.
+
+    args : Namespace
+        Namespace from `main`.
+
+
+    Yields
+    ------
+    str
+        Base URL of the mock API.
+    '''
+    command = [sys.executable, '-m', 'spotify_sort_by_release.mockapi',
+               '--seed', str(args.seed),
+               '--latency', str(args.latency),
+               '--throttle', str(args.throttle),
+               '--retry-after', '0']
+    if scenario == 'library':
+        command += ['--library', str(size)]
+    else:
+        command += ['--library', '0', '--playlist', str(size)]
+    if args.scramble:
+        command.append('--scramble')
+
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    try:
+        yield process.stdout.readline().strip()
+    finally:
+        process.terminate()
+        process.wait()
+
+
+@contextlib.contextmanager
+def scratch_directory():
+    '''Point the directory of the cache and of the journal, see
+    `cache.directory()`, to a temporary directory, so that benchmark runs
+    never touch the ones of the user, e.g. the journal of an interrupted sort.
+
+
+    Yields
+    ------
+    str
+        Path of the temporary directory.
+    '''
+    previous = os.environ.get('XDG_CACHE_HOME')
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['XDG_CACHE_HOME'] = directory
+        try:
+            yield directory
+        finally:
+            if previous is None:
+                del os.environ['XDG_CACHE_HOME']
+            else:
+                os.environ['XDG_CACHE_HOME'] = previous
+
+
+def mock_stats() -> dict:
+    '''Get the request counters of the mock API.'''
+    return json.loads(session.s.get(F"{session.API_URL}/mock/stats").text)
+
+
+def run(scenario : str, size : int, args) -> dict:
+    '''Benchmark a scenario against a fresh mock API.
+
+
+    Parameters
+    ----------
+    scenario : str
+        Name of the scenario, from `SCENARIOS`.
+
+    size : int
+        Number of tracks of the library or playlist to sort.
+
+    args : Namespace
+        Namespace from `main`.
+
+
+    Returns
+    -------
+    dict
+        Measurements: wall time in `seconds`, number of `requests` and of
+        `throttled` ones, `peak_memory` in bytes and whether the result is
+        `sorted`.
+    '''
+    with mock_server(size, scenario, args) as api_url, scratch_directory() as directory:
+        session.init('mock-token', max_workers=args.workers, api_url=api_url)
+        session.limiter = session.RateLimiter(rate=args.rate, max_rate=args.rate,
+                                              burst=args.rate)
+
+        job = argparse.Namespace(reversed=False, yes=True, backup=False,
+                                 secondary=list(sorting.DEFAULT_SECONDARY_KEYS),
+                                 inplace=scenario == 'playlist-inplace',
+                                 incremental=False,
+                                 journal=os.path.join(directory, 'library-journal.jsonl'),
+                                 name='Sorted', description='')
+        if scenario != 'library':
+            job.playlist = playlists.get_my_playlists()[0]
+
+        before = mock_stats()
+        tracemalloc.start()
+        started_at = time.perf_counter()
+
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            if scenario == 'library':
+                sort_library_by_release(job)
+            else:
+                sort_playlist_by_release(job)
+
+        seconds = time.perf_counter() - started_at
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        after = mock_stats()
+
+        # Check the outcome, outside of the measurements.
+        # Both the library and the playlists list the latest releases first.
+        if scenario == 'library':
+            tracks = library.get_tracks()
+        else:
+            destination = playlists.get_my_playlists()[-1]
+            tracks = playlists.get_playlist_tracks(destination['id'])
+        order = sorting.SortKeys(tracks, job.secondary).argsort(reverse=True)
+
+    return {
+        'scenario': scenario,
+        'tracks': size,
+        'seconds': round(seconds, 3),
+        'requests': after['requests'] - before['requests'],
+        'throttled': after['throttled'] - before['throttled'],
+        'peak_memory': peak_memory,
+        'sorted': list(order) == list(range(len(tracks))),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser('Benchmark against a mock Spotify Web API.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000],
+                        help='Numbers of tracks to sort')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS,
+                        default=['library', 'playlist'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.,
+                        help='Seconds every request is delayed by')
+    parser.add_argument('--throttle', type=float, default=0.,
+                        help='Probability for a request to be throttled')
+    parser.add_argument('--scramble', action='store_true', default=False,
+                        help='Scramble tracks added together')
+    parser.add_argument('--rate', type=float, default=1000.,
+                        help='Requests per second allowed to the client')
+    parser.add_argument('-w', '--workers', type=int, default=8,
+                        help='Maximum number of concurrent requests')
+    parser.add_argument('--json', type=str, default=None,
+                        help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    # Every run must start from the API, not from previous runs.
+    cache.enabled = False
+
+    results = []
+    print(F"{'scenario':18} {'tracks':>8} {'seconds':>9} {'requests':>9} "
+          F"{'throttled':>9} {'peak MiB':>9} {'sorted':>7}")
+    for scenario in args.scenarios:
+        for size in args.sizes:
+            result = run(scenario, size, args)
+            results.append(result)
+            print(F"{scenario:18} {size:8d} {result['seconds']:9.2f} "
+                  F"{result['requests']:9d} {result['throttled']:9d} "
+                  F"{result['peak_memory'] / 2 ** 20:9.1f} {str(result['sorted']):>7}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
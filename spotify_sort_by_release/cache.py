@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+import contextlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+from . import models
+
+
+# Set to `False` to neither read nor write the cache.
+enabled = True
+
+# Version of the layout of the database. Bump it whenever the tables or the
+# format of the cached data change.
+SCHEMA_VERSION = 4
+
+# Maximum size of the cached data, in bytes. Least recently used entries are
+# evicted first when it is exceeded.
+max_size = 64 * 1024 * 1024
+
+
+def directory() -> str:
+    '''Get the directory for cached and other local data.
+
+    It lives in the user cache directory: `$XDG_CACHE_HOME` if set, `~/.cache`
+    otherwise.
+
+
+    Returns
+    -------
+    str
+        Path of the directory.
+    '''
+    cache_home = os.environ.get('XDG_CACHE_HOME') \
+        or os.path.join(os.path.expanduser('~'), '.cache')
+
+    return os.path.join(cache_home, 'spotify-sort-by-release')
+
+
+def path() -> str:
+    '''Get the path of the cache database.
+
+
+    Returns
+    -------
+    str
+        Path of the cache database.
+    '''
+    return os.path.join(directory(), 'cache.sqlite3')
+
+
+@contextlib.contextmanager
+def connect():
+    '''Open the cache database, creating it if needed.
+
+    The database is emptied when it was written with a different
+    `SCHEMA_VERSION`, e.g. when `models.Track` gained new fields.
+    '''
+    os.makedirs(os.path.dirname(path()), exist_ok=True)
+
+    connection = sqlite3.connect(path(), timeout=30)
+    try:
+        with connection:
+            version, = connection.execute('PRAGMA user_version').fetchone()
+            if version != SCHEMA_VERSION:
+                connection.execute('DROP TABLE IF EXISTS playlist_tracks')
+                connection.execute('DROP TABLE IF EXISTS http_responses')
+                connection.execute('DROP TABLE IF EXISTS albums')
+                connection.execute(F"PRAGMA user_version = {SCHEMA_VERSION}")
+
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS playlist_tracks (
+                    playlist_id TEXT PRIMARY KEY,
+                    snapshot_id TEXT NOT NULL,
+                    tracks BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    accessed_at REAL NOT NULL
+                )''')
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS http_responses (
+                    key TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    body BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    accessed_at REAL NOT NULL
+                )''')
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS albums (
+                    album_id TEXT PRIMARY KEY,
+                    album TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    accessed_at REAL NOT NULL
+                )''')
+            yield connection
+    finally:
+        connection.close()
+
+
+def get_playlist_tracks(playlist_id : str, snapshot_id : str) -> list:
+    '''Get the cached tracks of a playlist.
+
+
+    Parameters
+    ----------
+    playlist_id : str
+        Identifier of the playlist.
+
+    snapshot_id : str
+        Snapshot of the playlist the tracks must belong to.
+
+
+    Returns
+    -------
+    list
+        The tracks, as `models.Track`, or `None` if the cache does not hold
+        the given snapshot.
+    '''
+    if not enabled or not snapshot_id:
+        return None
+
+    with connect() as connection:
+        row = connection.execute(
+            'SELECT tracks FROM playlist_tracks '
+            'WHERE playlist_id = ? AND snapshot_id = ?',
+            (playlist_id, snapshot_id)).fetchone()
+
+        if row is None:
+            return None
+
+        connection.execute(
+            'UPDATE playlist_tracks SET accessed_at = ? WHERE playlist_id = ?',
+            (time.time(), playlist_id))
+
+    return list(map(models.parse_row, json.loads(zlib.decompress(row[0]))))
+
+
+def get_latest_playlist_tracks(playlist_id : str) -> tuple:
+    '''Get the cached tracks of a playlist, whatever their snapshot.
+
+
+    Parameters
+    ----------
+    playlist_id : str
+        Identifier of the playlist.
+
+
+    Returns
+    -------
+    tuple
+        The snapshot ID and the tracks, as `models.Track`, or `(None, None)`
+        if the cache does not hold the playlist.
+    '''
+    if not enabled:
+        return None, None
+
+    with connect() as connection:
+        row = connection.execute(
+            'SELECT snapshot_id, tracks FROM playlist_tracks '
+            'WHERE playlist_id = ?', (playlist_id,)).fetchone()
+
+    if row is None:
+        return None, None
+
+    return row[0], list(map(models.parse_row, json.loads(zlib.decompress(row[1]))))
+
+
+def put_playlist_tracks(playlist_id : str, snapshot_id : str, tracks : list) -> None:
+    '''Cache the tracks of a playlist.
+
+
+    Parameters
+    ----------
+    playlist_id : str
+        Identifier of the playlist.
+
+    snapshot_id : str
+        Snapshot of the playlist the tracks belong to.
+
+    tracks : list
+        List of tracks, as `models.Track`.
+    '''
+    if not enabled or not snapshot_id:
+        return
+
+    # Tracks are named tuples, so they are stored as plain JSON arrays.
+    data = zlib.compress(json.dumps(tracks, separators=(',', ':')).encode())
+
+    with connect() as connection:
+        connection.execute(
+            'INSERT OR REPLACE INTO playlist_tracks '
+            'VALUES (?, ?, ?, ?, ?)',
+            (playlist_id, snapshot_id, data, len(data), time.time()))
+
+        evict(connection)
+
+
+def get_http_response(key : str) -> tuple:
+    '''Get a cached response to a GET request.
+
+
+    Parameters
+    ----------
+    key : str
+        Key of the request, see `httpcache.ResponseCache.key()`.
+
+
+    Returns
+    -------
+    tuple
+        The `ETag` and `Last-Modified` headers of the response and its body,
+        or `None` if the cache does not hold it.
+    '''
+    if not enabled:
+        return None
+
+    with connect() as connection:
+        row = connection.execute(
+            'SELECT etag, last_modified, body FROM http_responses WHERE key = ?',
+            (key,)).fetchone()
+
+        if row is None:
+            return None
+
+        connection.execute(
+            'UPDATE http_responses SET accessed_at = ? WHERE key = ?',
+            (time.time(), key))
+
+    return row[0], row[1], zlib.decompress(row[2])
+
+
+def put_http_response(key : str, etag : str, last_modified : str, body : bytes) -> None:
+    '''Cache a response to a GET request.
+
+
+    Parameters
+    ----------
+    key : str
+        Key of the request, see `httpcache.ResponseCache.key()`.
+
+    etag : str
+        `ETag` header of the response, if any.
+
+    last_modified : str
+        `Last-Modified` header of the response, if any.
+
+    body : bytes
+        Body of the response.
+    '''
+    if not enabled:
+        return
+
+    data = zlib.compress(body)
+
+    with connect() as connection:
+        connection.execute(
+            'INSERT OR REPLACE INTO http_responses VALUES (?, ?, ?, ?, ?, ?)',
+            (key, etag, last_modified, data, len(data), time.time()))
+
+        evict(connection)
+
+
+def get_albums(album_ids : list) -> dict:
+    '''Get cached details of albums.
+
+
+    Parameters
+    ----------
+    album_ids : list
+        Identifiers of the albums.
+
+
+    Returns
+    -------
+    dict
+        Details of the cached albums, by identifier, as stored by
+        `put_albums()`. Albums missing from the cache are left out.
+    '''
+    if not enabled or not album_ids:
+        return {}
+
+    albums = {}
+    with connect() as connection:
+        # Stay well below the maximum number of parameters of a query.
+        for i in range(0, len(album_ids), 500):
+            chunk = album_ids[i:i + 500]
+            rows = connection.execute(
+                F"SELECT album_id, album FROM albums "
+                F"WHERE album_id IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+            albums.update((album_id, json.loads(album)) for album_id, album in rows)
+
+        connection.executemany(
+            'UPDATE albums SET accessed_at = ? WHERE album_id = ?',
+            ((time.time(), album_id) for album_id in albums))
+
+    return albums
+
+
+def put_albums(albums : dict) -> None:
+    '''Cache details of albums. Release dates of albums do not change, so
+    they are kept until evicted.
+
+
+    Parameters
+    ----------
+    albums : dict
+        JSON-serializable details of albums, by identifier.
+    '''
+    if not enabled or not albums:
+        return
+
+    with connect() as connection:
+        rows = []
+        for album_id, album in albums.items():
+            data = json.dumps(album, separators=(',', ':'))
+            rows.append((album_id, data, len(data), time.time()))
+        connection.executemany('INSERT OR REPLACE INTO albums VALUES (?, ?, ?, ?)', rows)
+
+        evict(connection)
+
+
+def evict(connection : sqlite3.Connection) -> None:
+    '''Drop the least recently used entries until the cache fits `max_size`.
+
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        Connection to the cache database.
+    '''
+    total_size, = connection.execute(
+        'SELECT (SELECT COALESCE(SUM(size), 0) FROM playlist_tracks)'
+        ' + (SELECT COALESCE(SUM(size), 0) FROM http_responses)'
+        ' + (SELECT COALESCE(SUM(size), 0) FROM albums)').fetchone()
+
+    if total_size <= max_size:
+        return
+
+    rows = connection.execute(
+        "SELECT 'playlist_tracks', playlist_id, size, accessed_at FROM playlist_tracks "
+        "UNION ALL "
+        "SELECT 'http_responses', key, size, accessed_at FROM http_responses "
+        "UNION ALL "
+        "SELECT 'albums', album_id, size, accessed_at FROM albums "
+        "ORDER BY accessed_at").fetchall()
+
+    evicted = {'playlist_tracks': [], 'http_responses': [], 'albums': []}
+    for table, key, size, _ in rows:
+        if total_size <= max_size:
+            break
+        evicted[table].append((key,))
+        total_size -= size
+
+    connection.executemany(
+        'DELETE FROM playlist_tracks WHERE playlist_id = ?', evicted['playlist_tracks'])
+    connection.executemany(
+        'DELETE FROM http_responses WHERE key = ?', evicted['http_responses'])
+    connection.executemany(
+        'DELETE FROM albums WHERE album_id = ?', evicted['albums'])
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+import collections
+import hashlib
+import threading
+import typing
+import urllib.parse
+
+from . import cache
+
+
+class Entry(typing.NamedTuple):
+    '''A cached response, with the validators to revalidate it.'''
+    etag: str
+    last_modified: str
+    body: bytes
+
+
+class ResponseCache:
+    '''Responses to GET requests, along with their `ETag` and `Last-Modified`
+    headers, so that repeated requests can be made conditional and answered
+    with `304 Not Modified` when nothing changed.
+
+    Entries are kept in memory, the least recently used ones being dropped
+    beyond `max_size` bytes. If `disk` is set, they are also written to the
+    cache database, see `cache.put_http_response()`, and read back from it
+    when missing from memory.
+
+
+    Parameters
+    ----------
+    max_size : int
+        Maximum size of the bodies kept in memory, in bytes.
+
+    disk : bool
+        If `True`, also keep responses on disk.
+    '''
+
+    def __init__(self, max_size : int = 16 * 1024 * 1024, disk : bool = False):
+        self.max_size = max_size
+        self.disk = disk
+
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url : str, params : dict = None, authorization : str = '') -> str:
+        '''Make the key of a request.
+
+        Responses depend on the user, so the key includes a digest of the
+        credentials, but not the credentials themselves.
+
+
+        Parameters
+        ----------
+        url : str
+            URL of the request.
+
+        params : dict
+            Optional query parameters, in addition to the ones in the URL.
+
+        authorization : str
+            The `Authorization` header of the request.
+
+
+        Returns
+        -------
+        str
+            The key.
+        '''
+        if params:
+            separator = '&' if urllib.parse.urlsplit(url).query else '?'
+            url += separator + urllib.parse.urlencode(
+                {key: value for key, value in params.items() if value is not None})
+
+        user = hashlib.sha256(authorization.encode()).hexdigest()[:16]
+
+        return F"{user} {url}"
+
+    def get(self, key : str) -> Entry:
+        '''Get a cached response.
+
+
+        Parameters
+        ----------
+        key : str
+            Key of the request, see `key()`.
+
+
+        Returns
+        -------
+        Entry
+            The response, or `None` if it is not cached.
+        '''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        if not self.disk:
+            return None
+
+        row = cache.get_http_response(key)
+        if row is None:
+            return None
+
+        entry = Entry(*row)
+        self._remember(key, entry)
+
+        return entry
+
+    def put(self, key : str, entry : Entry) -> None:
+        '''Cache a response.
+
+
+        Parameters
+        ----------
+        key : str
+            Key of the request, see `key()`.
+
+        entry : Entry
+            The response.
+        '''
+        self._remember(key, entry)
+
+        if self.disk:
+            cache.put_http_response(key, *entry)
+
+    def _remember(self, key : str, entry : Entry) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous.body)
+
+            self._entries[key] = entry
+            self._size += len(entry.body)
+
+            while self._size > self.max_size:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.body)
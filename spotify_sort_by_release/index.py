@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+import contextlib
+import datetime
+import json
+import os
+import sqlite3
+
+from . import albums
+from . import cache
+from . import library
+from . import models
+from . import playlists
+from . import sorting
+
+
+# Version of the layout of the index. Bump it whenever the tables or the
+# format of the indexed data change.
+SCHEMA_VERSION = 1
+
+# Source of the tracks of the library. Other sources are playlist IDs.
+LIBRARY = 'library'
+
+
+def path() -> str:
+    '''Get the path of the release index database, next to the cache.'''
+    return os.path.join(cache.directory(), 'index.sqlite3')
+
+
+@contextlib.contextmanager
+def connect():
+    '''Open the release index, creating it if needed.
+
+    Tracks are indexed by source and release date, as returned by
+    `sorting.release_date_ordinal()`, so that the tracks released within a
+    range are found with a single search in the B-tree of the index, followed
+    by a scan of the matching rows only.
+    '''
+    os.makedirs(os.path.dirname(path()), exist_ok=True)
+
+    connection = sqlite3.connect(path(), timeout=30)
+    try:
+        with connection:
+            version, = connection.execute('PRAGMA user_version').fetchone()
+            if version != SCHEMA_VERSION:
+                connection.execute('DROP TABLE IF EXISTS tracks')
+                connection.execute('DROP TABLE IF EXISTS sources')
+                connection.execute(F"PRAGMA user_version = {SCHEMA_VERSION}")
+
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS tracks (
+                    source TEXT NOT NULL,
+                    uri TEXT NOT NULL,
+                    released INTEGER NOT NULL,
+                    track TEXT NOT NULL,
+                    PRIMARY KEY (source, uri)
+                )''')
+            connection.execute('''
+                CREATE INDEX IF NOT EXISTS tracks_by_release
+                ON tracks (source, released)''')
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS sources (
+                    source TEXT PRIMARY KEY,
+                    version TEXT NOT NULL
+                )''')
+            yield connection
+    finally:
+        connection.close()
+
+
+def update_library() -> int:
+    '''Bring the index of the library up to date.
+
+    The library lists the most recently saved tracks first, so only the
+    tracks saved since the last update are fetched, until reaching the most
+    recent one already indexed. If the library then holds more or fewer
+    tracks than indexed, e.g. because some were removed, it is indexed again
+    from scratch.
+
+
+    Returns
+    -------
+    int
+        Number of tracks fetched.
+    '''
+    signature = list(library.get_signature())
+
+    with connect() as connection:
+        row = connection.execute('SELECT version FROM sources WHERE source = ?',
+                                 (LIBRARY,)).fetchone()
+    if row is not None and json.loads(row[0]) == signature:
+        return 0
+
+    total, _, _ = signature
+    if row is not None:
+        _, latest_added_at, latest_uri = json.loads(row[0])
+        latest = (library.parse_timestamp(latest_added_at), latest_uri) \
+            if latest_uri else None
+
+        added = []
+        for added_at, track in library.iter_tracks(added_at=True):
+            if latest is None or (added_at, track.uri) == latest or added_at < latest[0]:
+                break
+            added.append(track)
+
+        with connect() as connection:
+            _put(connection, LIBRARY, albums.enrich(added))
+            count, = connection.execute('SELECT COUNT(*) FROM tracks WHERE source = ?',
+                                        (LIBRARY,)).fetchone()
+            if count == total:
+                _set_version(connection, LIBRARY, signature)
+                return len(added)
+
+    tracks = albums.enrich(library.get_tracks())
+    with connect() as connection:
+        _replace(connection, LIBRARY, tracks)
+        _set_version(connection, LIBRARY, signature)
+
+    return len(tracks)
+
+
+def update_playlist(playlist : dict) -> int:
+    '''Bring the index of a playlist up to date.
+
+    Nothing is fetched if the snapshot of the playlist did not change since
+    the last update. Otherwise, the tracks are fetched, only the appended
+    ones if possible, see `playlists.get_appended_playlist_tracks()`.
+
+
+    Parameters
+    ----------
+    playlist : dict
+        The playlist, as per the Spotify Web API documentation. Must include
+        its snapshot ID and number of tracks.
+
+
+    Returns
+    -------
+    int
+        Number of tracks indexed, 0 if the index already was up to date.
+    '''
+    with connect() as connection:
+        row = connection.execute('SELECT version FROM sources WHERE source = ?',
+                                 (playlist['id'],)).fetchone()
+    if row is not None and json.loads(row[0]) == playlist['snapshot_id']:
+        return 0
+
+    tracks = albums.enrich(playlists.get_appended_playlist_tracks(playlist))
+    with connect() as connection:
+        _replace(connection, playlist['id'], tracks)
+        _set_version(connection, playlist['id'], playlist['snapshot_id'])
+
+    return len(tracks)
+
+
+def get_tracks(sources : list, start : int, end : int) -> list:
+    '''Get the indexed tracks released within a range.
+
+
+    Parameters
+    ----------
+    sources : list
+        `LIBRARY` and identifiers of playlists to get tracks from.
+
+    start : int
+        First release date of the range, included, see `date_bound()`.
+
+    end : int
+        Last release date of the range, included, see `date_bound()`.
+
+
+    Returns
+    -------
+    list
+        Tracks, as `models.Track`, from the earliest to the latest release
+        within each source. Tracks found in more than one source are only
+        listed once.
+    '''
+    tracks = {}
+    with connect() as connection:
+        for source in sources:
+            for row, in connection.execute(
+                    'SELECT track FROM tracks WHERE source = ? '
+                    'AND released BETWEEN ? AND ? ORDER BY released',
+                    (source, start, end)):
+                track = models.parse_row(json.loads(row))
+                tracks.setdefault(track.uri, track)
+
+    return list(tracks.values())
+
+
+def date_bound(date : str, upper : bool = False) -> int:
+    '''Convert a date into a bound of a range of release dates.
+
+
+    Parameters
+    ----------
+    date : str
+        Date, as `YYYY`, `YYYY-MM` or `YYYY-MM-DD`.
+
+    upper : bool
+        If `True`, the bound includes the whole year or month of dates known
+        to the year or to the month only. Otherwise, it includes their first
+        day.
+
+
+    Returns
+    -------
+    int
+        The bound, comparable with `sorting.release_date_ordinal()`.
+    '''
+    precision = models.PRECISIONS[date.count('-')]
+    # Validate the date, whatever its precision.
+    datetime.date(*(list(map(int, date.split('-'))) + [1, 1])[:3])
+
+    bound = sorting.release_date_ordinal(date, precision)
+    if upper and precision != 'day':
+        bound += 99 if precision == 'month' else 9999
+
+    return bound
+
+
+def _put(connection : sqlite3.Connection, source : str, tracks : list) -> None:
+    # Index tracks of a source.
+    connection.executemany(
+        'INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?)',
+        ((source, t.uri,
+          sorting.release_date_ordinal(t.release_date, t.release_date_precision),
+          json.dumps(t, separators=(',', ':')))
+         for t in tracks))
+
+
+def _replace(connection : sqlite3.Connection, source : str, tracks : list) -> None:
+    # Index all the tracks of a source, dropping the ones indexed before.
+    connection.execute('DELETE FROM tracks WHERE source = ?', (source,))
+    _put(connection, source, tracks)
+
+
+def _set_version(connection : sqlite3.Connection, source : str, version) -> None:
+    # Record what the indexed tracks of a source are up to date with.
+    connection.execute('INSERT OR REPLACE INTO sources VALUES (?, ?)',
+                       (source, json.dumps(version)))
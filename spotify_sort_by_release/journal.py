@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+import json
+import os
+import tempfile
+
+from . import cache
+from . import models
+
+
+class Unfinished(FileExistsError):
+    '''Raised when starting a library sort while the journal of an interrupted
+    one is still there: starting afresh would read a library missing the
+    tracks it deleted and did not save back yet, and lose them.'''
+
+    def __init__(self, path : str):
+        super().__init__(F"An interrupted library sort must be resumed first, "
+                         F"its journal is at {path}")
+
+
+def default_path() -> str:
+    '''Get the path of the journal of the library sort, next to the cache.'''
+    return os.path.join(cache.directory(), 'library-journal.jsonl')
+
+
+class Journal:
+    '''Write-ahead log of a library sort, from which an interrupted sort can
+    be resumed.
+
+    The first line holds the plan: the tracks in their target order and the
+    timestamps they are saved at. Every following line records a batch of
+    tracks deleted from or saved to the library, written once the API
+    confirmed it. Lines are flushed to disk before moving on, so that a crash
+    loses at most the batch being sent, which is then sent again on resume.
+
+
+    Parameters
+    ----------
+    path : str
+        Path of the journal file.
+
+    tracks : list
+        Tracks, as `models.Track`, in the order they are to be saved.
+
+    timestamps : list
+        For each track, when it should appear to have been added to the
+        library.
+
+    done : dict
+        Indices of the batches already done, by step: `'delete'` or `'save'`.
+    '''
+
+    def __init__(self, path : str, tracks : list, timestamps : list, done : dict = None):
+        self.path = path
+        self.tracks = tracks
+        self.timestamps = timestamps
+        self.done = done or {'delete': set(), 'save': set()}
+        self._file = None
+
+    @classmethod
+    def create(cls, path : str, tracks : list, timestamps : list) -> 'Journal':
+        '''Start a new journal.
+
+        The plan is written to a temporary file first and then linked into
+        place, so that a journal always holds a complete plan, and an existing
+        journal is never replaced: it is only ever removed by `finish()`.
+
+
+        Parameters
+        ----------
+        path : str
+            Path of the journal file.
+
+        tracks : list
+            Tracks, as `models.Track`, in the order they are to be saved.
+
+        timestamps : list
+            For each track, when it should appear to have been added.
+
+
+        Returns
+        -------
+        Journal
+            The journal, ready to record batches.
+
+
+        Raises
+        ------
+        Unfinished
+            If there already is a journal, i.e. a sort to resume first.
+        '''
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        journal = cls(path, tracks, timestamps)
+        journal._file = tempfile.NamedTemporaryFile('w', dir=directory, delete=False)
+        try:
+            journal._write({'tracks': [list(t) for t in tracks],
+                            'timestamps': timestamps})
+            journal._file.close()
+            os.link(journal._file.name, path)
+        except FileExistsError:
+            raise Unfinished(path) from None
+        finally:
+            journal._file.close()
+            os.remove(journal._file.name)
+
+        journal._file = open(path, 'a')
+
+        return journal
+
+    @classmethod
+    def load(cls, path : str) -> 'Journal':
+        '''Open an existing journal to resume from it.
+
+        A last line torn by a crash while writing it is dropped from the file,
+        so that the next batch recorded starts on a line of its own.
+
+
+        Parameters
+        ----------
+        path : str
+            Path of the journal file.
+
+
+        Returns
+        -------
+        Journal
+            The journal, with the batches already done.
+
+
+        Raises
+        ------
+        FileNotFoundError
+            If there is no journal, i.e. no sort to resume.
+
+        ValueError
+            If the plan cannot be read, i.e. the sort was interrupted before
+            changing anything.
+        '''
+        with open(path, 'rb') as f:
+            lines = f.read().split(b'\n')
+
+        if len(lines) < 2:
+            raise ValueError(F"Torn plan in {path}")
+
+        plan = json.loads(lines[0])
+        journal = cls(path, list(map(models.parse_row, plan['tracks'])),
+                      plan['timestamps'])
+
+        # Length of the complete lines, the last one being the empty string
+        # after the final newline.
+        length = len(lines[0]) + 1
+        for line in lines[1:-1]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Last line, torn by a crash while writing it.
+                break
+            journal.done[entry['step']].add(entry['batch'])
+            length += len(line) + 1
+
+        os.truncate(path, length)
+        journal._file = open(path, 'a')
+
+        return journal
+
+    def record(self, step : str, batch : int) -> None:
+        '''Record that a batch was confirmed by the API.
+
+
+        Parameters
+        ----------
+        step : str
+            `'delete'` or `'save'`.
+
+        batch : int
+            Index of the batch.
+        '''
+        self.done[step].add(batch)
+        self._write({'step': step, 'batch': batch})
+
+    def finish(self) -> None:
+        '''Close and remove the journal, once the sort is complete.'''
+        self._file.close()
+        os.remove(self.path)
+
+    def _write(self, entry : dict) -> None:
+        self._file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
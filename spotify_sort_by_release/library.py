@@ -1,104 +1,380 @@
 #!/usr/bin/env python3
 # -*- coding: utf8 -*-
+import asyncio
+import datetime
 import json
 import requests
 import time
 
+from . import models
 from . import session
 
 
-def get_tracks() -> list:
+# Seconds between the times tracks are saved at, leaving room to later save
+# other tracks between them without moving them.
+TIMESTAMP_SPACING = 60
+
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+# Number of tracks the API saves or deletes at once.
+MAX_TRACKS = 50
+
+
+def get_tracks(added_at: bool = False) -> list:
     '''Get user library (saved tracks).
 
 
+    Parameters
+    ----------
+    added_at : bool
+        If `True`, also get when every track was saved.
+
+
     Returns
     -------
     list
-        List of tracks. Each track is a dictionary as per the Spotify Web API documentation.
+        List of tracks, as `models.Track`, the most recently saved first. If
+        `added_at` is set, list of `(seconds since the epoch, track)` pairs.
+    '''
+
+    # We use the same approach used in `playlists.get_my_playlists()` to make
+    # sure we retrieve all the tracks. This endpoint does not support the
+    # `fields` parameter, so tracks are made compact as soon as they arrive.
+    return session.get_paged(**_tracks_pages(added_at))
+
+
+def iter_tracks(added_at: bool = False):
+    '''Get user library as needed, one page at a time, the most recently
+    saved tracks first. See `get_tracks()`.
     '''
+    return session.iter_paged(**_tracks_pages(added_at))
+
+
+def _tracks_pages(added_at: bool) -> dict:
+    # Arguments of `session.get_paged()` to get the library, see `get_tracks()`.
+    if added_at:
+        parse = lambda i: (parse_timestamp(i['added_at']), models.parse_track(i['track']))
+    else:
+        parse = lambda i: models.parse_track(i['track'])
+
+    return {'url': F"{session.API_URL}/me/tracks", 'limit': 50, 'parse': parse}
+
+
+def get_signature() -> tuple:
+    '''Cheaply tell whether the library changed, by getting its size and its
+    most recently saved track.
+
+
+    Returns
+    -------
+    tuple
+        Number of tracks, and time and URI of the most recently saved one.
+        Any save or deletion changes it, except for deleting and saving back
+        the most recent track at the same time.
+    '''
+    response = session.get(F"{session.API_URL}/me/tracks", params={'limit': 1})
+    assert response.status_code is requests.codes.OK, response.text
+
+    page = json.loads(response.text)
+    latest = page['items'][0] if page['items'] else {'added_at': None, 'track': {'uri': None}}
+
+    return page['total'], latest['added_at'], latest['track']['uri']
 
-    all_tracks = []
 
-    # We use the same approach used in `get_my_playlists()` to make sure we
-    # retrieve all the playlists.
-    next_url = F"https://api.spotify.com/v1/me/tracks"
+def parse_timestamp(timestamp: str) -> int:
+    '''Convert an ISO 8601 UTC timestamp, as used by the API, into seconds
+    since the epoch.'''
+    return int(datetime.datetime.strptime(timestamp, TIMESTAMP_FORMAT).replace(
+        tzinfo=datetime.timezone.utc).timestamp())
 
-    while next_url:
-        response = session.s.get(next_url)
-        assert response.status_code is requests.codes.OK, response.text
 
-        response_json = json.loads(response.text)
+def format_timestamp(seconds: int) -> str:
+    '''Convert seconds since the epoch into an ISO 8601 UTC timestamp, as
+    used by the API.'''
+    return datetime.datetime.fromtimestamp(
+        seconds, datetime.timezone.utc).strftime(TIMESTAMP_FORMAT)
 
-        all_tracks.extend(map(lambda i: i['track'], response_json['items']))
-        next_url = response_json['next']
 
-    return all_tracks
+def make_timestamps(count: int) -> list:
+    '''Make timestamps to save tracks at, `TIMESTAMP_SPACING` apart, the
+    last one being right now.
 
 
-def save_tracks(tracks: list, threshold: int = 3) -> None:
+    Parameters
+    ----------
+    count : int
+        Number of timestamps.
+
+
+    Returns
+    -------
+    list
+        Timestamps, as ISO 8601 UTC strings, from the oldest to the latest.
+    '''
+    now = int(time.time())
+
+    return [format_timestamp(now - (count - 1 - i) * TIMESTAMP_SPACING)
+            for i in range(count)]
+
+
+def save_tracks(tracks: list, verify: bool = True, timestamps: list = None,
+                done_batches: set = (), on_batch=None) -> None:
     '''Save given Tracks to the library.
 
+    Tracks are saved in batches of the maximum size the API allows, each with
+    an explicit timestamp so that they are ordered as given: the last track
+    will be the most recently added. Tracks without a URI are left out, and
+    tracks given the same timestamp are saved a second apart, so that their
+    order does not depend on the API. If `verify` is set, the library is read
+    back and the batches that did not end up in the given order are saved
+    again, one track at a time.
+
 
     Parameters
     ----------
     tracks : list
-        List of Tracks, as per the Spotify Web API documentation.
+        List of tracks, as `models.Track`.
 
-    threshold : int
-        Maximum number of tracks to put at once. Order may not be preserved
-        among these tracks, so the greater the value, the more tracks will be
-        scrambled. Defaults to 3. Must not be greater than 100.
-    '''
+    verify : bool
+        If `True`, make sure the tracks were saved in the given order.
+        Defaults to `True`.
+
+    timestamps : list
+        Optional. For each track, when it should appear to have been added to
+        the library, from the oldest to the latest. Defaults to
+        `make_timestamps(len(tracks))`.
+
+    done_batches : set
+        Optional. Indices of the batches already saved, to be skipped.
 
-    tracks_uris = list(map(lambda t: t['uri'].split(':')[-1], tracks))
+    on_batch : callable
+        Optional. Called with the index of every batch once it is saved.
+
+
+    Raises
+    ------
+    AssertionError
+        If some tracks are still not in the given order once saved again.
+    '''
 
-    # Ensure the threshold is in the correct range
-    assert 1 <= threshold <= 100, F"Bad threshold value: {threshold}"
+    tracks, timestamps = _saved_tracks(tracks, timestamps)
+    tracks_ids = _ids(tracks)
 
     # Cannot add all tracks at once, so make multiple API calls.
-    MAX_TRACKS = int(threshold)
-    for i in range(0, len(tracks_uris), MAX_TRACKS):
+    for batch, request in enumerate(_save_requests(tracks_ids, timestamps)):
+        if batch in done_batches:
+            continue
+
+        _print_progress('Saving', batch * MAX_TRACKS, len(tracks_ids))
+        _check(session.request(**request))
+
+        if on_batch:
+            on_batch(batch)
+
+    if not verify:
+        return
+
+    misplaced = _misplaced_batches(tracks_ids, get_tracks(), MAX_TRACKS)
+    for i in misplaced:
+        _print_progress('Repairing', i, len(tracks_ids))
+
+        delete_tracks(tracks[i:i + MAX_TRACKS])
+        for request in _save_requests(tracks_ids[i:i + MAX_TRACKS],
+                                      timestamps[i:i + MAX_TRACKS], size=1):
+            _check(session.request(**request))
+
+    if misplaced:
+        _check_repaired(tracks_ids, get_tracks())
 
-        print(F'[*] Saving tracks {i + 1} to {i + MAX_TRACKS} of {len(tracks_uris)}',
-              end='    \r')
 
-        uris_chunk = tracks_uris[i:i + MAX_TRACKS]
-        response = session.s.put(
-            F"https://api.spotify.com/v1/me/tracks",
-            data=json.dumps({'ids': uris_chunk}))
+def _print_progress(action : str, i : int, count : int) -> None:
+    # Tell which batch of tracks is being sent, by its position.
+    print(F'[*] {action} tracks {i + 1} to {i + MAX_TRACKS} of {count}',
+          end='    \r')
 
-        assert response.status_code is requests.codes.OK, response.text
 
+def _check(response) -> None:
+    # Make sure a request succeeded.
+    assert response.status_code is requests.codes.OK, response.text
 
-        time.sleep(.5)  # No DoS
 
+def _ids(tracks: list) -> list:
+    # Identifiers of the tracks, leaving out the ones without a URI, like
+    # tracks removed from the catalog.
+    return [t.uri.split(':')[-1] for t in tracks if t.uri is not None]
 
-def delete_tracks(tracks: list) -> None:
+
+def _saved_tracks(tracks: list, timestamps: list) -> tuple:
+    # The tracks that can be saved, those with a URI, and their timestamps,
+    # strictly increasing, see `save_tracks()`.
+    kept = [i for i, t in enumerate(tracks) if t.uri is not None]
+
+    if timestamps is None:
+        return [tracks[i] for i in kept], make_timestamps(len(kept))
+
+    increasing = []
+    previous = None
+    for i in kept:
+        seconds = parse_timestamp(timestamps[i])
+        if previous is not None and seconds <= previous:
+            seconds = previous + 1
+        increasing.append(format_timestamp(seconds))
+        previous = seconds
+
+    return [tracks[i] for i in kept], increasing
+
+
+def _misplaced_batches(tracks_ids: list, library_tracks: list, size: int) -> list:
+    # Positions of the batches of saved tracks that are not in the library in
+    # the order they were saved in.
+
+    # The library lists the most recently added tracks first. Other tracks
+    # may have been saved in between the given ones, so leave them out.
+    saved_ids = set(tracks_ids)
+    library_ids = [id for id in _ids(library_tracks) if id in saved_ids]
+    library_ids.reverse()
+
+    return [i for i in range(0, len(tracks_ids), size)
+            if library_ids[i:i + size] != tracks_ids[i:i + size]]
+
+
+def _check_repaired(tracks_ids: list, library_tracks: list) -> None:
+    # Make sure the tracks saved again ended up in the given order.
+    misplaced = _misplaced_batches(tracks_ids, library_tracks, MAX_TRACKS)
+    assert not misplaced, \
+        F"Tracks {misplaced[0] + 1} to {misplaced[0] + MAX_TRACKS} could not " \
+        F"be saved in order"
+
+
+def _save_requests(ids: list, timestamps: list, size: int = MAX_TRACKS) -> list:
+    '''Arguments of `session.request()` to save tracks to the library at the
+    given times, in batches.
+
+
+    Parameters
+    ----------
+    ids : list
+        Identifiers of the tracks.
+
+    timestamps : list
+        For each track, when it should appear to have been added to the
+        library, as an ISO 8601 UTC string.
+
+    size : int
+        Number of tracks saved by every request. At most 50.
+    '''
+    return [{'method': 'PUT',
+             'url': F"{session.API_URL}/me/tracks",
+             'data': json.dumps({'timestamped_ids': [
+                 {'id': id, 'added_at': timestamp}
+                 for id, timestamp in zip(ids[i:i + size], timestamps[i:i + size])]})}
+            for i in range(0, len(ids), size)]
+
+
+def delete_tracks(tracks: list, done_batches: set = (), on_batch=None) -> None:
     '''Delete all occurrences of given Tracks from the library.
 
 
     Parameters
     ----------
     tracks : list
-        List of Tracks, as per the Spotify Web API documentation.
+        List of tracks, as `models.Track`.
+
+    done_batches : set
+        Optional. Indices of the batches already deleted, to be skipped.
+
+    on_batch : callable
+        Optional. Called with the index of every batch once it is deleted.
     '''
-    # Drop duplicates from tracks to avoid overloading the endpoint.
-    tracks_uris = set(map(lambda t: t['uri'], tracks))
+    # Cannot delete all tracks at once, so make multiple API calls.
+    for batch, request in enumerate(_delete_requests(tracks)):
+        if batch in done_batches:
+            continue
+
+        _check(session.request(**request))
+
+        if on_batch:
+            on_batch(batch)
+
+
+def _delete_requests(tracks: list) -> list:
+    # Arguments of `session.request()` to delete tracks from the library, in
+    # batches.
+
+    # Drop duplicates from tracks to avoid overloading the endpoint. Order is
+    # kept, so that batches are the same for the same tracks.
+    tracks_uris = dict.fromkeys(t.uri for t in tracks if t.uri is not None)
     # Prepare the objects as the API expects them.
     tracks_objs = list(map(lambda t: t.split(':')[-1], tracks_uris))
 
-    # Cannot delete all tracks at once, so make multiple API calls.
-    MAX_TRACKS = 50
-    for uris_chunk in map(lambda i: tracks_objs[i:i + MAX_TRACKS],
-                          range(0, len(tracks_objs), MAX_TRACKS)):
+    return [{'method': 'DELETE',
+             'url': F"{session.API_URL}/me/tracks?ids={','.join(tracks_objs[i:i + MAX_TRACKS])}"}
+            for i in range(0, len(tracks_objs), MAX_TRACKS)]
+
+
+# Asynchronous variants, for use within an event loop. They build the same
+# requests as their blocking versions, send them with `session.arequest()`,
+# and check their responses the same way.
+
+
+async def aget_tracks(added_at: bool = False) -> list:
+    '''Get user library (saved tracks). See `get_tracks()`.'''
+    return await session.aget_paged(**_tracks_pages(added_at))
+
+
+async def asave_tracks(tracks: list, verify: bool = True, timestamps: list = None,
+                       done_batches: set = (), on_batch=None) -> None:
+    '''Save given Tracks to the library. See `save_tracks()`.
 
-        q = F"ids={','.join(uris_chunk)}"
-        response = session.s.delete(
-            F"https://api.spotify.com/v1/me/tracks?{q}")
+    Since every track is saved with an explicit timestamp, batches are saved
+    concurrently. `on_batch` is called as each of them is saved, in any order.
+    '''
+    tracks, timestamps = _saved_tracks(tracks, timestamps)
+    tracks_ids = _ids(tracks)
+
+    async def save(batch, request):
+        _print_progress('Saving', batch * MAX_TRACKS, len(tracks_ids))
+        _check(await session.arequest(**request))
+
+        if on_batch:
+            on_batch(batch)
+
+    await asyncio.gather(*(save(batch, request) for batch, request
+                           in enumerate(_save_requests(tracks_ids, timestamps))
+                           if batch not in done_batches))
+
+    if not verify:
+        return
+
+    misplaced = _misplaced_batches(tracks_ids, await aget_tracks(), MAX_TRACKS)
+    for i in misplaced:
+        _print_progress('Repairing', i, len(tracks_ids))
+
+        await adelete_tracks(tracks[i:i + MAX_TRACKS])
+        for request in _save_requests(tracks_ids[i:i + MAX_TRACKS],
+                                      timestamps[i:i + MAX_TRACKS], size=1):
+            _check(await session.arequest(**request))
+
+    if misplaced:
+        _check_repaired(tracks_ids, await aget_tracks())
+
+
+async def adelete_tracks(tracks: list, done_batches: set = (), on_batch=None) -> None:
+    '''Delete all occurrences of given Tracks from the library. See
+    `delete_tracks()`.
+
+    Batches are deleted concurrently. `on_batch` is called as each of them is
+    deleted, in any order.
+    '''
+    async def delete(batch, request):
+        _check(await session.arequest(**request))
 
-        assert response.status_code is requests.codes.OK, response.text
+        if on_batch:
+            on_batch(batch)
 
-        time.sleep(.1)  # No DoS
+    await asyncio.gather(*(delete(batch, request) for batch, request
+                           in enumerate(_delete_requests(tracks))
+                           if batch not in done_batches))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+import bisect
+import collections
+import threading
+import urllib.parse
+
+
+# Upper bounds of the latency histogram buckets, in seconds.
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1., 2.5, 5., 10.)
+
+# Path segments following these ones are identifiers, replaced by `{id}` in
+# endpoint templates.
+COLLECTIONS = ('albums', 'artists', 'playlists', 'tracks', 'users')
+
+
+def endpoint_template(method : str, url : str, api_url : str = '') -> str:
+    '''Get the endpoint a request is sent to, without identifiers.
+
+
+    Parameters
+    ----------
+    method : str
+        HTTP method.
+
+    url : str
+        URL of the request.
+
+    api_url : str
+        Base URL of the API, to be stripped from the path.
+
+
+    Returns
+    -------
+    str
+        The method and the path template, e.g. `'GET /playlists/{id}/tracks'`.
+    '''
+    path = urllib.parse.urlsplit(url).path
+    base_path = urllib.parse.urlsplit(api_url).path
+    if base_path and path.startswith(base_path):
+        path = path[len(base_path):]
+
+    segments = path.split('/')
+    for i in range(1, len(segments)):
+        if segments[i - 1] in COLLECTIONS and segments[i]:
+            segments[i] = '{id}'
+
+    return F"{method.upper()} {'/'.join(segments)}"
+
+
+class RequestMetrics:
+    '''Counters and latency histograms of the requests sent to the API, by
+    endpoint, along with the time spent waiting before sending them.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = collections.defaultdict(lambda: {
+            'requests': 0,
+            'retries': 0,
+            'bytes_sent': 0,
+            'bytes_received': 0,
+            'statuses': collections.Counter(),
+            'seconds': 0.,
+            'buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+        })
+        self.wire_seconds = 0.
+        self.throttle_seconds = 0.
+        self.backoff_seconds = 0.
+
+    def record(self, endpoint : str, status, seconds : float, bytes_sent : int = 0,
+               bytes_received : int = 0, retry : bool = False) -> None:
+        '''Record a request.
+
+
+        Parameters
+        ----------
+        endpoint : str
+            Endpoint, as returned by `endpoint_template()`.
+
+        status : int or str
+            Status code of the response, or a description of the failure.
+
+        seconds : float
+            Time from sending the request to receiving the whole response.
+
+        bytes_sent : int
+            Size of the body of the request.
+
+        bytes_received : int
+            Size of the body of the response.
+
+        retry : bool
+            Whether the request repeats a failed one.
+        '''
+        with self._lock:
+            counters = self.endpoints[endpoint]
+            counters['requests'] += 1
+            counters['retries'] += int(retry)
+            counters['bytes_sent'] += bytes_sent
+            counters['bytes_received'] += bytes_received
+            counters['statuses'][str(status)] += 1
+            counters['seconds'] += seconds
+            counters['buckets'][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self.wire_seconds += seconds
+
+    def record_wait(self, seconds : float, backoff : bool = False) -> None:
+        '''Record time spent waiting before sending a request.
+
+
+        Parameters
+        ----------
+        seconds : float
+            Time spent waiting.
+
+        backoff : bool
+            If `True`, the wait was a backoff after a failure. Otherwise, it
+            was imposed by the rate limiter.
+        '''
+        with self._lock:
+            if backoff:
+                self.backoff_seconds += seconds
+            else:
+                self.throttle_seconds += seconds
+
+    def to_dict(self) -> dict:
+        '''Summarize the metrics.
+
+
+        Returns
+        -------
+        dict
+            JSON-serializable summary.
+        '''
+        with self._lock:
+            endpoints = {}
+            for endpoint, counters in sorted(self.endpoints.items()):
+                endpoints[endpoint] = {
+                    **counters,
+                    'statuses': dict(counters['statuses']),
+                    'seconds': round(counters['seconds'], 6),
+                    'buckets': dict(zip(
+                        [str(bound) for bound in LATENCY_BUCKETS] + ['+Inf'],
+                        counters['buckets'])),
+                }
+
+            return {
+                'requests': sum(c['requests'] for c in self.endpoints.values()),
+                'wire_seconds': round(self.wire_seconds, 6),
+                'throttle_seconds': round(self.throttle_seconds, 6),
+                'backoff_seconds': round(self.backoff_seconds, 6),
+                'endpoints': endpoints,
+            }
+
+    def to_prometheus(self) -> str:
+        '''Format the metrics in the Prometheus text exposition format.
+
+
+        Returns
+        -------
+        str
+            The metrics.
+        '''
+        summary = self.to_dict()
+        lines = []
+
+        def metric(name, kind, help, samples):
+            lines.append(F"# HELP spotify_sort_{name} {help}")
+            lines.append(F"# TYPE spotify_sort_{name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ','.join(F'{key}="{label}"' for key, label in labels)
+                lines.append(F"spotify_sort_{name}{suffix}{{{label_text}}} {value}"
+                             if label_text else F"spotify_sort_{name}{suffix} {value}")
+
+        def endpoint_labels(endpoint):
+            method, path = endpoint.split(' ', 1)
+            return [('method', method), ('endpoint', path)]
+
+        endpoints = summary['endpoints']
+
+        metric('requests_total', 'counter', 'Requests sent, by status.',
+               [('', endpoint_labels(e) + [('status', status)], count)
+                for e, c in endpoints.items()
+                for status, count in sorted(c['statuses'].items())])
+        metric('retries_total', 'counter', 'Requests repeating a failed one.',
+               [('', endpoint_labels(e), c['retries'])
+                for e, c in endpoints.items()])
+        metric('sent_bytes_total', 'counter', 'Bytes of request bodies.',
+               [('', endpoint_labels(e), c['bytes_sent'])
+                for e, c in endpoints.items()])
+        metric('received_bytes_total', 'counter', 'Bytes of response bodies.',
+               [('', endpoint_labels(e), c['bytes_received'])
+                for e, c in endpoints.items()])
+
+        samples = []
+        for e, c in endpoints.items():
+            cumulative = 0
+            for bound, count in c['buckets'].items():
+                cumulative += count
+                samples.append(('_bucket', endpoint_labels(e) + [('le', bound)],
+                                cumulative))
+            samples.append(('_sum', endpoint_labels(e), c['seconds']))
+            samples.append(('_count', endpoint_labels(e), c['requests']))
+        metric('request_duration_seconds', 'histogram',
+               'Time from sending a request to receiving its response.', samples)
+
+        metric('wait_seconds_total', 'counter',
+               'Time spent waiting before sending requests, by reason.',
+               [('', [('reason', 'throttle')], summary['throttle_seconds']),
+                ('', [('reason', 'backoff')], summary['backoff_seconds'])])
+        metric('wire_seconds_total', 'counter',
+               'Time spent sending requests and receiving responses.',
+               [('', [], summary['wire_seconds'])])
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,691 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+import collections
+import datetime
+import gzip
+import hashlib
+import http.server
+import json
+import random
+import re
+import string
+import threading
+import time
+import urllib.parse
+
+
+# Markets every mock track and album is available in, to make payloads about
+# as large as the real ones.
+MARKETS = ['AD', 'AE', 'AG', 'AL', 'AM', 'AO', 'AR', 'AT', 'AU', 'AZ', 'BA',
+           'BB', 'BD', 'BE', 'BF', 'BG', 'BH', 'BI', 'BJ', 'BN', 'BO', 'BR',
+           'BS', 'BT', 'BW', 'BY', 'BZ', 'CA', 'CD', 'CG', 'CH', 'CI', 'CL',
+           'CM', 'CO', 'CR', 'CV', 'CW', 'CY', 'CZ', 'DE', 'DJ', 'DK', 'DM',
+           'DO', 'DZ', 'EC', 'EE', 'EG', 'ES', 'ET', 'FI', 'FJ', 'FM', 'FR',
+           'GA', 'GB', 'GD', 'GE', 'GH', 'GM', 'GN', 'GQ', 'GR', 'GT', 'GW',
+           'GY', 'HK', 'HN', 'HR', 'HT', 'HU', 'ID', 'IE', 'IL', 'IN', 'IQ',
+           'IS', 'IT', 'JM', 'JO', 'JP', 'KE', 'KG', 'KH', 'KI', 'KM', 'KN',
+           'KR', 'KW', 'KZ', 'LA', 'LB', 'LC', 'LI', 'LK', 'LR', 'LS', 'LT',
+           'LU', 'LV', 'LY', 'MA', 'MC', 'MD', 'ME', 'MG', 'MH', 'MK', 'ML',
+           'MN', 'MO', 'MR', 'MT', 'MU', 'MV', 'MW', 'MX', 'MY', 'MZ', 'NA',
+           'NE', 'NG', 'NI', 'NL', 'NO', 'NP', 'NR', 'NZ', 'OM', 'PA', 'PE',
+           'PG', 'PH', 'PK', 'PL', 'PS', 'PT', 'PW', 'PY', 'QA', 'RO', 'RS',
+           'RW', 'SA', 'SB', 'SC', 'SE', 'SG', 'SI', 'SK', 'SL', 'SM', 'SN',
+           'SR', 'ST', 'SV', 'SZ', 'TD', 'TG', 'TH', 'TJ', 'TL', 'TN', 'TO',
+           'TR', 'TT', 'TV', 'TW', 'TZ', 'UA', 'UG', 'US', 'UY', 'UZ', 'VC',
+           'VE', 'VN', 'VU', 'WS', 'XK', 'ZA', 'ZM', 'ZW']
+
+USER_ID = 'mock-user'
+
+
+class MockError(Exception):
+    '''An error response of the mock API.'''
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def select_fields(data, fields : str):
+    '''Filter a response like the `fields` parameter of the Spotify Web API.
+
+
+    Parameters
+    ----------
+    data : dict or list
+        The full response.
+
+    fields : str
+        Comma separated field names, each optionally followed by the fields
+        to select from its value between parentheses, e.g.
+        `'total,items(track(name,album(name)))'`.
+
+
+    Returns
+    -------
+    dict or list
+        The filtered response.
+    '''
+
+    def parse(text, i):
+        selection = {}
+        while i < len(text) and text[i] != ')':
+            match = re.compile(r'[^,()]+').match(text, i)
+            name, i = match.group(0), match.end()
+            selection[name] = None
+            if i < len(text) and text[i] == '(':
+                selection[name], i = parse(text, i + 1)
+                i += 1
+            if i < len(text) and text[i] == ',':
+                i += 1
+        return selection, i
+
+    def select(value, selection):
+        if selection is None:
+            return value
+        if isinstance(value, list):
+            return [select(v, selection) for v in value]
+        if not isinstance(value, dict):
+            return value
+        return {name: select(value[name], sub)
+                for name, sub in selection.items() if name in value}
+
+    return select(data, parse(fields.replace(' ', ''), 0)[0])
+
+
+class MockSpotify:
+    '''In-memory fake of the parts of the Spotify Web API this package uses.
+
+    The catalog, the library and the playlists are generated from a seed, so
+    that runs are reproducible. Every request is counted by endpoint.
+
+
+    Parameters
+    ----------
+    library_size : int
+        Number of tracks in the user library.
+
+    playlist_sizes : tuple
+        Number of tracks of each playlist of the user.
+
+    seed : int
+        Seed for the generated data and the injected behaviors.
+
+    latency : float
+        Seconds every request is delayed by.
+
+    throttle : float
+        Probability for a request to be answered with `429 Too Many
+        Requests`.
+
+    retry_after : int
+        Value of the `Retry-After` header of throttled requests.
+
+    scramble : bool
+        If `True`, tracks added by the same request end up in random order,
+        unless the request sets their order explicitly.
+
+    damaged : float
+        Probability for an item of the generated playlists to be a local
+        file, a track removed from the catalog or a track whose album lacks
+        its details, in equal parts.
+    '''
+
+    def __init__(self, library_size=0, playlist_sizes=(), seed=0, latency=0.,
+                 throttle=0., retry_after=1, scramble=False, damaged=0.):
+        self.random = random.Random(seed)
+        self.latency = latency
+        self.throttle = throttle
+        self.retry_after = retry_after
+        self.scramble = scramble
+
+        self.requests = collections.Counter()
+        self.throttled = 0
+        self._lock = threading.RLock()
+        self.server = None
+
+        catalog_size = max([library_size, *playlist_sizes, 1])
+        self.tracks = self._make_catalog(catalog_size)
+        track_ids = list(self.tracks)
+        self.albums = {t['album']['id']: t['album'] for t in self.tracks.values()}
+        # Tracks listed in playlists with a partial album.
+        self.partial = set()
+
+        # The library is a list of `[added_at, id]`, most recently added first.
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self.library = [
+            [_timestamp(now - datetime.timedelta(minutes=i)), track_id]
+            for i, track_id in enumerate(
+                self.random.sample(track_ids, library_size))]
+
+        self.playlists = {}
+        for size in playlist_sizes:
+            playlist = self._create_playlist(
+                {'name': F"Mock Playlist {len(self.playlists)}"})
+            playlist['items'] = [
+                [_timestamp(now), self._damage(self.tracks[track_id]['uri'], damaged)]
+                for track_id in self.random.sample(track_ids, size)]
+
+        self.routes = [
+            ('GET', r'/me', self.get_me),
+            ('GET', r'/users/{id}', self.get_user),
+            ('GET', r'/me/tracks', self.get_library),
+            ('PUT', r'/me/tracks', self.save_library),
+            ('DELETE', r'/me/tracks', self.delete_library),
+            ('GET', r'/me/playlists', self.get_playlists),
+            ('POST', r'/me/playlists', self.create_playlist),
+            ('GET', r'/users/{id}/playlists', self.get_playlists),
+            ('POST', r'/users/{id}/playlists', self.create_playlist),
+            ('GET', r'/playlists/{id}', self.get_playlist),
+            ('GET', r'/playlists/{id}/tracks', self.get_playlist_tracks),
+            ('POST', r'/playlists/{id}/tracks', self.add_playlist_tracks),
+            ('PUT', r'/playlists/{id}/tracks', self.update_playlist_tracks),
+            ('DELETE', r'/playlists/{id}/tracks', self.delete_playlist_tracks),
+            ('GET', r'/albums', self.get_albums),
+        ]
+
+    def _make_id(self):
+        return ''.join(self.random.choices(
+            string.ascii_letters + string.digits, k=22))
+
+    def _make_catalog(self, size):
+        artists = [{'id': self._make_id(), 'name': F"Artist {i}"}
+                   for i in range(max(1, size // 50))]
+        for artist in artists:
+            artist.update({'type': 'artist',
+                           'uri': F"spotify:artist:{artist['id']}",
+                           'href': F"https://api.spotify.com/v1/artists/{artist['id']}",
+                           'external_urls': {'spotify': F"https://open.spotify.com/artist/{artist['id']}"}})
+
+        albums = []
+        for i in range(max(1, size // 10)):
+            album_id = self._make_id()
+            precision = self.random.choices(('day', 'month', 'year'),
+                                            weights=(90, 5, 5))[0]
+            release_date = F"{self.random.randint(1960, 2024)}-" \
+                           F"{self.random.randint(1, 12):02d}-" \
+                           F"{self.random.randint(1, 28):02d}"
+            release_date = release_date[:{'year': 4, 'month': 7, 'day': 10}[precision]]
+
+            albums.append({
+                'id': album_id,
+                'name': F"Album {i}",
+                'type': 'album',
+                'album_type': 'album',
+                'uri': F"spotify:album:{album_id}",
+                'href': F"https://api.spotify.com/v1/albums/{album_id}",
+                'external_urls': {'spotify': F"https://open.spotify.com/album/{album_id}"},
+                'release_date': release_date,
+                'release_date_precision': precision,
+                'total_tracks': 0,
+                'artists': [self.random.choice(artists)],
+                'available_markets': MARKETS,
+                'images': [{'url': F"https://i.scdn.co/image/{album_id}{size}",
+                            'height': size, 'width': size}
+                           for size in (640, 300, 64)],
+            })
+
+        tracks = {}
+        for i in range(size):
+            track_id = self._make_id()
+            album = albums[i % len(albums)]
+            album['total_tracks'] += 1
+
+            tracks[track_id] = {
+                'id': track_id,
+                'name': F"Track {i}",
+                'type': 'track',
+                'uri': F"spotify:track:{track_id}",
+                'href': F"https://api.spotify.com/v1/tracks/{track_id}",
+                'external_urls': {'spotify': F"https://open.spotify.com/track/{track_id}"},
+                'external_ids': {'isrc': F"MOCK{i:08d}"},
+                'album': album,
+                'artists': album['artists'],
+                'available_markets': MARKETS,
+                'disc_number': 1,
+                'track_number': album['total_tracks'],
+                'duration_ms': self.random.randint(90000, 420000),
+                'explicit': False,
+                'is_local': False,
+                'popularity': self.random.randint(0, 100),
+                'preview_url': None,
+            }
+
+        return tracks
+
+    def _damage(self, uri, probability):
+        # Turn a playlist item into a local file, a removed track or a track
+        # with a partial album, at random.
+        if not probability or self.random.random() >= probability:
+            return uri
+
+        kind = self.random.randrange(3)
+        if kind == 0:
+            return F"spotify:local:Local+Artist:Local+Album:Local+{uri[-6:]}:180"
+        if kind == 1:
+            return None
+        self.partial.add(uri)
+        return uri
+
+    def _local_track(self, uri):
+        _, _, artist, album, name, duration = uri.split(':')
+        return {'id': None, 'uri': uri, 'name': name.replace('+', ' '),
+                'type': 'track', 'is_local': True, 'disc_number': 0, 'track_number': 0,
+                'duration_ms': int(duration) * 1000, 'external_ids': {},
+                'artists': [{'id': None, 'name': artist.replace('+', ' ')}],
+                'album': {'id': None, 'name': album.replace('+', ' '),
+                          'release_date': None, 'release_date_precision': None,
+                          'artists': []}}
+
+    def _track_by_uri(self, uri):
+        track = self.tracks.get(uri.split(':')[-1])
+        if track is None:
+            raise MockError(400, F"Invalid track uri: {uri}")
+        return track
+
+    def _create_playlist(self, data):
+        playlist_id = self._make_id()
+        playlist = self.playlists[playlist_id] = {
+            'id': playlist_id,
+            'name': data['name'],
+            'description': data.get('description', ''),
+            'public': data.get('public', True),
+            'collaborative': data.get('collaborative', False),
+            'owner': {'id': USER_ID, 'display_name': 'Mock User'},
+            'version': 0,
+            'items': [],
+        }
+        return playlist
+
+    def _playlist(self, playlist_id):
+        playlist = self.playlists.get(playlist_id)
+        if playlist is None:
+            raise MockError(404, 'Not found.')
+        return playlist
+
+    def _changed(self, playlist):
+        playlist['version'] += 1
+        return {'snapshot_id': _snapshot_id(playlist)}
+
+    @staticmethod
+    def _page(items, query, max_limit):
+        offset = int(query.get('offset', 0))
+        limit = int(query.get('limit', 20))
+        if not 1 <= limit <= max_limit:
+            raise MockError(400, 'Invalid limit')
+
+        return {
+            'items': items[offset:offset + limit],
+            'total': len(items),
+            'offset': offset,
+            'limit': limit,
+            'next': None if offset + limit >= len(items) else 'next',
+            'previous': None if offset == 0 else 'previous',
+        }
+
+    def _playlist_json(self, playlist, full=False):
+        data = {key: playlist[key] for key in (
+            'id', 'name', 'description', 'public', 'collaborative', 'owner')}
+        data['snapshot_id'] = _snapshot_id(playlist)
+        data['uri'] = F"spotify:playlist:{playlist['id']}"
+        data['tracks'] = {'total': len(playlist['items'])}
+        if full:
+            data['tracks'] = self._page(
+                self._playlist_items(playlist), {'limit': 100}, 100)
+        return data
+
+    def _playlist_items(self, playlist):
+        return [{'added_at': added_at,
+                 'added_by': {'id': USER_ID},
+                 'is_local': bool(uri) and uri.startswith('spotify:local:'),
+                 'track': self._item_track(uri)}
+                for added_at, uri in playlist['items']]
+
+    def _item_track(self, uri):
+        if uri is None:
+            return None
+        if uri.startswith('spotify:local:'):
+            return self._local_track(uri)
+
+        track = self._track_by_uri(uri)
+        if uri in self.partial:
+            track = {**track, 'album': {key: track['album'][key]
+                                        for key in ('id', 'name', 'type', 'uri')}}
+        return track
+
+    def get_me(self, query, body):
+        return 200, {'id': USER_ID, 'display_name': 'Mock User'}
+
+    def get_user(self, query, body, user_id):
+        return 200, {'id': user_id, 'display_name': user_id}
+
+    def get_library(self, query, body):
+        return 200, self._page([{'added_at': added_at, 'track': self.tracks[track_id]}
+                                for added_at, track_id in self.library],
+                               query, 50)
+
+    def save_library(self, query, body):
+        now = _timestamp(datetime.datetime.now(datetime.timezone.utc))
+
+        if 'timestamped_ids' in body:
+            saved = [[t['added_at'], t['id']] for t in body['timestamped_ids']]
+        else:
+            ids = body['ids'] if 'ids' in body else query['ids'].split(',')
+            # The last track is considered the most recently added one.
+            saved = [[now, track_id] for track_id in reversed(ids)]
+            if self.scramble:
+                self.random.shuffle(saved)
+
+        if not 1 <= len(saved) <= 50:
+            raise MockError(400, 'Too many ids requested')
+        for _, track_id in saved:
+            self._track_by_uri(track_id)
+
+        ids = set(track_id for _, track_id in saved)
+        self.library = saved + [item for item in self.library
+                                if item[1] not in ids]
+        # Sorting is stable, so tracks saved at the same time keep their
+        # order.
+        self.library.sort(key=lambda item: item[0], reverse=True)
+
+        return 200, None
+
+    def delete_library(self, query, body):
+        ids = set(body['ids'] if body else query['ids'].split(','))
+        if not 1 <= len(ids) <= 50:
+            raise MockError(400, 'Too many ids requested')
+
+        self.library = [item for item in self.library if item[1] not in ids]
+        return 200, None
+
+    def get_playlists(self, query, body, user_id=USER_ID):
+        playlists = [self._playlist_json(playlist)
+                     for playlist in self.playlists.values()
+                     if playlist['owner']['id'] == user_id]
+        return 200, self._page(playlists, query, 50)
+
+    def create_playlist(self, query, body, user_id=USER_ID):
+        if not body.get('name'):
+            raise MockError(400, 'Missing required field: name')
+        return 201, self._playlist_json(self._create_playlist(body), full=True)
+
+    def get_playlist(self, query, body, playlist_id):
+        data = self._playlist_json(self._playlist(playlist_id), full=True)
+        if 'fields' in query:
+            data = select_fields(data, query['fields'])
+        return 200, data
+
+    def get_playlist_tracks(self, query, body, playlist_id):
+        data = self._page(self._playlist_items(self._playlist(playlist_id)),
+                          query, 100)
+        if 'fields' in query:
+            data = select_fields(data, query['fields'])
+        return 200, data
+
+    def add_playlist_tracks(self, query, body, playlist_id):
+        playlist = self._playlist(playlist_id)
+        uris = body['uris'] if 'uris' in body else query['uris'].split(',')
+        position = body.get('position', query.get('position'))
+
+        if not 1 <= len(uris) <= 100:
+            raise MockError(400, 'Too many tracks requested')
+        for uri in uris:
+            self._track_by_uri(uri)
+
+        added_at = _timestamp(datetime.datetime.now(datetime.timezone.utc))
+        items = [[added_at, uri] for uri in uris]
+        if self.scramble and position is None:
+            self.random.shuffle(items)
+
+        position = len(playlist['items']) if position is None else int(position)
+        playlist['items'][position:position] = items
+
+        return 201, self._changed(playlist)
+
+    def update_playlist_tracks(self, query, body, playlist_id):
+        playlist = self._playlist(playlist_id)
+
+        if 'uris' in body or 'uris' in query:
+            # Replace all the tracks.
+            uris = body['uris'] if 'uris' in body else query['uris'].split(',')
+            if len(uris) > 100:
+                raise MockError(400, 'Too many tracks requested')
+            added_at = _timestamp(datetime.datetime.now(datetime.timezone.utc))
+            playlist['items'] = [[added_at, self._track_by_uri(uri)['uri']]
+                                 for uri in uris]
+            return 200, self._changed(playlist)
+
+        # Reorder the tracks.
+        items = playlist['items']
+        range_start = body['range_start']
+        range_length = body.get('range_length', 1)
+        insert_before = body['insert_before']
+
+        if not (0 <= range_start and range_start + range_length <= len(items)
+                and 0 <= insert_before <= len(items)):
+            raise MockError(400, 'Index out of bounds')
+        if range_start < insert_before < range_start + range_length:
+            raise MockError(400, 'Cannot insert tracks within themselves')
+
+        chunk = items[range_start:range_start + range_length]
+        del items[range_start:range_start + range_length]
+        # Positions are counted before the tracks are moved.
+        if insert_before > range_start:
+            insert_before -= range_length
+        items[insert_before:insert_before] = chunk
+
+        return 200, self._changed(playlist)
+
+    def delete_playlist_tracks(self, query, body, playlist_id):
+        playlist = self._playlist(playlist_id)
+        tracks = body['tracks']
+        if not 1 <= len(tracks) <= 100:
+            raise MockError(400, 'Too many tracks requested')
+
+        removed = set()
+        for track in tracks:
+            if 'positions' in track:
+                for position in track['positions']:
+                    if playlist['items'][position][1] != track['uri']:
+                        raise MockError(400, 'Invalid track position')
+                    removed.add(position)
+            else:
+                removed.update(i for i, (_, uri) in enumerate(playlist['items'])
+                               if uri == track['uri'])
+
+        playlist['items'] = [item for i, item in enumerate(playlist['items'])
+                             if i not in removed]
+
+        return 200, self._changed(playlist)
+
+    def get_albums(self, query, body):
+        ids = query['ids'].split(',')
+        if not 1 <= len(ids) <= 20:
+            raise MockError(400, 'Too many ids requested')
+        return 200, {'albums': [self.albums.get(album_id) for album_id in ids]}
+
+    def handle(self, method : str, url : str, body : bytes) -> tuple:
+        '''Answer a request.
+
+
+        Parameters
+        ----------
+        method : str
+            HTTP method.
+
+        url : str
+            Path and query of the request.
+
+        body : bytes
+            Body of the request.
+
+
+        Returns
+        -------
+        tuple
+            Status code, headers and JSON-serializable body of the response.
+        '''
+        if self.latency:
+            time.sleep(self.latency)
+
+        split_url = urllib.parse.urlsplit(url)
+        path = split_url.path[3:] if split_url.path.startswith('/v1') \
+            else split_url.path
+        query = dict(urllib.parse.parse_qsl(split_url.query))
+
+        if path == '/mock/stats':
+            with self._lock:
+                return 200, {}, self.stats()
+
+        for route_method, template, handler in self.routes:
+            match = re.fullmatch(template.replace('{id}', '([^/]+)'), path)
+            if route_method == method and match:
+                break
+        else:
+            return 404, {}, {'error': {'status': 404, 'message': 'Not found.'}}
+
+        with self._lock:
+            self.requests[F"{method} {template}"] += 1
+
+            if self.throttle and self.random.random() < self.throttle:
+                self.throttled += 1
+                return 429, {'Retry-After': str(self.retry_after)}, \
+                    {'error': {'status': 429, 'message': 'API rate limit exceeded'}}
+
+            try:
+                status, data = handler(query, json.loads(body) if body else {},
+                                       *match.groups())
+            except (MockError, KeyError, ValueError, IndexError) as e:
+                status = getattr(e, 'status', 400)
+                return status, {}, {'error': {'status': status, 'message': str(e)}}
+
+        return status, {}, data
+
+    def stats(self) -> dict:
+        '''Get the number of requests received so far.
+
+
+        Returns
+        -------
+        dict
+            Total number of `requests`, number of `throttled` requests and
+            number of requests by `endpoint`.
+        '''
+        return {
+            'requests': sum(self.requests.values()),
+            'throttled': self.throttled,
+            'endpoints': dict(self.requests),
+        }
+
+    def start(self, host : str = '127.0.0.1', port : int = 0) -> str:
+        '''Start serving the mock API in a background thread.
+
+
+        Parameters
+        ----------
+        host : str
+            Address to listen on. Defaults to localhost.
+
+        port : int
+            Port to listen on. Defaults to any free port.
+
+
+        Returns
+        -------
+        str
+            Base URL of the mock API, to be passed to `session.init()`.
+        '''
+        self.server = http.server.ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.mock = self
+
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        return F"http://{host}:{self.server.server_port}/v1"
+
+    def stop(self) -> None:
+        '''Stop serving the mock API.'''
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+
+        status, headers, data = self.server.mock.handle(self.command, self.path, body)
+        payload = b'' if data is None else json.dumps(data).encode()
+
+        # Let clients revalidate what they already have, like the real API.
+        if self.command == 'GET' and status == 200:
+            etag = F'"{hashlib.sha1(payload).hexdigest()[:16]}"'
+            headers = {**headers, 'ETag': etag}
+            if self.headers.get('If-None-Match') == etag:
+                status, payload = 304, b''
+
+        # Compress like the real API does, for clients that accept it.
+        if payload and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            payload = gzip.compress(payload, compresslevel=1)
+            headers = {**headers, 'Content-Encoding': 'gzip'}
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+
+def _timestamp(moment):
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _snapshot_id(playlist):
+    return F"{playlist['version']:08d}{playlist['id']}"
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser('Mock Spotify Web API.')
+    parser.add_argument('--library', type=int, default=1000,
+                        help='Number of tracks in the library')
+    parser.add_argument('--playlist', type=int, action='append', default=[],
+                        help='Number of tracks of a playlist. Can be repeated')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.,
+                        help='Seconds every request is delayed by')
+    parser.add_argument('--throttle', type=float, default=0.,
+                        help='Probability for a request to be throttled')
+    parser.add_argument('--retry-after', type=int, default=1,
+                        help='Seconds throttled requests should wait')
+    parser.add_argument('--scramble', action='store_true', default=False,
+                        help='Scramble tracks added together')
+    parser.add_argument('--damaged', type=float, default=0.,
+                        help='Probability for a playlist item to be a local file, '
+                             'a removed track or to lack album details')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0)
+    args = parser.parse_args()
+
+    mock = MockSpotify(args.library, args.playlist, seed=args.seed,
+                       latency=args.latency, throttle=args.throttle,
+                       retry_after=args.retry_after, scramble=args.scramble,
+                       damaged=args.damaged)
+
+    # The first line of the output is the URL to connect to.
+    print(mock.start(args.host, args.port), flush=True)
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        mock.stop()
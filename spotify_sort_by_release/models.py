@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+import sys
+import typing
+
+
+class Track(typing.NamedTuple):
+    '''Compact representation of a track, holding what is needed to sort it.
+
+    Being a named tuple, a track has no per-instance dictionary. Album,
+    artist and release date strings are interned, so that tracks of the same
+    album share them.
+    '''
+    uri: str
+    name: str
+    album: str
+    artist: str
+    release_date: str
+    release_date_precision: str
+    disc_number: int
+    track_number: int
+    isrc: str = None
+    album_id: str = None
+
+
+# Filter for the `fields` parameter of the endpoints returning playlist tracks,
+# selecting only what is needed to build a `Track`.
+TRACK_FIELDS = ('uri,name,disc_number,track_number,external_ids(isrc),artists(name),'
+                'album(id,name,release_date,release_date_precision,artists(name))')
+
+
+# Precision of a release date, by number of dashes in it.
+PRECISIONS = ('year', 'month', 'day')
+
+
+def parse_track(t : dict) -> Track:
+    '''Build a Track from its API representation.
+
+    Tracks removed from the catalog (`null`), local files and tracks whose
+    album lacks details still make a Track, with an empty release date when
+    it is unknown, see `is_resolved()`.
+
+
+    Parameters
+    ----------
+    t : dict
+        The track, as per the Spotify Web API documentation, or `None`.
+
+
+    Returns
+    -------
+    Track
+        The compact track.
+    '''
+    t = t or {}
+    album = t.get('album') or {}
+    artists = album.get('artists') or t.get('artists') or [{}]
+    release_date = album.get('release_date') or ''
+
+    return Track(
+        uri=t.get('uri'),
+        name=t.get('name') or '',
+        album=sys.intern(album.get('name') or ''),
+        artist=sys.intern(artists[0].get('name') or ''),
+        release_date=sys.intern(release_date),
+        release_date_precision=sys.intern(
+            album.get('release_date_precision')
+            or PRECISIONS[release_date.count('-')]),
+        disc_number=t.get('disc_number', 1),
+        track_number=t.get('track_number', 1),
+        isrc=(t.get('external_ids') or {}).get('isrc'),
+        album_id=album.get('id'),
+    )
+
+
+def is_resolved(t : Track) -> bool:
+    '''Tell whether the release date of a track is known.'''
+    return bool(t.release_date)
+
+
+def is_addable(t : Track) -> bool:
+    '''Tell whether a track can be added to a playlist through the API, i.e.
+    it is still in the catalog and is not a local file.'''
+    return bool(t.uri) and not t.uri.startswith('spotify:local:')
+
+
+def parse_row(row : list) -> Track:
+    '''Build a Track from the list of its fields, e.g. as read from JSON.
+
+
+    Parameters
+    ----------
+    row : list
+        Values of the fields of the track, in order. Trailing fields with a
+        default value may be missing, e.g. in rows written by older versions.
+
+
+    Returns
+    -------
+    Track
+        The compact track.
+    '''
+    track = Track(*row)
+
+    return track._replace(
+        album=sys.intern(track.album),
+        artist=sys.intern(track.artist),
+        release_date=sys.intern(track.release_date),
+        release_date_precision=sys.intern(track.release_date_precision),
+    )
@@ -1,13 +1,20 @@
 #!/usr/bin/env python3
 # -*- coding: utf8 -*-
+import asyncio
 import json
 import requests
-import time
 
+from . import cache
+from . import models
+from . import reorder
 from . import session
 
 
-def get_playlist(playlist_id : str) -> dict:
+# Number of tracks the API adds or deletes at once.
+MAX_TRACKS = 100
+
+
+def get_playlist(playlist_id : str, fields : str = None) -> dict:
     '''Get a Playlist.
 
 
@@ -16,16 +23,35 @@ def get_playlist(playlist_id : str) -> dict:
     playlist_id : str
         Identifier of the playlist.
 
+    fields : str
+        Optional. Filter for the fields to return, e.g. `'name,snapshot_id'`.
+        Defaults to returning the whole playlist.
+
 
     Returns
     -------
     dict
         The playlist, as per the Spotify Web API documentation.
     '''
-    response = session.s.get(
-        F"https://api.spotify.com/v1/playlists/{playlist_id}")
-    assert response.status_code is requests.codes.OK, response.text
+    response = session.request(**_playlist_request(playlist_id, fields))
+    return _parsed(response)
+
+
+def _playlist_request(playlist_id : str, fields : str = None) -> dict:
+    # Arguments of `session.request()` to get a playlist.
+    return {'method': 'GET',
+            'url': F"{session.API_URL}/playlists/{playlist_id}",
+            'params': {'fields': fields} if fields else None}
+
 
+def _check(response, codes : tuple = (requests.codes.OK,)) -> None:
+    # Make sure a request succeeded.
+    assert response.status_code in codes, response.text
+
+
+def _parsed(response, codes : tuple = (requests.codes.OK,)) -> dict:
+    # Body of the response to a request that succeeded.
+    _check(response, codes)
     return json.loads(response.text)
 
 
@@ -40,26 +66,15 @@ def get_my_playlists() -> list:
         API.
     '''
 
-    all_playlists = []
-
-    # We must loop because the number of playlists the API will return is
-    # limited. Hence some playlists may be missing.
-    # To retrieve all playlists we'll use the fact that the response will
-    # contain the key `next`, whose value is the URL to GET for the missing
-    # playlists. When we reach the end of this "linked list", `next` will be
-    # None, so the loop terminates.
-    next_url = F"https://api.spotify.com/v1/me/playlists"
+    # The number of playlists the API returns at once is limited, so they are
+    # read one page at a time. After the first page tells how many playlists
+    # there are, the remaining pages are fetched concurrently.
+    return session.get_paged(**_my_playlists_pages())
 
-    while next_url:
-        response = session.s.get(next_url)
-        assert response.status_code is requests.codes.OK, response.text
 
-        response_json = json.loads(response.text)
-
-        all_playlists.extend(response_json['items'])
-        next_url = response_json['next']
-
-    return all_playlists
+def _my_playlists_pages() -> dict:
+    # Arguments of `session.get_paged()` to get the current user's playlists.
+    return {'url': F"{session.API_URL}/me/playlists", 'limit': 50}
 
 
 def get_user_playlists(user_id : str) -> list:
@@ -79,26 +94,86 @@ def get_user_playlists(user_id : str) -> list:
         API.
     '''
 
-    all_playlists = []
-
     # We use the same approach used in `get_my_playlists()` to make sure we
     # retrieve all the playlists.
-    next_url = F"https://api.spotify.com/v1/users/{user_id}/playlists"
+    return session.get_paged(**_user_playlists_pages(user_id))
 
-    while next_url:
-        response = session.s.get(next_url)
-        assert response.status_code is requests.codes.OK, response.text
 
-        response_json = json.loads(response.text)
+def _user_playlists_pages(user_id : str) -> dict:
+    # Arguments of `session.get_paged()` to get a user's playlists.
+    return {'url': F"{session.API_URL}/users/{user_id}/playlists", 'limit': 50}
 
-        all_playlists.extend(response_json['items'])
-        next_url = response_json['next']
 
-    return all_playlists
+def get_playlist_tracks(playlist_id : str, snapshot_id : str = None,
+                        offset : int = 0) -> list:
+    '''Get a Playlist's Tracks.
 
+    If the snapshot of the playlist is given and the cache holds it, tracks
+    are read from the cache instead of the API.
+
+
+    Parameters
+    ----------
+    playlist_id : str
+        Identifier of the playlist.
+
+    snapshot_id : str
+        Optional. Current snapshot of the playlist.
+
+    offset : int
+        Optional. Index of the first track to get. The cache is only used
+        when getting all the tracks. Defaults to 0.
+
+
+    Returns
+    -------
+    list
+        List of tracks, as `models.Track`.
+    '''
+    if offset == 0:
+        tracks = cache.get_playlist_tracks(playlist_id, snapshot_id)
+        if tracks is not None:
+            return tracks
+
+    # We use the same approach used in `get_my_playlists()` to make sure we
+    # retrieve all the tracks. Only the fields needed to sort are requested.
+    tracks = session.get_paged(**_tracks_pages(playlist_id), offset=offset)
+
+    if offset == 0:
+        cache.put_playlist_tracks(playlist_id, snapshot_id, tracks)
+
+    return tracks
+
+
+def _tracks_pages(playlist_id : str) -> dict:
+    # Arguments of `session.get_paged()` to get a playlist's tracks.
+    return {'url': F"{session.API_URL}/playlists/{playlist_id}/tracks",
+            'limit': 100,
+            'params': {'fields': F"total,items(track({models.TRACK_FIELDS}))"},
+            'parse': lambda i: models.parse_track(i['track'])}
+
+
+def iter_playlist_tracks(playlist_id : str):
+    '''Get a Playlist's Tracks as they are needed, one page at a time.
 
-def get_playlist_tracks(playlist_id : str) -> list:
-    '''Get a Playlist's Tracks.
+
+    Parameters
+    ----------
+    playlist_id : str
+        Identifier of the playlist.
+
+
+    Yields
+    ------
+    models.Track
+        The tracks, in the order of the playlist.
+    '''
+    return session.iter_paged(**_tracks_pages(playlist_id))
+
+
+def get_playlist_uris(playlist_id : str) -> list:
+    '''Get the URIs of a Playlist's Tracks, and nothing else, to cheaply
+    tell whether tracks moved.
 
 
     Parameters
@@ -110,25 +185,65 @@ def get_playlist_tracks(playlist_id : str) -> list:
     Returns
     -------
     list
-        List of tracks. Each track is a dictionary as per the Spotify Web API documentation.
+        URIs of the tracks, in the order of the playlist. Tracks removed from
+        the catalog have no URI.
     '''
+    return session.get_paged(
+        F"{session.API_URL}/playlists/{playlist_id}/tracks",
+        limit=100,
+        params={'fields': 'total,items(track(uri))'},
+        parse=lambda i: (i['track'] or {}).get('uri'))
 
-    all_tracks = []
 
-    # We use the same approach used in `get_my_playlists()` to make sure we
-    # retrieve all the playlists.
-    next_url = F"https://api.spotify.com/v1/playlists/{playlist_id}/tracks"
+def get_appended_playlist_tracks(playlist: dict) -> list:
+    '''Get a Playlist's Tracks, assuming tracks were only appended to it
+    since it was last cached.
 
-    while next_url:
-        response = session.s.get(next_url)
-        assert response.status_code is requests.codes.OK, response.text
+    A new snapshot may as well come from tracks moved, or removed and added
+    again, so the URIs of all the tracks are read first: only if the cached
+    tracks are still all in place are they reused, and just the tracks past
+    them fetched in full. Otherwise, or if the playlist is not cached at all,
+    all the tracks are fetched.
 
-        response_json = json.loads(response.text)
 
-        all_tracks.extend(map(lambda i: i['track'], response_json['items']))
-        next_url = response_json['next']
+    Parameters
+    ----------
+    playlist : dict
+        The playlist, as per the Spotify Web API documentation. Must include
+        its snapshot ID and number of tracks.
+
+
+    Returns
+    -------
+    list
+        List of tracks, as `models.Track`.
+    '''
+    # Tracks cached after sorting may miss the ones added while sorting, in
+    # which case the number of tracks tells.
+    tracks = cache.get_playlist_tracks(playlist['id'], playlist['snapshot_id'])
+    if tracks is not None and len(tracks) == playlist['tracks']['total']:
+        return tracks
+
+    _, cached_tracks = cache.get_latest_playlist_tracks(playlist['id'])
+    if not cached_tracks or len(cached_tracks) > playlist['tracks']['total']:
+        return get_playlist_tracks(playlist['id'], playlist['snapshot_id'])
+
+    uris = get_playlist_uris(playlist['id'])
+    if uris[:len(cached_tracks)] != [t.uri for t in cached_tracks]:
+        return get_playlist_tracks(playlist['id'], playlist['snapshot_id'])
+
+    new_tracks = []
+    if len(uris) > len(cached_tracks):
+        new_tracks = get_playlist_tracks(playlist['id'], offset=len(cached_tracks))
+
+    # The playlist may still change while being read.
+    if [t.uri for t in new_tracks] != uris[len(cached_tracks):]:
+        return get_playlist_tracks(playlist['id'], playlist['snapshot_id'])
 
-    return all_tracks
+    tracks = cached_tracks + new_tracks
+    cache.put_playlist_tracks(playlist['id'], playlist['snapshot_id'], tracks)
+
+    return tracks
 
 
 def create_playlist(playlist_data : str) -> dict:
@@ -169,17 +284,25 @@ def create_playlist(playlist_data : str) -> dict:
         create_playlist(playlist_data)
         ```
     '''
-    response = session.s.post(F"https://api.spotify.com/v1/me/playlists",
-                              data=json.dumps(playlist_data))
-    assert response.status_code in (
-        requests.codes.OK, requests.codes.CREATED), response.text
+    response = session.request(**_create_request(playlist_data))
+    return _parsed(response, (requests.codes.OK, requests.codes.CREATED))
 
-    return json.loads(response.text)
+
+def _create_request(playlist_data : dict) -> dict:
+    # Arguments of `session.request()` to create a playlist.
+    return {'method': 'POST',
+            'url': F"{session.API_URL}/me/playlists",
+            'data': json.dumps(playlist_data)}
 
 
-def add_tracks(playlist_id : str, tracks : list, threshold : int = 10) -> None:
+def add_tracks(playlist_id : str, tracks : list, position : int = None,
+               verify : bool = True) -> None:
     '''Add Tracks to a Playlist.
 
+    Tracks are added in batches of the maximum size the API allows, each at
+    an explicit position. If `verify` is set, the playlist is read back and
+    tracks that did not end up in the given order are moved into place.
+
 
     Parameters
     ----------
@@ -187,30 +310,158 @@ def add_tracks(playlist_id : str, tracks : list, threshold : int = 10) -> None:
         Identifier of the playlist.
 
     tracks : list
-        List of tracks to add, as per the Spotify Web API documentation.
+        List of tracks to add, as `models.Track`.
+
+    position : int
+        Optional. Position of the first track to add. Defaults to appending
+        the tracks to the playlist.
+
+    verify : bool
+        If `True`, make sure the tracks were added in the given order.
+        Defaults to `True`.
+    '''
+
+    tracks_uris = list(map(lambda t: t.uri, tracks))
+
+    if position is None:
+        position = get_playlist(playlist_id, 'tracks(total)')['tracks']['total']
+
+    for request in _add_requests(playlist_id, tracks_uris, position):
+        _check(session.request(**request), (requests.codes.CREATED,))
+
+    if verify:
+        repair_tracks(playlist_id, tracks_uris, position)
+
 
-    threshold : int
-        Maximum number of tracks to put at once. Order may not be preserved
-        among these tracks, so the greater the value, the more tracks will be
-        scrambled. Defaults to 10. Must not be greater than 100.
+def _add_requests(playlist_id : str, tracks_uris : list, position : int) -> list:
+    # Arguments of `session.request()` to add tracks at a position. Cannot add
+    # all tracks at once, so make multiple API calls. Each batch is positioned
+    # after the previous one, so they must be sent in order.
+    return [{'method': 'POST',
+             'url': F"{session.API_URL}/playlists/{playlist_id}/tracks",
+             'data': json.dumps({'uris': tracks_uris[i:i + MAX_TRACKS],
+                                 'position': position + i})}
+            for i in range(0, len(tracks_uris), MAX_TRACKS)]
+
+
+def repair_tracks(playlist_id : str, tracks_uris : list, position : int = 0) -> None:
+    '''Make sure some Tracks of a Playlist are in the given order.
+
+    The playlist is read back and the tracks that are out of place are moved,
+    leaving the others where they are.
+
+
+    Parameters
+    ----------
+    playlist_id : str
+        Identifier of the playlist.
+
+    tracks_uris : list
+        URIs of the tracks, in the expected order.
+
+    position : int
+        Position of the first track in the playlist. Defaults to 0.
     '''
+    move_tracks(playlist_id, _repair_moves(get_playlist_tracks(playlist_id),
+                                           tracks_uris, position))
+
 
-    tracks_uris = list(map(lambda t: t['uri'], tracks))
+def _repair_moves(playlist_tracks : list, tracks_uris : list, position : int) -> list:
+    # Moves putting the tracks of a playlist read back after adding some
+    # back in the order they were added in, see `repair_tracks()`.
+    playlist_uris = list(map(lambda t: t.uri, playlist_tracks))
+    window = playlist_uris[position:position + len(tracks_uris)]
 
-    # Ensure the threshold is in the correct range
-    assert 1 <= threshold <= 100, F"Bad threshold value: {threshold}"
+    if window == tracks_uris:
+        return []
 
-    # Cannot add all tracks at once, so make multiple API calls.
-    MAX_TRACKS = int(threshold)
-    for uris_chunk in map(lambda i: tracks_uris[i:i + MAX_TRACKS],
-                          range(0, len(tracks_uris), MAX_TRACKS)):
+    moves = reorder.plan_moves(reorder.match_ranks(window, tracks_uris))
+    return [(range_start + position, range_length, insert_before + position)
+            for range_start, range_length, insert_before in moves]
 
-        q = F"uris={','.join(uris_chunk)}"
-        response = session.s.post(
-            F"https://api.spotify.com/v1/playlists/{playlist_id}/tracks?{q}")
-        assert response.status_code is requests.codes.CREATED, response.text
 
-        time.sleep(.1) # No DoS
+def reorder_tracks(playlist_id : str, range_start : int, insert_before : int,
+                   range_length : int = 1, snapshot_id : str = None) -> str:
+    '''Reorder a Playlist's Tracks.
+
+
+    Parameters
+    ----------
+    playlist_id : str
+        Identifier of the playlist.
+
+    range_start : int
+        Position of the first track to be moved.
+
+    insert_before : int
+        Position where the tracks should be inserted, as counted before they
+        are moved.
+
+    range_length : int
+        Number of consecutive tracks to be moved. Defaults to 1.
+
+    snapshot_id : str
+        Optional. Playlist's snapshot the positions refer to.
+
+
+    Returns
+    -------
+    str
+        The snapshot ID of the playlist after the change.
+    '''
+    response = session.request(**_reorder_request(
+        playlist_id, range_start, insert_before, range_length, snapshot_id))
+    return _parsed(response)['snapshot_id']
+
+
+def _reorder_request(playlist_id : str, range_start : int, insert_before : int,
+                     range_length : int, snapshot_id : str) -> dict:
+    # Arguments of `session.request()` to move tracks, see `reorder_tracks()`.
+    body = {
+        'range_start': range_start,
+        'insert_before': insert_before,
+        'range_length': range_length,
+    }
+    if snapshot_id:
+        body['snapshot_id'] = snapshot_id
+
+    return {'method': 'PUT',
+            'url': F"{session.API_URL}/playlists/{playlist_id}/tracks",
+            'data': json.dumps(body),
+            'idempotent': False}
+
+
+def move_tracks(playlist_id : str, moves : list, snapshot_id : str = None) -> str:
+    '''Apply a sequence of moves to a Playlist's Tracks.
+
+
+    Parameters
+    ----------
+    playlist_id : str
+        Identifier of the playlist.
+
+    moves : list
+        Moves as `(range_start, range_length, insert_before)` tuples, like the
+        ones computed by `reorder.plan_moves()`.
+
+    snapshot_id : str
+        Optional. Playlist's snapshot the first move refers to.
+
+
+    Returns
+    -------
+    str
+        The snapshot ID of the playlist after the last move.
+    '''
+    # Each move refers to the playlist as left by the previous one, so chain
+    # the snapshots to let the API detect concurrent modifications.
+    for i, (range_start, range_length, insert_before) in enumerate(moves):
+        print(F'[*] Moving tracks ({i + 1} of {len(moves)})', end='    \r')
+
+        snapshot_id = reorder_tracks(playlist_id, range_start, insert_before,
+                                     range_length, snapshot_id)
+
+    return snapshot_id
 
 
 def delete_tracks(playlist_id: str, tracks: list) -> None:
@@ -223,25 +474,215 @@ def delete_tracks(playlist_id: str, tracks: list) -> None:
         Identifier of the playlist.
 
     tracks: list
-        List of Tracks, as per the Spotify Web API documentation.
+        List of tracks, as `models.Track`. Tracks without a URI, like tracks
+        removed from the catalog, cannot be deleted and are left out.
     '''
+    for request in _delete_requests(playlist_id, tracks):
+        _check(session.request(**request))
+
+
+def _delete_requests(playlist_id : str, tracks : list) -> list:
+    # Arguments of `session.request()` to delete all occurrences of tracks.
     # Drop duplicates from tracks to avoid overloading the endpoint.
-    tracks_uris = set(map(lambda t: t['uri'], tracks))
+    tracks_uris = dict.fromkeys(t.uri for t in tracks if t.uri is not None)
     # Prepare the objects as the API expects them.
     tracks_objs = list(map(lambda uri: {'uri': uri}, tracks_uris))
 
     # Cannot delete all tracks at once, so make multiple API calls.
-    MAX_TRACKS = 100
-    for uris_chunk in map(lambda i: tracks_objs[i:i + MAX_TRACKS],
-                          range(0, len(tracks_objs), MAX_TRACKS)):
+    return [{'method': 'DELETE',
+             'url': F"{session.API_URL}/playlists/{playlist_id}/tracks",
+             'data': json.dumps({'tracks': tracks_objs[i:i + MAX_TRACKS]})}
+            for i in range(0, len(tracks_objs), MAX_TRACKS)]
+
+
+def delete_positions(playlist_id : str, tracks : list, positions : list,
+                     snapshot_id : str = None) -> str:
+    '''Delete the Tracks at given positions of a Playlist, leaving the other
+    occurrences of the same tracks in place.
+
+    Positions are deleted from the last one, so that every request refers to
+    positions the previous ones did not shift. The API deletes positions
+    along with the URI of their track: tracks without one, like tracks
+    removed from the catalog, cannot be deleted.
+
+
+    Parameters
+    ----------
+    playlist_id : str
+        Identifier of the playlist.
+
+    tracks : list
+        All the tracks of the playlist, as `models.Track`, in order.
+
+    positions : list
+        Positions of the tracks to delete.
+
+    snapshot_id : str
+        Optional. Playlist's snapshot the positions refer to.
+
+
+    Returns
+    -------
+    str
+        The snapshot ID of the playlist after the last deletion.
+
+
+    Raises
+    ------
+    AssertionError
+        If a track to delete has no URI. Nothing is deleted then.
+    '''
+    positions = sorted(positions, reverse=True)
+    missing = [p for p in positions if tracks[p].uri is None]
+    assert not missing, F"Tracks without a URI cannot be deleted, at {sorted(missing)}"
+
+    for i in range(0, len(positions), MAX_TRACKS):
+        by_uri = {}
+        for position in positions[i:i + MAX_TRACKS]:
+            by_uri.setdefault(tracks[position].uri, []).append(position)
+
+        body = {'tracks': [{'uri': uri, 'positions': uri_positions}
+                           for uri, uri_positions in by_uri.items()]}
+        if snapshot_id:
+            body['snapshot_id'] = snapshot_id
+
+        # Deleting by position again would delete other tracks.
+        response = session.delete(
+            F"{session.API_URL}/playlists/{playlist_id}/tracks",
+            data=json.dumps(body), idempotent=False)
+        snapshot_id = _parsed(response)['snapshot_id']
 
-        response = session.s.delete(
-            F"https://api.spotify.com/v1/playlists/{playlist_id}/tracks",
-            data=json.dumps({'tracks': uris_chunk}))
+    return snapshot_id
 
-        assert response.status_code is requests.codes.OK, response.text
 
-        time.sleep(.1)  # No DoS
+def replace_tracks(playlist_id : str, tracks : list) -> None:
+    '''Replace all the Tracks of a Playlist.
+
+    The first batch of tracks replaces the content of the playlist, and the
+    following ones are appended to it.
+
+
+    Parameters
+    ----------
+    playlist_id : str
+        Identifier of the playlist.
+
+    tracks : list
+        List of tracks, as `models.Track`, in order.
+    '''
+    response = session.put(
+        F"{session.API_URL}/playlists/{playlist_id}/tracks",
+        data=json.dumps({'uris': [t.uri for t in tracks[:MAX_TRACKS]]}))
+    _check(response, (requests.codes.OK, requests.codes.CREATED))
+
+    add_tracks(playlist_id, tracks[MAX_TRACKS:], position=MAX_TRACKS, verify=False)
+
+
+# Asynchronous variants, for use within an event loop. They build the same
+# requests as their blocking versions, send them with `session.arequest()`,
+# and check their responses the same way.
+
+
+async def aget_playlist(playlist_id : str, fields : str = None) -> dict:
+    '''Get a Playlist. See `get_playlist()`.'''
+    response = await session.arequest(**_playlist_request(playlist_id, fields))
+    return _parsed(response)
+
+
+async def aget_my_playlists() -> list:
+    '''Get a List of Current User's Playlists. See `get_my_playlists()`.'''
+    return await session.aget_paged(**_my_playlists_pages())
+
+
+async def aget_user_playlists(user_id : str) -> list:
+    '''Get a List of a User's Playlists. See `get_user_playlists()`.'''
+    return await session.aget_paged(**_user_playlists_pages(user_id))
+
+
+async def aget_playlist_tracks(playlist_id : str, snapshot_id : str = None,
+                               offset : int = 0) -> list:
+    '''Get a Playlist's Tracks. See `get_playlist_tracks()`.
+
+    The cache is accessed in a separate thread.
+    '''
+    if offset == 0:
+        tracks = await asyncio.to_thread(cache.get_playlist_tracks,
+                                         playlist_id, snapshot_id)
+        if tracks is not None:
+            return tracks
+
+    tracks = await session.aget_paged(**_tracks_pages(playlist_id), offset=offset)
+
+    if offset == 0:
+        await asyncio.to_thread(cache.put_playlist_tracks,
+                                playlist_id, snapshot_id, tracks)
+
+    return tracks
+
+
+async def acreate_playlist(playlist_data : dict) -> dict:
+    '''Create a Playlist. See `create_playlist()`.'''
+    response = await session.arequest(**_create_request(playlist_data))
+    return _parsed(response, (requests.codes.OK, requests.codes.CREATED))
+
+
+async def aadd_tracks(playlist_id : str, tracks : list, position : int = None,
+                      verify : bool = True) -> None:
+    '''Add Tracks to a Playlist. See `add_tracks()`.
+
+    Batches are still added one after the other, since each is positioned
+    after the previous one.
+    '''
+    tracks_uris = list(map(lambda t: t.uri, tracks))
+
+    if position is None:
+        position = (await aget_playlist(playlist_id, 'tracks(total)'))['tracks']['total']
+
+    for request in _add_requests(playlist_id, tracks_uris, position):
+        _check(await session.arequest(**request), (requests.codes.CREATED,))
+
+    if verify:
+        await arepair_tracks(playlist_id, tracks_uris, position)
+
+
+async def arepair_tracks(playlist_id : str, tracks_uris : list,
+                         position : int = 0) -> None:
+    '''Make sure some Tracks of a Playlist are in the given order. See
+    `repair_tracks()`.'''
+    await amove_tracks(playlist_id, _repair_moves(await aget_playlist_tracks(playlist_id),
+                                                  tracks_uris, position))
+
+
+async def areorder_tracks(playlist_id : str, range_start : int, insert_before : int,
+                          range_length : int = 1, snapshot_id : str = None) -> str:
+    '''Reorder a Playlist's Tracks. See `reorder_tracks()`.'''
+    response = await session.arequest(**_reorder_request(
+        playlist_id, range_start, insert_before, range_length, snapshot_id))
+    return _parsed(response)['snapshot_id']
+
+
+async def amove_tracks(playlist_id : str, moves : list, snapshot_id : str = None) -> str:
+    '''Apply a sequence of moves to a Playlist's Tracks. See
+    `move_tracks()`.'''
+    for i, (range_start, range_length, insert_before) in enumerate(moves):
+        print(F'[*] Moving tracks ({i + 1} of {len(moves)})', end='    \r')
+
+        snapshot_id = await areorder_tracks(playlist_id, range_start, insert_before,
+                                            range_length, snapshot_id)
+
+    return snapshot_id
+
+
+async def adelete_tracks(playlist_id : str, tracks : list) -> None:
+    '''Delete all occurrences of given Tracks from a Playlist. See
+    `delete_tracks()`.
+
+    Batches are deleted concurrently.
+    '''
+    responses = await asyncio.gather(*(session.arequest(**request) for request
+                                       in _delete_requests(playlist_id, tracks)))
+    for response in responses:
+        _check(response)
 
 
 if __name__ == '__main__':
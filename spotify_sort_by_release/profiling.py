@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+import cProfile
+import functools
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+
+# Phases of a sort, in the order they happen, see `mark()`.
+PHASES = ('fetch', 'sort', 'preview', 'delete', 'write')
+
+# Number of allocation sites listed for every phase.
+TOP_ALLOCATIONS = 10
+
+# Number of traceback frames kept for every allocation.
+TRACEBACK_FRAMES = 1
+
+# Whether a profiler sees the calls of all the threads, as it does since
+# Python 3.12, which also allows only one to be enabled at a time.
+PROFILES_ALL_THREADS = sys.version_info >= (3, 12)
+
+# Allocations left out of the sites reported, the ones made by profiling.
+IGNORED = (tracemalloc.Filter(False, tracemalloc.__file__),
+           tracemalloc.Filter(False, __file__))
+
+
+class Profile:
+    '''CPU profile of a run, along with the time it spent and the memory it
+    allocated in every phase.
+
+    The work done by thread pools, e.g. parsing pages fetched concurrently,
+    is profiled too. Before Python 3.12, every thread started while profiling
+    gets its own profiler, and the profilers are merged when writing the
+    stats. Threads that cannot get one, e.g. because another profiling tool
+    is active, still run, without being profiled.
+
+    Memory is traced for all the threads at once: when phases of several
+    sorts overlap, e.g. with `playlist --all`, the peak of a phase includes
+    what the other phases allocated meanwhile.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.profilers = [cProfile.Profile()]
+        self.phases = {}
+        self.peak = 0
+        self.local = threading.local()
+
+    def start(self) -> None:
+        '''Start profiling the current thread and the ones started from now on.'''
+        tracemalloc.start(TRACEBACK_FRAMES)
+        if not PROFILES_ALL_THREADS:
+            threading.setprofile(self._profile_thread)
+        self.profilers[0].enable()
+
+    def stop(self) -> None:
+        '''Stop profiling.'''
+        self.profilers[0].disable()
+        if not PROFILES_ALL_THREADS:
+            threading.setprofile(None)
+        self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    def _profile_thread(self, frame, event, arg):
+        # Called once by every new thread, before it runs: hand over to a
+        # profiler of its own.
+        sys.setprofile(None)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active, the thread must still run.
+            return
+        with self._lock:
+            self.profilers.append(profiler)
+
+    def mark(self, phase : str) -> None:
+        '''End the phase the current thread is in, and start another one.'''
+        current = getattr(self.local, 'phase', None)
+        if current is not None:
+            name, started_at, traced, before = current
+            seconds = time.perf_counter() - started_at
+            _, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot().filter_traces(IGNORED)
+            allocated = [(str(diff.traceback[0]), diff.size_diff)
+                         for diff in after.compare_to(before, 'lineno')
+                         if diff.size_diff > 0]
+
+            with self._lock:
+                self.peak = max(self.peak, peak)
+                stats = self.phases.setdefault(name, {
+                    'calls': 0, 'seconds': 0., 'peak': 0, 'allocations': {}})
+                stats['calls'] += 1
+                stats['seconds'] += seconds
+                stats['peak'] = max(stats['peak'], peak - traced)
+                for site, size in allocated:
+                    stats['allocations'][site] = stats['allocations'].get(site, 0) + size
+
+        self.local.phase = None
+        if phase is not None:
+            before = tracemalloc.take_snapshot().filter_traces(IGNORED)
+            with self._lock:
+                self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.reset_peak()
+            self.local.phase = (phase, time.perf_counter(),
+                                tracemalloc.get_traced_memory()[0], before)
+
+    def write(self, prefix : str) -> list:
+        '''Write the stats of the run.
+
+
+        Parameters
+        ----------
+        prefix : str
+            Path of the files to write, without extension:
+                - `.pstats`: the raw CPU profile, to be loaded with `pstats`,
+                  e.g. to compare runs of different versions.
+                - `.txt`: the CPU profile, sorted by cumulative time.
+                - `.memory.txt`: the time spent and the peak memory allocated
+                  in every phase, with the sites that allocated the most.
+
+
+        Returns
+        -------
+        list
+            Paths of the files written.
+        '''
+        stats = None
+        for profiler in self.profilers:
+            if not profiler.getstats():
+                continue
+            if stats is None:
+                stats = pstats.Stats(profiler)
+            else:
+                stats.add(profiler)
+
+        paths = []
+        if stats is not None:
+            stats.dump_stats(F"{prefix}.pstats")
+            with open(F"{prefix}.txt", 'w') as f:
+                stats.stream = f
+                stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats()
+            paths += [F"{prefix}.pstats", F"{prefix}.txt"]
+
+        with open(F"{prefix}.memory.txt", 'w') as f:
+            f.write(self.memory_report())
+        paths.append(F"{prefix}.memory.txt")
+
+        return paths
+
+    def memory_report(self) -> str:
+        '''Describe the time spent and the memory allocated in every phase.'''
+        lines = [F"Peak traced memory: {self.peak / 1024:.1f} KiB",
+                 'Peak memory allocated in every phase, followed by the sites that '
+                 'kept the most memory allocated at its end.', '',
+                 F"{'Phase':<10} {'Calls':>6} {'Seconds':>10} {'Peak KiB':>12}"]
+
+        phases = sorted(self.phases, key=lambda name: (
+            PHASES.index(name) if name in PHASES else len(PHASES), name))
+        for name in phases:
+            stats = self.phases[name]
+            lines.append(F"{name:<10} {stats['calls']:>6} {stats['seconds']:>10.3f} "
+                         F"{stats['peak'] / 1024:>12.1f}")
+
+            allocations = sorted(stats['allocations'].items(),
+                                 key=lambda item: item[1], reverse=True)
+            for site, size in allocations[:TOP_ALLOCATIONS]:
+                lines.append(F"    {size / 1024:>10.1f} KiB  {site}")
+
+        return '\n'.join(lines) + '\n'
+
+
+# Profile of the current run, if profiling.
+active = None
+
+
+def start() -> Profile:
+    '''Start profiling the run, see `Profile`.'''
+    global active
+    active = Profile()
+    active.start()
+    return active
+
+
+def stop(prefix : str) -> list:
+    '''Stop profiling the run, and write its stats, see `Profile.write()`.
+
+
+    Returns
+    -------
+    list
+        Paths of the files written, none if not profiling.
+    '''
+    global active
+    if active is None:
+        return []
+
+    profile, active = active, None
+    profile.mark(None)
+    profile.stop()
+    return profile.write(prefix)
+
+
+def mark(phase : str) -> None:
+    '''Mark the start of a phase of a sort in the current thread, ending the
+    previous one. Does nothing unless profiling.
+
+
+    Parameters
+    ----------
+    phase : str
+        Name of the phase, from `PHASES`, or `None` to only end the previous
+        one.
+    '''
+    if active is not None:
+        active.mark(phase)
+
+
+def phased(function):
+    '''Make a function end the last phase it marked when it returns, see
+    `mark()`.
+    '''
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        try:
+            return function(*args, **kwargs)
+        finally:
+            mark(None)
+
+    return wrapper
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+import bisect
+import collections
+
+
+def longest_increasing_subsequence(sequence : list) -> set:
+    '''Find a longest strictly increasing subsequence.
+
+
+    Parameters
+    ----------
+    sequence : list
+        Sequence of comparable items.
+
+
+    Returns
+    -------
+    set
+        Positions in `sequence` of the items of the subsequence.
+    '''
+    # Patience sorting: `tails[k]` is the smallest last item of an increasing
+    # subsequence of length `k + 1` seen so far, `tails_at[k]` its position.
+    tails = []
+    tails_at = []
+    previous = [None] * len(sequence)
+
+    for i, item in enumerate(sequence):
+        k = bisect.bisect_left(tails, item)
+
+        if k == len(tails):
+            tails.append(item)
+            tails_at.append(i)
+        else:
+            tails[k] = item
+            tails_at[k] = i
+
+        previous[i] = tails_at[k - 1] if k > 0 else None
+
+    positions = set()
+    i = tails_at[-1] if tails_at else None
+    while i is not None:
+        positions.add(i)
+        i = previous[i]
+
+    return positions
+
+
+def plan_moves(ranks : list) -> list:
+    '''Plan the moves that reorder a list into its target order.
+
+    Items belonging to a longest increasing subsequence of the target ranks
+    already are in the correct relative order, so they are left where they
+    are. Every other item is moved right after its predecessor in the target
+    order. Items that are adjacent both in the current and in the target order
+    are moved together as a single range.
+
+
+    Parameters
+    ----------
+    ranks : list
+        For each item in its current order, the position it must end up at.
+        Must be a permutation of `range(len(ranks))`.
+
+
+    Returns
+    -------
+    list
+        Moves as `(range_start, range_length, insert_before)` tuples, with
+        the same meaning as in the Spotify Web API "Reorder a Playlist's
+        Items" endpoint. Moves must be applied in order.
+    '''
+    keep = longest_increasing_subsequence(ranks)
+    position = [0] * len(ranks)
+    for i, rank in enumerate(ranks):
+        position[rank] = i
+
+    # An item moved goes right after its predecessor in the target order,
+    # and stays there, so the items moved end up in runs following the last
+    # item left in place before them: their anchor. Every item starts in the
+    # slot of its position, and the ones moved end up in a slot right after
+    # the one of their anchor, so all the slots can be ordered upfront.
+    anchor = []
+    for rank in range(len(ranks)):
+        if rank == 0:
+            anchor.append(-1)
+        elif position[rank - 1] in keep:
+            anchor.append(position[rank - 1])
+        else:
+            anchor.append(anchor[rank - 1])
+
+    moving = [rank for i, rank in enumerate(ranks) if i not in keep]
+    moving.sort()
+
+    slots = sorted([(i, 0, 0) for i in range(len(ranks))]
+                   + [(anchor[rank], 1, rank) for rank in moving])
+    slot_index = {slot: k for k, slot in enumerate(slots)}
+    start_slot = [slot_index[(position[rank], 0, 0)] for rank in range(len(ranks))]
+    end_slot = {rank: slot_index[(anchor[rank], 1, rank)] for rank in moving}
+
+    # Which slots hold an item, to count the items before any of them, i.e.
+    # its current position, as the previous moves shift it.
+    occupied = _Counter(len(slots))
+    for k in start_slot:
+        occupied.add(k, 1)
+
+    moves = []
+
+    i = 0
+    while i < len(moving):
+        rank = moving[i]
+        range_start = occupied.before(start_slot[rank])
+
+        # Extend the range with the following items of the target order, as
+        # long as they are to be moved and follow each other in the list.
+        range_length = 1
+        while i + range_length < len(moving) \
+                and moving[i + range_length] == rank + range_length:
+            previous = start_slot[rank + range_length - 1]
+            following = start_slot[rank + range_length]
+            if following < previous \
+                    or occupied.before(following) - occupied.before(previous) != 1:
+                break
+            range_length += 1
+
+        # Every item preceding `rank` in the target order is already in the
+        # correct relative order, so inserting right after the predecessor
+        # puts the range in its final relative position.
+        insert_before = occupied.before(end_slot[rank])
+
+        if insert_before != range_start:
+            moves.append((range_start, range_length, insert_before))
+
+        # Items not moved already are right after their predecessor, so the
+        # slot they go to holds them at the same position.
+        for moved in range(rank, rank + range_length):
+            occupied.add(start_slot[moved], -1)
+            occupied.add(end_slot[moved], 1)
+
+        i += range_length
+
+    return moves
+
+
+class _Counter:
+    # Binary indexed tree counting the items in a range of slots, both in
+    # logarithmic time.
+
+    def __init__(self, size : int):
+        self.tree = [0] * (size + 1)
+
+    def add(self, slot : int, count : int) -> None:
+        slot += 1
+        while slot < len(self.tree):
+            self.tree[slot] += count
+            slot += slot & -slot
+
+    def before(self, slot : int) -> int:
+        # Number of items in the slots before the given one.
+        total = 0
+        while slot > 0:
+            total += self.tree[slot]
+            slot -= slot & -slot
+        return total
+
+
+def apply_moves(items : list, moves : list) -> list:
+    '''Apply moves to a list, as the API applies them to a playlist.
+
+
+    Parameters
+    ----------
+    items : list
+        Items in their current order.
+
+    moves : list
+        Moves as `(range_start, range_length, insert_before)` tuples, as
+        returned by `plan_moves()` or `plan_insertions()`.
+
+
+    Returns
+    -------
+    list
+        The items, in the order the moves leave them.
+    '''
+    items = list(items)
+    for range_start, range_length, insert_before in moves:
+        chunk = items[range_start:range_start + range_length]
+        del items[range_start:range_start + range_length]
+        if insert_before > range_start:
+            insert_before -= range_length
+        items[insert_before:insert_before] = chunk
+
+    return items
+
+
+def match_ranks(current : list, target : list) -> list:
+    '''Compute the target position of every item of a list.
+
+
+    Parameters
+    ----------
+    current : list
+        Hashable items in their current order.
+
+    target : list
+        The same items in their target order. Repeated items are matched by
+        order of occurrence.
+
+
+    Returns
+    -------
+    list
+        For each item in `current`, its position in `target`. Can be passed
+        to `plan_moves()`.
+    '''
+    positions = collections.defaultdict(collections.deque)
+    for rank, item in enumerate(target):
+        positions[item].append(rank)
+
+    assert len(current) == len(target), 'Lists have different lengths'
+
+    ranks = []
+    for item in current:
+        assert positions[item], F"Unexpected item: {item}"
+        ranks.append(positions[item].popleft())
+
+    return ranks
+
+
+def sorted_prefix_length(keys : list, reverse : bool = False) -> int:
+    '''Find how many items at the beginning of a list are already sorted.
+
+
+    Parameters
+    ----------
+    keys : list
+        Sorting keys of the items, in their current order.
+
+    reverse : bool
+        If `True`, items are sorted in descending order.
+
+
+    Returns
+    -------
+    int
+        Length of the longest sorted prefix.
+    '''
+    for i in range(1, len(keys)):
+        if (keys[i] > keys[i - 1]) if reverse else (keys[i] < keys[i - 1]):
+            return i
+
+    return len(keys)
+
+
+def plan_insertions(keys : list, reverse : bool = False) -> list:
+    '''Plan the moves that sort a list whose only unsorted items are at the
+    end, e.g. new items appended to a sorted list.
+
+    Each item past the sorted prefix is moved, in turn, to the position found
+    by binary search among the items sorted so far, after the items with an
+    equal key. Items of the sorted prefix keep their order.
+
+
+    Parameters
+    ----------
+    keys : list
+        Sorting keys of the items, in their current order, as returned by
+        `sorting.SortKeys.placed()` so that unresolved tracks are placed as
+        when sorting them all.
+
+    reverse : bool
+        If `True`, items are sorted in descending order.
+
+
+    Returns
+    -------
+    list
+        Moves as `(range_start, range_length, insert_before)` tuples, like
+        the ones returned by `plan_moves()`.
+    '''
+    prefix_length = sorted_prefix_length(keys, reverse)
+    placed = list(keys[:prefix_length])
+    moves = []
+
+    for position in range(prefix_length, len(keys)):
+        key = keys[position]
+
+        # Insert after the items with an equal key, like a stable sort would.
+        low, high = 0, len(placed)
+        while low < high:
+            middle = (low + high) // 2
+            if (placed[middle] < key) if reverse else (key < placed[middle]):
+                high = middle
+            else:
+                low = middle + 1
+
+        if low != position:
+            moves.append((position, 1, low))
+
+        placed.insert(low, key)
+
+    return moves
+
+
+def plan_resaves(ranks : list, times : list, now : int, spacing : int = 1) -> tuple:
+    '''Plan which items to remove and add again, and when, to reorder a list
+    ordered by the time items were added, as the library.
+
+    Items belonging to a longest increasing subsequence of the target ranks
+    are left where they are. Every other item is added again with a time
+    between the ones of its neighbours in the target order. When there are
+    not enough seconds between two neighbours for all the items to fit, the
+    upper neighbour is added again too, so the gap widens until they fit.
+
+
+    Parameters
+    ----------
+    ranks : list
+        For each item, from the least to the most recently added, its
+        position in the target order, as returned by `match_ranks()`.
+
+    times : list
+        For each item, when it was added, in seconds since the epoch.
+
+    now : int
+        Current time, in seconds since the epoch. No item is added later.
+
+    spacing : int
+        Seconds between items added again, when there is room for it.
+
+
+    Returns
+    -------
+    tuple
+        Target positions of the items to add again, in increasing order, and
+        the times to add them at, in the same order.
+    '''
+    time_by_rank = {ranks[i]: times[i]
+                    for i in longest_increasing_subsequence(ranks)}
+
+    # Items left in place, as `(rank, time)`, and the ranks of the items to
+    # add again right before each of them.
+    kept = []
+    gaps = []
+    pending = []
+
+    def fits(lower, upper, count):
+        return count == 0 or lower is None or upper - lower > count
+
+    for rank in range(len(ranks)):
+        if rank not in time_by_rank:
+            pending.append(rank)
+            continue
+
+        lower = kept[-1][1] if kept else None
+        if fits(lower, time_by_rank[rank], len(pending)):
+            kept.append((rank, time_by_rank[rank]))
+            gaps.append(pending)
+            pending = []
+        else:
+            pending.append(rank)
+
+    # Items after the last one left in place can be added up to now. If that
+    # is not enough, add the items left in place last again too.
+    while not fits(kept[-1][1] if kept else None, now + 1, len(pending)):
+        rank, _ = kept.pop()
+        pending = gaps.pop() + [rank] + pending
+
+    positions = []
+    resave_times = []
+    bounds = [None] + [time for _, time in kept] + [now + 1]
+    for lower, upper, gap in zip(bounds, bounds[1:], gaps + [pending]):
+        step = spacing if lower is None else \
+            min(spacing, (upper - lower) // (len(gap) + 1))
+        positions.extend(gap)
+        resave_times.extend(upper - (len(gap) - j) * step
+                            for j in range(len(gap)))
+
+    return positions, resave_times
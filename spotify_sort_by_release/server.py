@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+import argparse
+import collections
+import http.server
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+from . import cache
+from . import playlists
+from . import session
+from . import sorting
+from . import users
+from .spotify_sort_by_release import sort_library_by_release, sort_playlist_by_release
+
+
+# Kinds of jobs that can be submitted.
+KINDS = ('library', 'playlist')
+
+# Options a job can have, with their types, see `JobServer.submit()`.
+OPTION_TYPES = {
+    'reversed': bool,
+    'secondary': list,
+    'unresolved': str,
+    'backup': bool,
+    'playlist': str,
+    'inplace': bool,
+    'incremental': bool,
+    'name': str,
+    'description': str,
+    'dedupe': str,
+    'dedupe_policy': str,
+}
+
+
+class JobServer:
+    '''Run sort jobs on behalf of many users, each job with its own OAuth
+    token, in a single process.
+
+    Jobs are run by a pool of worker threads. Every token gets its own
+    session, see `session.Tenant`, so users never share connections,
+    credentials or budgets, while the rate limiter and the overall budget of
+    the application are shared by all of them.
+
+    Workers take jobs from the tokens in turn, so that a user submitting many
+    jobs cannot delay the jobs of the others, and run at most
+    `jobs_per_token` jobs of the same token at the same time.
+
+    The session of a token is closed once it has no job left for
+    `idle_seconds`, and the budget of its period is over.
+
+
+    Parameters
+    ----------
+    workers : int
+        Number of jobs run at the same time.
+
+    jobs_per_token : int
+        Maximum number of jobs of the same token run at the same time.
+
+    max_requests_per_token : int
+        Optional. Maximum number of requests sent on behalf of a token, over
+        all its jobs, in every `budget_period`.
+
+    keep_jobs : int
+        Number of finished jobs whose status is kept. Older ones are
+        forgotten.
+
+    budget_period : float
+        Number of seconds after which a token gets a new budget of
+        `max_requests_per_token`.
+
+    idle_seconds : float
+        Number of seconds after its last job finished the session of a token
+        is closed, if no other job was submitted for it.
+    '''
+
+    def __init__(self, workers : int = 4, jobs_per_token : int = 1,
+                 max_requests_per_token : int = None, keep_jobs : int = 1000,
+                 budget_period : float = 3600., idle_seconds : float = 600.):
+        self.workers = workers
+        self.jobs_per_token = jobs_per_token
+        self.max_requests_per_token = max_requests_per_token
+        self.keep_jobs = keep_jobs
+        self.budget_period = budget_period
+        self.idle_seconds = idle_seconds
+
+        self.jobs = {}
+        self.tenants = {}
+
+        # When the tokens without any job became idle, the oldest first.
+        self._idle_since = collections.OrderedDict()
+
+        # Identifiers of the finished jobs, the oldest first.
+        self._finished = collections.deque()
+
+        # Pending jobs by token, the next token to serve first.
+        self._queues = collections.OrderedDict()
+        self._running = collections.Counter()
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._threads = []
+
+    def start(self) -> None:
+        '''Start the workers.'''
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=F"job-worker-{i}",
+                                      daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        '''Stop the workers once they are done with their current job. Pending
+        jobs are left pending.'''
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+
+        for thread in self._threads:
+            thread.join()
+
+        for tenant in self.tenants.values():
+            tenant.close()
+
+    def submit(self, token : str, kind : str, options : dict = None) -> dict:
+        '''Queue a job.
+
+
+        Parameters
+        ----------
+        token : str
+            OAuth token of the user the job runs for.
+
+        kind : str
+            `'library'` or `'playlist'`.
+
+        options : dict
+            Options of the job: `reversed`, `secondary`, `unresolved`, and
+            for the library `backup`, for playlists the `playlist` identifier
+            (required), `inplace`, `incremental`, `name`, `description`,
+            `dedupe` and `dedupe_policy`.
+
+
+        Returns
+        -------
+        dict
+            Status of the job, see `status()`.
+
+
+        Raises
+        ------
+        ValueError
+            If the job is not valid.
+        '''
+        if not isinstance(options or {}, dict):
+            raise ValueError('Options must be an object')
+        options = dict(options or {})
+        unknown = set(options) - set(OPTION_TYPES)
+        if unknown:
+            raise ValueError(F"Unknown options: {sorted(unknown)}")
+        for name, value in options.items():
+            if value is not None and not isinstance(value, OPTION_TYPES[name]):
+                raise ValueError(F"Bad option {name}: expected "
+                                 F"{OPTION_TYPES[name].__name__}")
+        if not all(isinstance(key, str) for key in options.get('secondary') or ()):
+            raise ValueError('Bad option secondary: expected names of keys')
+
+        if not token:
+            raise ValueError('Missing token')
+        if kind not in KINDS:
+            raise ValueError(F"Bad kind of job: {kind}, expected one of {KINDS}")
+        if kind == 'playlist' and not options.get('playlist'):
+            raise ValueError('Missing playlist')
+        if options.get('unresolved', 'last') not in sorting.UNRESOLVED_POSITIONS:
+            raise ValueError(F"Bad position of unresolved tracks: {options['unresolved']}")
+        if options.get('dedupe') not in (None, *sorting.DEDUPE_KEYS):
+            raise ValueError(F"Bad field to dedupe by: {options['dedupe']}")
+        if options.get('dedupe_policy', 'first') not in sorting.DEDUPE_POLICIES:
+            raise ValueError(F"Bad policy to dedupe by: {options['dedupe_policy']}")
+        unknown = set(options.get('secondary') or ()) - set(sorting.SECONDARY_KEYS)
+        if unknown:
+            raise ValueError(F"Unknown secondary keys: {sorted(unknown)}")
+
+        job = {
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'options': options,
+            'status': 'queued',
+            'user': None,
+            'result': None,
+            'error': None,
+            'requests': 0,
+            'submitted_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+        }
+
+        with self._condition:
+            self.jobs[job['id']] = job
+            self._queues.setdefault(token, collections.deque()).append(job)
+            self._idle_since.pop(token, None)
+            self._condition.notify()
+
+        return self.status(job['id'])
+
+    def status(self, job_id : str) -> dict:
+        '''Get the status of a job.
+
+
+        Parameters
+        ----------
+        job_id : str
+            Identifier of the job, as returned by `submit()`.
+
+
+        Returns
+        -------
+        dict
+            The job: its `id`, `kind`, `options`, `status` (`'queued'`,
+            `'running'`, `'done'` or `'failed'`), the `user` it runs for, its
+            `result` or `error`, the number of `requests` it sent and when it
+            was `submitted_at`, `started_at` and `finished_at`, in seconds
+            since the epoch. The token is not included.
+
+
+        Raises
+        ------
+        KeyError
+            If there is no such job, or it finished long enough ago to be
+            forgotten.
+        '''
+        with self._condition:
+            return dict(self.jobs[job_id])
+
+    def statuses(self) -> list:
+        '''Get the status of all the jobs, in the order they were submitted.
+        See `status()`.'''
+        with self._condition:
+            return [dict(job) for job in self.jobs.values()]
+
+    def stats(self) -> dict:
+        '''Get the number of jobs by status, and of requests sent.
+
+
+        Returns
+        -------
+        dict
+            Number of jobs by `status`, number of `tokens` with an open
+            session, and number of `requests` sent overall, with the overall
+            `budget`.
+        '''
+        with self._condition:
+            statuses = collections.Counter(job['status'] for job in self.jobs.values())
+            return {
+                'jobs': dict(statuses),
+                'tokens': len(self.tenants),
+                'requests': session.requests_sent,
+                'budget': session.budget,
+            }
+
+    def _next_job(self) -> tuple:
+        # The first token in line with a pending job and a free slot, which
+        # then goes to the end of the line. Called with the condition held.
+        for token, queue in self._queues.items():
+            if self._running[token] < self.jobs_per_token:
+                job = queue.popleft()
+                if queue:
+                    self._queues.move_to_end(token)
+                else:
+                    del self._queues[token]
+                return token, job
+
+        return None, None
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopping:
+                    token, job = self._next_job()
+                    if job is not None:
+                        break
+                    self._condition.wait()
+                else:
+                    return
+
+                self._running[token] += 1
+                self._idle_since.pop(token, None)
+                if token not in self.tenants:
+                    self.tenants[token] = session.Tenant(
+                        token, max_requests=self.max_requests_per_token,
+                        period=self.budget_period)
+                tenant = self.tenants[token]
+                job['status'] = 'running'
+                job['started_at'] = time.time()
+
+            try:
+                with session.use(tenant):
+                    self._run(job, tenant)
+            finally:
+                with self._condition:
+                    self._running[token] -= 1
+                    if not self._running[token]:
+                        del self._running[token]
+                        if token not in self._queues:
+                            self._idle_since[token] = time.monotonic()
+                    if job['status'] == 'running':
+                        job['status'] = 'failed'
+                    job['finished_at'] = time.time()
+                    self._forget(job)
+                    idle = self._evict()
+                    self._condition.notify_all()
+
+                for tenant in idle:
+                    tenant.close()
+
+            print(F"[+] Job {job['id']} ({job['kind']}, {job['user']}): "
+                  F"{job['status']} after {job['requests']} requests"
+                  + (F": {job['error']}" if job['error'] else ''), flush=True)
+
+    def _forget(self, job : dict) -> None:
+        # Record a job as finished, and forget the oldest finished jobs past
+        # the ones to keep. Called with the condition held.
+        self._finished.append(job['id'])
+        while len(self._finished) > self.keep_jobs:
+            del self.jobs[self._finished.popleft()]
+
+    def _evict(self) -> list:
+        # Forget the tenants idle for long enough, and return them to be
+        # closed. A tenant is kept until its budget is renewed, lest a new one
+        # comes with a full budget. Called with the condition held.
+        idle_seconds = max(self.idle_seconds, self.budget_period or 0)
+        now = time.monotonic()
+        idle = []
+        while self._idle_since:
+            token, since = next(iter(self._idle_since.items()))
+            if now - since < idle_seconds:
+                break
+            del self._idle_since[token]
+            idle.append(self.tenants.pop(token))
+        return idle
+
+    def _run(self, job : dict, tenant : session.Tenant) -> None:
+        # Run a job on behalf of the current tenant, and record its outcome.
+        requests_sent = tenant.requests_sent
+
+        try:
+            user = users.get_current_user()
+            job['user'] = user['id']
+            args = make_args(job['kind'], job['options'], user)
+
+            if job['kind'] == 'library':
+                sort_library_by_release(args)
+                # A resumed sort only finishes the interrupted one.
+                job['result'] = {'resumed': args.resume}
+            else:
+                args.playlist = playlists.get_playlist(job['options']['playlist'])
+                job['result'] = {'tracks': sort_playlist_by_release(args)}
+
+            job['status'] = 'done'
+
+        except Exception as e:
+            # Whatever goes wrong, the worker must go on with the next job.
+            job['status'] = 'failed'
+            job['error'] = F"{type(e).__name__}: {e}"
+
+        finally:
+            job['requests'] = tenant.requests_sent - requests_sent
+
+
+def make_args(kind : str, options : dict, user : dict) -> argparse.Namespace:
+    '''Make the arguments of `sort_library_by_release()` or
+    `sort_playlist_by_release()` for a job.
+
+
+    Parameters
+    ----------
+    kind : str
+        `'library'` or `'playlist'`.
+
+    options : dict
+        Options of the job, see `JobServer.submit()`.
+
+    user : dict
+        The user the job runs for, as per the Spotify Web API documentation.
+        Every user gets their own journal, and a sort of theirs that was
+        interrupted is resumed before any other.
+
+
+    Returns
+    -------
+    Namespace
+        The arguments, without the playlist.
+    '''
+    journal = os.path.join(cache.directory(), F"library-journal-{user['id']}.jsonl")
+
+    return argparse.Namespace(
+        yes=True, plan=False, snapshot=None, resume=os.path.exists(journal),
+        reversed=bool(options.get('reversed')),
+        secondary=list(options.get('secondary') or sorting.DEFAULT_SECONDARY_KEYS),
+        unresolved=options.get('unresolved') or 'last',
+        backup=bool(options.get('backup')),
+        journal=journal,
+        inplace=bool(options.get('inplace') or options.get('incremental')),
+        incremental=bool(options.get('incremental')),
+        name=options.get('name') or 'SORTED',
+        description=options.get('description') or '',
+        dedupe=options.get('dedupe'),
+        dedupe_policy=options.get('dedupe_policy') or 'first',
+        playlist=None)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status : int, data) -> None:
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            if self.path.rstrip('/') != '/jobs':
+                raise KeyError(self.path)
+            body = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(body, dict):
+                raise ValueError('Job must be an object')
+            # The token comes from the same header as for the Web API.
+            token = self.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+            job = self.server.jobs.submit(token, body.get('kind'), body.get('options'))
+        except KeyError:
+            self._reply(404, {'error': F"Not found: {self.path}"})
+        except ValueError as e:
+            self._reply(400, {'error': str(e)})
+        else:
+            self._reply(202, job)
+
+    def do_GET(self):
+        match = re.fullmatch(r'/jobs/([0-9a-f]+)', self.path)
+        try:
+            if match:
+                self._reply(200, self.server.jobs.status(match.group(1)))
+            elif self.path.rstrip('/') == '/jobs':
+                self._reply(200, self.server.jobs.statuses())
+            elif self.path == '/stats':
+                self._reply(200, self.server.jobs.stats())
+            else:
+                raise KeyError(self.path)
+        except KeyError:
+            self._reply(404, {'error': F"Not found: {self.path}"})
+
+
+def serve(jobs : JobServer, host : str = '127.0.0.1', port : int = 8080) -> http.server.HTTPServer:
+    '''Accept jobs over HTTP, in a background thread.
+
+    `POST /jobs` queues a job, described by a JSON object with its `kind` and
+    `options`, see `JobServer.submit()`, for the OAuth token passed in the
+    `Authorization: Bearer` header. `GET /jobs/<id>` returns the status of a
+    job, `GET /jobs` the ones of all the jobs and `GET /stats` the counts of
+    `JobServer.stats()`.
+
+
+    Parameters
+    ----------
+    jobs : JobServer
+        The server running the jobs.
+
+    host : str
+        Address to listen on. Defaults to localhost: tokens are received in
+        clear.
+
+    port : int
+        Port to listen on. 0 means any free port.
+
+
+    Returns
+    -------
+    HTTPServer
+        The HTTP server, whose `server_port` is the port it listens on.
+    '''
+    server = http.server.ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.jobs = jobs
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser('Serve sort jobs for many users.')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--jobs', type=int, default=4,
+                        help='Number of jobs run at the same time')
+    parser.add_argument('--jobs-per-token', type=int, default=1,
+                        help='Number of jobs of the same token run at the same time')
+    parser.add_argument('-w', '--workers', type=int, default=4,
+                        help='Maximum number of pages fetched concurrently by a job')
+    parser.add_argument('--max-requests', type=int, default=None,
+                        help='Maximum number of requests sent overall')
+    parser.add_argument('--max-requests-per-token', type=int, default=None,
+                        help='Maximum number of requests sent for the same token '
+                             'in every budget period')
+    parser.add_argument('--budget-period', type=float, default=3600.,
+                        help='Number of seconds after which a token gets a new budget')
+    parser.add_argument('--idle-seconds', type=float, default=600.,
+                        help='Number of seconds after which the session of a '
+                             'token without jobs is closed')
+    parser.add_argument('--api-url', type=str, default=None,
+                        help='Base URL of the API, e.g. of a mock server')
+    parser.add_argument('--keep-jobs', type=int, default=1000,
+                        help='Number of finished jobs whose status is kept')
+    args = parser.parse_args()
+
+    # The module-level session is not used: every job runs on the session
+    # of its token.
+    session.init('', max_workers=args.workers, max_requests=args.max_requests,
+                 pool_size=args.workers * args.jobs_per_token,
+                 api_url=args.api_url)
+
+    jobs = JobServer(args.jobs, args.jobs_per_token, args.max_requests_per_token,
+                     args.keep_jobs, args.budget_period, args.idle_seconds)
+    jobs.start()
+    server = serve(jobs, args.host, args.port)
+
+    # The first line of the output is the URL to connect to.
+    print(F"http://{args.host}:{server.server_port}", flush=True)
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        jobs.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,952 @@
 # -*- coding: utf8 -*-
+import asyncio
+import concurrent.futures
+import contextlib
+import contextvars
+import datetime
+import email.utils
+import json
+import math
+import random
 import requests
+import threading
+import time
+import urllib3
+import weakref
 
+from . import httpcache
+from . import metrics
+
+
+class RateLimiter:
+    '''Adaptive token bucket shared by all the requests to the API.
+
+    Tokens are refilled at `rate` requests per second. The rate grows
+    additively while requests succeed and is halved when the API answers with
+    `429 Too Many Requests`, in which case no request is let through until
+    the `Retry-After` delay is over. A burst of throttled requests, sent
+    before the rate went down, only halves the rate once: the rate is halved
+    at most once per `window`.
+
+
+    Parameters
+    ----------
+    rate : float
+        Initial number of requests per second.
+
+    min_rate : float
+        Lower bound for the rate.
+
+    max_rate : float
+        Upper bound for the rate.
+
+    increase : float
+        Requests per second added to the rate on every success.
+
+    burst : float
+        Maximum number of tokens that can be accumulated.
+
+    window : float
+        Minimum number of seconds between two decreases of the rate.
+    '''
+
+    def __init__(self, rate=10., min_rate=.5, max_rate=50., increase=1.,
+                 burst=5., window=1.):
+        self.rate = float(rate)
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.increase = float(increase)
+        self.burst = float(burst)
+        self.window = float(window)
+
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.
+        self._decreased_at = None
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        '''Wait until a request can be sent.
+
+
+        Returns
+        -------
+        float
+            Number of seconds spent waiting.
+        '''
+        waited = 0.
+
+        while delay := self._take():
+            time.sleep(delay)
+            waited += delay
+
+        return waited
+
+    async def aacquire(self) -> float:
+        '''Wait until a request can be sent, without blocking the event loop.
+
+
+        Returns
+        -------
+        float
+            Number of seconds spent waiting.
+        '''
+        waited = 0.
+
+        while delay := self._take():
+            await asyncio.sleep(delay)
+            waited += delay
+
+        return waited
+
+    def _take(self) -> float:
+        # Take a token if possible. Otherwise, tell how long to wait for one.
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst,
+                self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+
+            if now >= self._paused_until and self._tokens >= 1:
+                self._tokens -= 1
+                return 0.
+
+            return max(self._paused_until - now,
+                       (1 - self._tokens) / self.rate)
+
+    def success(self) -> None:
+        '''Record a successful request, increasing the rate.'''
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def throttled(self, retry_after : float = None) -> None:
+        '''Record a throttled request, decreasing the rate.
+
+
+        Parameters
+        ----------
+        retry_after : float
+            Optional. Number of seconds to wait before the next request, as
+            found in the `Retry-After` header.
+        '''
+        with self._lock:
+            now = time.monotonic()
+            if self._decreased_at is None or now - self._decreased_at >= self.window:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._decreased_at = now
+            self._tokens = 0.
+
+            # `Retry-After: 0` still is a header.
+            if retry_after is not None:
+                self._paused_until = max(self._paused_until, now + retry_after)
+
+
+    def estimate(self, count : int) -> float:
+        '''Estimate how long sending requests one after the other would take,
+        assuming none of them is throttled.
+
+
+        Parameters
+        ----------
+        count : int
+            Number of requests.
+
+
+        Returns
+        -------
+        float
+            Number of seconds spent waiting for the limiter.
+        '''
+        with self._lock:
+            rate, tokens = self.rate, self.burst
+
+        waited = 0.
+        for _ in range(count):
+            if tokens < 1:
+                waited += (1 - tokens) / rate
+                tokens = 1.
+            tokens -= 1
+            rate = min(self.max_rate, rate + self.increase)
+
+        return waited
+
+
+class BudgetExhausted(Exception):
+    '''Raised when a request would exceed the maximum number of requests.'''
+
+
+# Base URL of the Spotify Web API.
+API_URL = 'https://api.spotify.com/v1'
 
 s = requests.Session()
 
+limiter = RateLimiter()
+
+stats = metrics.RequestMetrics()
+
+# Responses to GET requests, revalidated with conditional requests. `None`
+# means no caching.
+responses = httpcache.ResponseCache()
+
+# Maximum number of requests to send, shared by all threads. `None` means no
+# limit.
+budget = None
+requests_sent = 0
+_budget_lock = threading.Lock()
+
+# Maximum number of pages fetched concurrently by `get_paged()`.
+workers = 8
+
+# Maximum number of attempts for a single request.
+max_attempts = 6
+
+# Seconds to wait for a connection to the API, and for a response once
+# connected.
+timeouts = (5., 30.)
+
+# Maximum number of connections kept open to the API.
+connections = 10
+
+# Times a request is silently repeated by the transport when a connection
+# fails, e.g. because the API closed an idle keep-alive connection, before
+# `request()` counts it as a failed attempt.
+transport_retries = 2
+
+# Methods that can be safely repeated after a server error.
+IDEMPOTENT_METHODS = ('GET', 'PUT', 'DELETE')
+
+# Write requests recorded instead of being sent, by thread, see `plan()`.
+_planning = threading.local()
+
+# Asynchronous clients and semaphores, by event loop, see `aclient()`.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+class Tenant:
+    '''Credentials, connections, budget and metrics of one user, for a
+    process sending requests on behalf of many users.
+
+    Requests sent within `use()` go through the tenant instead of the
+    module-level session. The rate limiter, the cache of responses and the
+    overall budget are still shared by all tenants.
+
+
+    Parameters
+    ----------
+    oauth : str
+        OAuth token of the user.
+
+    max_requests : int
+        Optional. Maximum number of requests to send for this user in every
+        `period`, on top of the overall `budget`.
+
+    period : float
+        Optional. Number of seconds after which the user gets a new budget of
+        `max_requests`. Defaults to never.
+    '''
+
+    def __init__(self, oauth : str, max_requests : int = None, period : float = None):
+        self.s = requests.Session()
+        _configure(self.s, oauth)
 
-def init(oauth):
-    s.headers.update({
+        self.stats = metrics.RequestMetrics()
+        self.budget = max_requests
+        self.period = period
+        self.requests_sent = 0
+        # Requests sent since the current period started.
+        self.period_requests = 0
+        self.period_started = time.monotonic()
+        self.async_clients = weakref.WeakKeyDictionary()
+
+    def close(self) -> None:
+        '''Close the connections of the tenant.'''
+        self.s.close()
+
+
+# Tenant whose requests are being sent, see `use()`. `None` means the
+# module-level session.
+_tenant = contextvars.ContextVar('tenant', default=None)
+
+
+@contextlib.contextmanager
+def use(tenant : Tenant):
+    '''Send the requests made in the current thread or task on behalf of a
+    tenant. Threads started by `get_paged()` inherit it.
+
+
+    Parameters
+    ----------
+    tenant : Tenant
+        The tenant, or `None` for the module-level session.
+    '''
+    token = _tenant.set(tenant)
+    try:
+        yield tenant
+    finally:
+        _tenant.reset(token)
+
+
+def bind(function):
+    '''Make a function run on behalf of the current tenant, whatever thread
+    calls it, e.g. when submitted to a thread pool.
+
+
+    Parameters
+    ----------
+    function : callable
+        The function.
+
+
+    Returns
+    -------
+    callable
+        The function, bound to the current tenant.
+    '''
+    tenant = _tenant.get()
+    if tenant is None:
+        return function
+
+    def bound(*args, **kwargs):
+        with use(tenant):
+            return function(*args, **kwargs)
+
+    return bound
+
+
+def _http() -> requests.Session:
+    # Session of the current tenant.
+    tenant = _tenant.get()
+    return s if tenant is None else tenant.s
+
+
+def _stats() -> metrics.RequestMetrics:
+    # Metrics of the current tenant.
+    tenant = _tenant.get()
+    return stats if tenant is None else tenant.stats
+
+
+def init(oauth, max_workers=None, max_requests=None, pool_size=None,
+         api_url=None, timeout=None):
+    '''Configure the session.
+
+
+    Parameters
+    ----------
+    oauth : str
+        OAuth token.
+
+    max_workers : int
+        Optional. Maximum number of pages fetched concurrently.
+
+    max_requests : int
+        Optional. Maximum number of requests to send overall.
+
+    pool_size : int
+        Optional. Maximum number of requests sent at the same time, by all
+        threads. Defaults to `max_workers`.
+
+    api_url : str
+        Optional. Base URL of the API.
+
+    timeout : tuple
+        Optional. Seconds to wait for a connection and for a response.
+    '''
+    global workers, budget, API_URL, timeouts, connections
+
+    if max_workers is not None:
+        assert max_workers >= 1, F"Bad number of workers: {max_workers}"
+        workers = int(max_workers)
+
+    budget = max_requests
+
+    if api_url is not None:
+        API_URL = api_url.rstrip('/')
+
+    if timeout is not None:
+        timeouts = tuple(timeout)
+
+    # Keep a connection open for each thread that may send requests at the
+    # same time, instead of discarding the ones exceeding the default pool.
+    connections = max(10, pool_size or workers)
+
+    _configure(s, oauth)
+
+
+def _configure(http : requests.Session, oauth : str) -> None:
+    # Set the headers of a session, and the pool and retries of its
+    # connections.
+    http.headers.update({
         'Authorization': f"Bearer {oauth}",
         'Content-Type': 'application/json',
         'Accept': 'application/json',
+        'Accept-Encoding': 'gzip',
     })
+
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=1, pool_maxsize=connections,
+        max_retries=urllib3.util.Retry(
+            total=transport_retries, connect=transport_retries,
+            read=transport_retries, status=0, other=0,
+            # Only reads are repeated when the response was lost. Status
+            # codes are left to `request()`, which knows about rate limits.
+            allowed_methods=frozenset(['GET']), raise_on_status=False,
+            respect_retry_after_header=False, backoff_factor=.1))
+    http.mount('https://', adapter)
+    http.mount('http://', adapter)
+
+
+def async_client():
+    '''Make an asynchronous HTTP client configured like the session of the
+    current tenant, with as many connections, the same headers and the same
+    timeouts.
+
+    Requires `httpx`, which is installed with the `async` extra.
+
+
+    Returns
+    -------
+    httpx.AsyncClient
+        The client. It must be closed by the caller.
+    '''
+    try:
+        import httpx
+    except ImportError as e:
+        raise ImportError('The asynchronous client requires httpx, install '
+                          'spotify-sort-by-release[async]') from e
+
+    return httpx.AsyncClient(
+        headers={key: value for key, value in _http().headers.items()
+                 if key.lower() != 'connection'},
+        timeout=httpx.Timeout(timeouts[1], connect=timeouts[0]),
+        limits=httpx.Limits(max_connections=connections,
+                            max_keepalive_connections=connections),
+        transport=httpx.AsyncHTTPTransport(retries=transport_retries))
+
+
+def request(method : str, url : str, idempotent : bool = None,
+            **kwargs) -> requests.Response:
+    '''Send a request to the API, complying with its rate limits.
+
+    Throttled requests (`429 Too Many Requests`) are always retried, since the
+    API did not process them. Server errors, connection failures and timeouts
+    are retried, with exponential backoff and jitter, only for idempotent requests.
+
+
+    Parameters
+    ----------
+    method : str
+        HTTP method.
+
+    url : str
+        URL of the request.
+
+    idempotent : bool
+        Whether the request can be repeated safely. Defaults to `True` for
+        GET, PUT and DELETE requests.
+
+    kwargs
+        Additional arguments for `requests.Session.request()`.
+
+
+    Returns
+    -------
+    requests.Response
+        The response to the last attempt.
+
+
+    Raises
+    ------
+    BudgetExhausted
+        If the maximum number of requests was reached.
+    '''
+    planned = _plan(method, url, kwargs)
+    if planned is not None:
+        return planned
+
+    endpoint, idempotent, bytes_sent = _prepare(method, url, idempotent, kwargs)
+    key, cached = _conditional(method, url, kwargs)
+
+    for attempt in range(1, max_attempts + 1):
+        _spend_budget()
+        _stats().record_wait(limiter.acquire())
+
+        started_at = time.perf_counter()
+        try:
+            response = _http().request(method, url, **{'timeout': timeouts, **kwargs})
+        except (requests.ConnectionError, requests.Timeout) as e:
+            backoff = _outcome(endpoint, attempt, idempotent, started_at,
+                               bytes_sent, error=e)
+        else:
+            backoff = _outcome(endpoint, attempt, idempotent, started_at,
+                               bytes_sent, response=response)
+            if backoff is None:
+                return _revalidated(key, cached, response)
+
+        time.sleep(backoff)
+        _stats().record_wait(backoff, backoff=True)
+
+
+async def arequest(method : str, url : str, idempotent : bool = None,
+                   **kwargs):
+    '''Send a request to the API, complying with its rate limits, without
+    blocking the event loop. See `request()`.
+
+    Requests are sent with the client of the running event loop, see
+    `aclient()`. At most `connections` of them are in flight at any time.
+
+
+    Parameters
+    ----------
+    method : str
+        HTTP method.
+
+    url : str
+        URL of the request.
+
+    idempotent : bool
+        Whether the request can be repeated safely. Defaults to `True` for
+        GET, PUT and DELETE requests.
+
+    kwargs
+        Additional arguments: `params` and `data`, as for `request()`.
+
+
+    Returns
+    -------
+    httpx.Response
+        The response to the last attempt.
+
+
+    Raises
+    ------
+    BudgetExhausted
+        If the maximum number of requests was reached.
+    '''
+    import httpx
+
+    planned = _plan(method, url, kwargs)
+    if planned is not None:
+        return planned
+
+    endpoint, idempotent, bytes_sent = _prepare(method, url, idempotent, kwargs)
+    key, cached = _conditional(method, url, kwargs)
+    client, semaphore = aclient()
+
+    for attempt in range(1, max_attempts + 1):
+        _spend_budget()
+        _stats().record_wait(await limiter.aacquire())
+
+        async with semaphore:
+            started_at = time.perf_counter()
+            try:
+                response = await client.request(method, url,
+                                                params=kwargs.get('params'),
+                                                headers=kwargs.get('headers'),
+                                                content=kwargs.get('data'))
+            except httpx.TransportError as e:
+                backoff = _outcome(endpoint, attempt, idempotent, started_at,
+                                   bytes_sent, error=e)
+            else:
+                backoff = _outcome(endpoint, attempt, idempotent, started_at,
+                                   bytes_sent, response=response)
+                if backoff is None:
+                    return _revalidated(key, cached, response)
+
+        await asyncio.sleep(backoff)
+        _stats().record_wait(backoff, backoff=True)
+
+
+def aclient() -> tuple:
+    '''Get the asynchronous client of the running event loop and of the
+    current tenant, along with the semaphore limiting the requests in flight.
+    Both are made on first use, see `async_client()`.
+
+
+    Returns
+    -------
+    tuple
+        The `httpx.AsyncClient` and the `asyncio.Semaphore`.
+    '''
+    clients = _clients()
+    loop = asyncio.get_running_loop()
+    if loop not in clients:
+        clients[loop] = (async_client(), asyncio.Semaphore(connections))
+
+    return clients[loop]
+
+
+async def aclose() -> None:
+    '''Close the asynchronous client of the running event loop and of the
+    current tenant, if any.'''
+    client, _ = _clients().pop(asyncio.get_running_loop(), (None, None))
+    if client is not None:
+        await client.aclose()
+
+
+def _clients() -> weakref.WeakKeyDictionary:
+    # Asynchronous clients of the current tenant, by event loop.
+    tenant = _tenant.get()
+    return _async_clients if tenant is None else tenant.async_clients
+
+
+def _plan(method : str, url : str, kwargs : dict):
+    # Record a request instead of sending it, if planning. See `plan()`.
+    planned = getattr(_planning, 'requests', None)
+    if planned is None or method.upper() == 'GET':
+        return None
+
+    planned.append({'method': method.upper(), 'url': url,
+                    'endpoint': metrics.endpoint_template(method, url, API_URL),
+                    'body': json.loads(kwargs['data']) if kwargs.get('data') else None})
+    return _planned_response(method)
+
+
+def _prepare(method : str, url : str, idempotent : bool, kwargs : dict) -> tuple:
+    # Endpoint, idempotency and size of the body of a request.
+    if idempotent is None:
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+
+    data = kwargs.get('data') or b''
+    bytes_sent = len(data.encode() if isinstance(data, str) else data)
+
+    return metrics.endpoint_template(method, url, API_URL), idempotent, bytes_sent
+
+
+def _conditional(method : str, url : str, kwargs : dict) -> tuple:
+    # Key and cached response of a GET request, which is made conditional if
+    # there is a cached response.
+    if responses is None or method.upper() != 'GET':
+        return None, None
+
+    key = responses.key(url, kwargs.get('params'),
+                        _http().headers.get('Authorization', ''))
+    cached = responses.get(key)
+
+    if cached is not None:
+        headers = dict(kwargs.get('headers') or {})
+        if cached.etag:
+            headers['If-None-Match'] = cached.etag
+        if cached.last_modified:
+            headers['If-Modified-Since'] = cached.last_modified
+        kwargs['headers'] = headers
+
+    return key, cached
+
+
+def _revalidated(key : str, cached : httpcache.Entry, response):
+    # Serve the cached response if it did not change, cache the new one
+    # otherwise.
+    if key is None:
+        return response
+
+    if response.status_code == requests.codes.NOT_MODIFIED and cached is not None:
+        revalidated = requests.Response()
+        revalidated.status_code = requests.codes.OK
+        revalidated.encoding = 'utf-8'
+        revalidated._content = cached.body
+        return revalidated
+
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if response.status_code == requests.codes.OK and (etag or last_modified):
+        responses.put(key, httpcache.Entry(etag, last_modified, response.content))
+
+    return response
+
+
+def _spend_budget() -> None:
+    global requests_sent
+
+    tenant = _tenant.get()
+    with _budget_lock:
+        if budget is not None and requests_sent >= budget:
+            raise BudgetExhausted(F"Sent the maximum of {budget} requests")
+        if tenant is not None and tenant.period is not None \
+                and time.monotonic() - tenant.period_started >= tenant.period:
+            tenant.period_started = time.monotonic()
+            tenant.period_requests = 0
+        if tenant is not None and tenant.budget is not None \
+                and tenant.period_requests >= tenant.budget:
+            raise BudgetExhausted(F"Sent the maximum of {tenant.budget} "
+                                  F"requests for this user"
+                                  + (F" in {tenant.period:g} seconds"
+                                     if tenant.period is not None else ''))
+        requests_sent += 1
+        if tenant is not None:
+            tenant.requests_sent += 1
+            tenant.period_requests += 1
+
+
+def _outcome(endpoint : str, attempt : int, idempotent : bool, started_at : float,
+             bytes_sent : int, response=None, error : Exception = None) -> float:
+    '''Record an attempt to send a request, and decide whether to retry it.
+
+
+    Parameters
+    ----------
+    endpoint : str
+        Endpoint of the request, see `metrics.endpoint_template()`.
+
+    attempt : int
+        Number of the attempt, from 1.
+
+    idempotent : bool
+        Whether the request can be repeated safely.
+
+    started_at : float
+        When the attempt started, as per `time.perf_counter()`.
+
+    bytes_sent : int
+        Size of the body of the request.
+
+    response : requests.Response or httpx.Response
+        The response, if any.
+
+    error : Exception
+        The failure, if there is no response.
+
+
+    Returns
+    -------
+    float
+        Seconds to wait before trying again, or `None` if the response is to
+        be returned.
+
+
+    Raises
+    ------
+    Exception
+        The failure, if the request cannot be tried again.
+    '''
+    last_attempt = attempt == max_attempts
+    seconds = time.perf_counter() - started_at
+
+    if error is not None:
+        _stats().record(endpoint, type(error).__name__, seconds, bytes_sent,
+                        retry=attempt > 1)
+        if not idempotent or last_attempt:
+            raise error
+
+    else:
+        # As transferred, i.e. compressed if it was.
+        bytes_received = int(response.headers.get('Content-Length')
+                             or len(response.content))
+        _stats().record(endpoint, response.status_code, seconds, bytes_sent,
+                        bytes_received, retry=attempt > 1)
+
+        if response.status_code == requests.codes.TOO_MANY_REQUESTS:
+            retry_after = _retry_after(response.headers.get('Retry-After'))
+            limiter.throttled(retry_after)
+            if last_attempt:
+                return None
+            # The limiter already waits for the API to be ready again, if it
+            # was told when. Otherwise, back off.
+            if retry_after is not None:
+                return 0.
+
+        elif response.status_code < 500:
+            limiter.success()
+            return None
+
+        elif not idempotent or last_attempt:
+            # The error is returned, without counting as a success.
+            return None
+
+    return random.uniform(0, min(30., .5 * 2 ** attempt))
+
+
+def _retry_after(header : str) -> float:
+    # Seconds to wait as per a `Retry-After` header, either a number of
+    # seconds or an HTTP date. `None` if there is no header or it cannot be
+    # read.
+    if header is None:
+        return None
+
+    try:
+        seconds = float(header)
+    except ValueError:
+        try:
+            date = email.utils.parsedate_to_datetime(header)
+        except (TypeError, ValueError):
+            return None
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=datetime.timezone.utc)
+        seconds = (date - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+
+    return max(0., seconds) if math.isfinite(seconds) else None
+
+
+@contextlib.contextmanager
+def plan():
+    '''Record the requests that would modify anything instead of sending
+    them, in the current thread. Requests reading data are still sent.
+
+    Recorded requests get a made up successful response, whose body has
+    placeholder `id` and `snapshot_id` fields.
+
+
+    Yields
+    ------
+    list
+        The recorded requests, as dictionaries with the `method`, `url`,
+        `endpoint` (see `metrics.endpoint_template()`) and JSON `body`.
+    '''
+    planned = []
+    _planning.requests = planned
+    try:
+        yield planned
+    finally:
+        _planning.requests = None
+
+
+def _planned_response(method : str) -> requests.Response:
+    response = requests.Response()
+    response.status_code = requests.codes.CREATED if method.upper() == 'POST' \
+        else requests.codes.OK
+    response._content = json.dumps({'id': 'planned',
+                                    'snapshot_id': 'planned'}).encode()
+    return response
+
+
+def get(url : str, **kwargs) -> requests.Response:
+    '''Send a GET request. See `request()`.'''
+    return request('GET', url, **kwargs)
+
+
+def post(url : str, **kwargs) -> requests.Response:
+    '''Send a POST request. See `request()`.'''
+    return request('POST', url, **kwargs)
+
+
+def put(url : str, **kwargs) -> requests.Response:
+    '''Send a PUT request. See `request()`.'''
+    return request('PUT', url, **kwargs)
+
+
+def delete(url : str, **kwargs) -> requests.Response:
+    '''Send a DELETE request. See `request()`.'''
+    return request('DELETE', url, **kwargs)
+
+
+async def aget(url : str, **kwargs):
+    '''Send a GET request. See `arequest()`.'''
+    return await arequest('GET', url, **kwargs)
+
+
+async def apost(url : str, **kwargs):
+    '''Send a POST request. See `arequest()`.'''
+    return await arequest('POST', url, **kwargs)
+
+
+async def aput(url : str, **kwargs):
+    '''Send a PUT request. See `arequest()`.'''
+    return await arequest('PUT', url, **kwargs)
+
+
+async def adelete(url : str, **kwargs):
+    '''Send a DELETE request. See `arequest()`.'''
+    return await arequest('DELETE', url, **kwargs)
+
+
+def get_paged(url : str, limit : int, params : dict = None,
+              parse=None, offset : int = 0) -> list:
+    '''Get all the items of a paged resource.
+
+    The first page is fetched alone to learn the total number of items, then
+    the remaining pages are requested concurrently by offset.
+
+
+    Parameters
+    ----------
+    url : str
+        URL of the paged resource.
+
+    limit : int
+        Number of items per page. Should be the maximum the endpoint allows.
+
+    params : dict
+        Optional additional query parameters.
+
+    parse : callable
+        Optional function applied to every item as soon as its page is
+        received, so that the raw pages can be released early.
+
+    offset : int
+        Index of the first item to get. Defaults to 0.
+
+
+    Returns
+    -------
+    list
+        All the items of the resource, in the order the API returns them.
+    '''
+
+    def get_page(start):
+        return _parse_page(get(url, params={**(params or {}),
+                                            'offset': start, 'limit': limit}),
+                           parse)
+
+    total, all_items = get_page(offset)
+
+    offsets = range(offset + limit, total, limit)
+    if offsets:
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            # `map` yields the results in the order of `offsets`, so items
+            # come back in the original order regardless of completion order.
+            for _, items in executor.map(bind(get_page), offsets):
+                all_items.extend(items)
+
+    return all_items
+
+
+def iter_paged(url : str, limit : int, params : dict = None, parse=None):
+    '''Get the items of a paged resource as they are needed, one page at a
+    time, so that only a page is held in memory. See `get_paged()`.
+
+
+    Yields
+    ------
+    object
+        The items of the resource, in the order the API returns them.
+    '''
+    offset, total = 0, 1
+    while offset < total:
+        total, items = _parse_page(get(url, params={**(params or {}),
+                                                    'offset': offset, 'limit': limit}),
+                                   parse)
+        yield from items
+        offset += limit
+
+
+async def aget_paged(url : str, limit : int, params : dict = None,
+                     parse=None, offset : int = 0) -> list:
+    '''Get all the items of a paged resource, without blocking the event
+    loop. See `get_paged()`.
+
+    All the pages after the first one are requested at once. The number of
+    requests actually in flight is limited by `arequest()`.
+    '''
+
+    async def get_page(start):
+        return _parse_page(await aget(url, params={**(params or {}),
+                                                   'offset': start, 'limit': limit}),
+                           parse)
+
+    total, all_items = await get_page(offset)
+
+    # `gather` returns the results in the order of the offsets.
+    for _, items in await asyncio.gather(*map(get_page, range(offset + limit, total, limit))):
+        all_items.extend(items)
+
+    return all_items
+
+
+def _parse_page(response, parse) -> tuple:
+    # Total number of items and items of a page, parsed if requested.
+    assert response.status_code is requests.codes.OK, response.text
+
+    page = json.loads(response.text)
+    items = page['items'] if parse is None else list(map(parse, page['items']))
+
+    return page['total'], items
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+import gzip
+import json
+
+from . import models
+
+
+# Version of the snapshot format. Bump it whenever the layout changes.
+FORMAT_VERSION = 1
+
+
+def open_file(path : str, mode : str = 'r'):
+    '''Open a snapshot file as text, compressed with gzip if its name ends in
+    `.gz`.
+
+
+    Parameters
+    ----------
+    path : str
+        Path of the snapshot.
+
+    mode : str
+        `'r'` to read or `'w'` to write.
+    '''
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf8')
+
+    return open(path, mode, encoding='utf8')
+
+
+def write(path : str, sections) -> int:
+    '''Write a snapshot, one line at a time.
+
+    Every section starts with a header line, a JSON object, followed by one
+    line per track, a JSON array of the fields of `models.Track`. Tracks of
+    the library are preceded by the time they were saved at, in seconds since
+    the epoch.
+
+
+    Parameters
+    ----------
+    path : str
+        Path of the snapshot.
+
+    sections : iterable
+        Pairs of header and tracks. Headers are dictionaries with the `kind`
+        of the section, `'library'` or `'playlist'`, and for playlists their
+        `id`, `name`, `description` and `snapshot_id`. Tracks are
+        `(added_at, models.Track)` pairs for the library, and `models.Track`
+        for playlists.
+
+
+    Returns
+    -------
+    int
+        Number of tracks written.
+    '''
+    count = 0
+    with open_file(path, 'w') as f:
+        for header, tracks in sections:
+            f.write(json.dumps({**header, 'version': FORMAT_VERSION,
+                                'fields': list(models.Track._fields)},
+                               separators=(',', ':')) + '\n')
+
+            for track in tracks:
+                row = [track[0], *track[1]] if header['kind'] == 'library' else track
+                f.write(json.dumps(row, separators=(',', ':')) + '\n')
+                count += 1
+
+    return count
+
+
+def read_headers(path : str) -> list:
+    '''Read the headers of the sections of a snapshot, without parsing tracks.
+
+
+    Parameters
+    ----------
+    path : str
+        Path of the snapshot.
+
+
+    Returns
+    -------
+    list
+        Headers, as dictionaries, with the number of `tracks` in each section.
+    '''
+    headers = []
+    with open_file(path) as f:
+        for line in f:
+            if line.startswith('{'):
+                headers.append(_parse_header(line))
+                headers[-1]['tracks'] = 0
+            else:
+                headers[-1]['tracks'] += 1
+
+    return headers
+
+
+def read_tracks(path : str, kind : str, id : str = None):
+    '''Read the tracks of a section of a snapshot, as they are needed.
+
+    Lines of other sections are skipped without being parsed.
+
+
+    Parameters
+    ----------
+    path : str
+        Path of the snapshot.
+
+    kind : str
+        `'library'` or `'playlist'`.
+
+    id : str
+        Identifier of the playlist, if `kind` is `'playlist'`.
+
+
+    Yields
+    ------
+    tuple or models.Track
+        `(added_at, models.Track)` pairs for the library, `models.Track` for
+        playlists.
+
+
+    Raises
+    ------
+    KeyError
+        If the snapshot has no such section.
+    '''
+    found = False
+    with open_file(path) as f:
+        for line in f:
+            if line.startswith('{'):
+                header = _parse_header(line)
+                if found:
+                    return
+                found = header['kind'] == kind and header.get('id') == id
+            elif found:
+                row = json.loads(line)
+                if kind == 'library':
+                    yield row[0], models.parse_row(row[1:])
+                else:
+                    yield models.parse_row(row)
+
+    if not found:
+        raise KeyError(F"No {kind} {id or ''} in snapshot {path}")
+
+
+def _parse_header(line : str) -> dict:
+    header = json.loads(line)
+    assert header.get('version') == FORMAT_VERSION, \
+        F"Unsupported snapshot version: {header.get('version')}"
+    # Snapshots written before fields were added to tracks lack them, which
+    # then take their default value.
+    fields = header.get('fields') or []
+    assert fields and fields == list(models.Track._fields)[:len(fields)], \
+        F"Unsupported track fields: {header.get('fields')}"
+
+    return header
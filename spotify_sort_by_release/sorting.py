@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+import array
+import heapq
+import operator
+
+from . import models
+
+
+# Secondary keys that can be used to sort tracks released on the same day by
+# the same album, before resorting to their names.
+SECONDARY_KEYS = {
+    'disc': operator.attrgetter('disc_number'),
+    'track': operator.attrgetter('track_number'),
+}
+
+DEFAULT_SECONDARY_KEYS = ('disc', 'track')
+
+# Where tracks whose release date is unknown can be put, see
+# `SortKeys.argsort()`.
+UNRESOLVED_POSITIONS = ('first', 'last')
+
+
+def release_date_ordinal(release_date : str, precision : str) -> int:
+    '''Convert a release date into an integer that sorts chronologically.
+
+    Dates are encoded as `YYYYMMDD`. Parts beyond the precision of the date
+    are zero, so that a date known to the year only comes before all the
+    dates of that year known to the month or to the day.
+
+
+    Parameters
+    ----------
+    release_date : str
+        Release date, as `YYYY`, `YYYY-MM` or `YYYY-MM-DD`.
+
+    precision : str
+        Precision of the date: `'year'`, `'month'` or `'day'`.
+
+
+    Returns
+    -------
+    int
+        The encoded date, or 0 if the date is unknown.
+    '''
+    if not release_date:
+        return 0
+
+    parts = release_date.split('-')[:models.PRECISIONS.index(precision) + 1]
+    year, month, day = (list(map(int, parts)) + [0, 0])[:3]
+
+    return year * 10000 + month * 100 + day
+
+
+def sort_key(t : models.Track, secondary : tuple = DEFAULT_SECONDARY_KEYS) -> tuple:
+    '''Get the sorting key for a track.
+
+    Tracks are sorted primarily by release date. In case of collisions, the
+    relevant keys are the album name, the artist's name, the secondary keys
+    and the track name, compared case-insensitively.
+
+
+    Parameters
+    ----------
+    t : models.Track
+        The track.
+
+    secondary : tuple
+        Names of the secondary keys to use, from `SECONDARY_KEYS`.
+
+
+    Returns
+    -------
+    tuple
+        The sorting key for the given track.
+    '''
+    return (release_date_ordinal(t.release_date, t.release_date_precision),
+            t.album.casefold(),
+            t.artist.casefold(),
+            *(SECONDARY_KEYS[name](t) for name in secondary),
+            t.name.casefold())
+
+
+class SortKeys:
+    '''Sorting keys of a list of tracks, computed once and then reused to
+    sort, preview and compare orders.
+
+
+    Parameters
+    ----------
+    tracks : list
+        List of tracks, as `models.Track`.
+
+    secondary : tuple
+        Names of the secondary keys to use, from `SECONDARY_KEYS`.
+    '''
+
+    def __init__(self, tracks : list, secondary : tuple = DEFAULT_SECONDARY_KEYS):
+        self.keys = [sort_key(t, secondary) for t in tracks]
+
+        # Release dates alone, packed, for cheap chronological comparisons.
+        self.dates = array.array('l', (key[0] for key in self.keys))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __getitem__(self, i : int) -> tuple:
+        return self.keys[i]
+
+    def placed(self, reverse : bool = False, unresolved : str = 'last') -> list:
+        '''Get the keys that set the place of every track in sorted order,
+        including the tracks whose release date is unknown.
+
+        Every planner sorts by these keys, so that they all agree on where
+        unresolved tracks go. Unresolved tracks have equal keys, so that a
+        stable sort leaves them in their current order.
+
+
+        Parameters
+        ----------
+        reverse : bool
+            If `True`, keys are meant to be sorted in descending order.
+
+        unresolved : str
+            Where to put the tracks whose release date is unknown, from
+            `UNRESOLVED_POSITIONS`.
+
+
+        Returns
+        -------
+        list
+            For each track, a key comparable with the keys of all the others.
+        '''
+        assert unresolved in UNRESOLVED_POSITIONS, F"Bad position: {unresolved}"
+
+        # Keys are compared the other way round when sorting in descending
+        # order, and so are the groups of resolved and unresolved tracks.
+        group = 1 if (unresolved == 'last') != reverse else -1
+        return [(0, key) if date else (group,)
+                for key, date in zip(self.keys, self.dates)]
+
+    def argsort(self, reverse : bool = False, unresolved : str = 'last') -> array.array:
+        '''Sort the tracks.
+
+
+        Parameters
+        ----------
+        reverse : bool
+            If `True`, sort from the latest to the oldest.
+
+        unresolved : str
+            Where to put the tracks whose release date is unknown, in their
+            current order: `'first'` or `'last'`. See `placed()`.
+
+
+        Returns
+        -------
+        array.array
+            Positions of the tracks, in sorted order. Sorting is stable.
+        '''
+        placed = self.placed(reverse, unresolved)
+        return array.array('l', sorted(range(len(placed)), key=placed.__getitem__,
+                                       reverse=reverse))
+
+
+def ranks(order : list) -> list:
+    '''Invert a permutation.
+
+
+    Parameters
+    ----------
+    order : list
+        Positions of the tracks, in sorted order, as returned by
+        `SortKeys.argsort()`.
+
+
+    Returns
+    -------
+    list
+        For each track, its position in sorted order. Can be passed to
+        `reorder.plan_moves()`.
+    '''
+    result = [0] * len(order)
+    for rank, i in enumerate(order):
+        result[i] = rank
+
+    return result
+
+
+# Fields telling whether two tracks are the same, for `merge()`.
+DEDUPE_KEYS = {
+    'uri': operator.attrgetter('uri'),
+    'isrc': lambda t: t.isrc or t.uri,
+}
+
+
+# Which of the same tracks to keep, see `find_duplicates()`.
+DEDUPE_POLICIES = ('first', 'earliest')
+
+
+def find_duplicates(tracks : list, dedupe : str = 'uri', policy : str = 'first') -> dict:
+    '''Find the tracks repeated in a list.
+
+    Tracks removed from the catalog, which have no URI, are never considered
+    the same.
+
+
+    Parameters
+    ----------
+    tracks : list
+        List of tracks, as `models.Track`.
+
+    dedupe : str
+        Field telling whether two tracks are the same, from `DEDUPE_KEYS`.
+        With `'isrc'`, the same recording released on different albums, e.g.
+        on an album and as a single, is found too.
+
+    policy : str
+        Which of the same tracks to keep, from `DEDUPE_POLICIES`: the
+        `'first'` in the list, or the `'earliest'` released, the first in the
+        list among the ones released on the same day.
+
+
+    Returns
+    -------
+    dict
+        For every repeated track to drop, its position, mapped to the
+        position of the track kept in its place.
+    '''
+    assert policy in DEDUPE_POLICIES, F"Bad policy: {policy}"
+
+    identity = DEDUPE_KEYS[dedupe]
+    groups = {}
+    for i, t in enumerate(tracks):
+        if t.uri is not None:
+            groups.setdefault(identity(t), []).append(i)
+
+    def release(i):
+        # Unknown release dates come last.
+        return release_date_ordinal(tracks[i].release_date,
+                                    tracks[i].release_date_precision) or float('inf')
+
+    duplicates = {}
+    for positions in groups.values():
+        if len(positions) < 2:
+            continue
+
+        kept = positions[0] if policy == 'first' else \
+            min(positions, key=lambda i: (release(i), i))
+        duplicates.update((i, kept) for i in positions if i != kept)
+
+    return duplicates
+
+
+def merge(sources : list, secondary : tuple = DEFAULT_SECONDARY_KEYS,
+          reverse : bool = False, dedupe : str = None, presorted : bool = False,
+          unresolved : str = 'last'):
+    '''Merge lists of tracks into a single sorted stream, with a k-way heap
+    merge.
+
+
+    Parameters
+    ----------
+    sources : list
+        Iterables of tracks, as `models.Track`.
+
+    secondary : tuple
+        Names of the secondary keys to use, from `SECONDARY_KEYS`.
+
+    reverse : bool
+        If `True`, sort from the latest to the oldest.
+
+    dedupe : str
+        Optional. Drop the tracks already merged that are the same according
+        to this field, from `DEDUPE_KEYS`. The first occurrence is kept.
+
+    presorted : bool
+        If `True`, sources are already sorted, so they are merged as they
+        are consumed, holding a single track of each in memory. Otherwise,
+        every source is read and sorted before being merged.
+
+    unresolved : str
+        Where to put the tracks whose release date is unknown: `'first'` or
+        `'last'`. They can only be put last when sources are presorted, as
+        they may come at the end of the sources.
+
+
+    Yields
+    ------
+    models.Track
+        The tracks, in sorted order.
+
+
+    Raises
+    ------
+    AssertionError
+        If a source said to be sorted is not.
+    '''
+
+    def key(t):
+        return sort_key(t, secondary)
+
+    assert unresolved in UNRESOLVED_POSITIONS, F"Bad position: {unresolved}"
+    assert not (presorted and unresolved == 'first'), \
+        'Unresolved tracks of presorted sources can only be put last'
+
+    # Tracks whose release date is unknown are set apart as they come.
+    unknown = []
+
+    def resolved(source):
+        for t in source:
+            if models.is_resolved(t):
+                yield t
+            else:
+                unknown.append(t)
+
+    def checked(source):
+        previous = None
+        for t in resolved(source):
+            current = key(t)
+            assert previous is None \
+                or (previous >= current if reverse else previous <= current), \
+                F"Source is not sorted: {t.name} ({t.uri}) is out of place"
+            previous = current
+            yield t
+
+    if presorted:
+        streams = list(map(checked, sources))
+    else:
+        streams = [sorted(resolved(source), key=key, reverse=reverse)
+                   for source in sources]
+
+    def ordered():
+        if unresolved == 'first':
+            yield from unknown
+        yield from heapq.merge(*streams, key=key, reverse=reverse)
+        if unresolved == 'last':
+            yield from unknown
+
+    if dedupe is None:
+        yield from ordered()
+        return
+
+    identity = DEDUPE_KEYS[dedupe]
+    seen = set()
+    for t in ordered():
+        if identity(t) not in seen:
+            seen.add(identity(t))
+            yield t
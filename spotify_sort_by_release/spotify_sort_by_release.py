@@ -1,91 +1,385 @@
 #!/usr/bin/env python3
 # -*- coding: utf8 -*-
 import argparse
+import concurrent.futures
+import datetime
+import heapq
+import itertools
 import json
-import requests
-
+import os
+import sys
+import time
+import urllib.parse
+
+from . import albums
+from . import cache
+from . import httpcache
+from . import index
+from . import journal
 from . import library
+from . import models
 from . import playlists
+from . import profiling
+from . import reorder
 from . import session
+from . import snapshot
+from . import sorting
 from . import users
 
 
-def track_sorting_key(t : dict) -> str:
+# Number of tracks added to a playlist at once when merging, the maximum the
+# API allows.
+MERGE_BATCH_SIZE = 100
+
+
+def track_sorting_key(t : models.Track) -> tuple:
     '''Get the sorting key for a track.
     Tracks are sorted primarly by release date. In case of collisions, the
-    relevant keys are the album name, the artist's name and the track name.
+    relevant keys are the album name, the artist's name, the disc and track
+    numbers and the track name.
+
+
+    Parameters
+    ----------
+    t : models.Track
+        The track.
+
+
+    Returns
+    -------
+    tuple
+        The sorting key for the given track. See `sorting.sort_key()`.
+    '''
+    return sorting.sort_key(t)
+
+
+def track_description(t : models.Track) -> str:
+    '''Describe a track in a single line.
 
 
     Parameters
     ----------
-    t : dict
-        The track, as per the Spotify Web API documentation.
+    t : models.Track
+        The track.
 
 
     Returns
     -------
     str
-        The sorting key for the given track.
+        Release date, album, artist and name of the track.
     '''
-    release_date = t['album']['release_date']
-    artist_name = t['album']['artists'][0]['name']
-    album_name = t['album']['name']
-    track_name = t['name']
+    return F"{t.release_date} | {t.album} | {t.artist} | {t.name}"
 
-    return F"{release_date} | {album_name} | {artist_name} | {track_name}"
 
+def report_duplicates(tracks : list, duplicates : dict) -> None:
+    '''Print the repeated tracks that will be removed, each along with the
+    track kept in its place.
 
-def sort_library_by_release(args) -> None:
-    '''Sort a playlist by release date of tracks. A new playlist is created,
-    and tracks are added to it in correct order.
+
+    Parameters
+    ----------
+    tracks : list
+        List of tracks, as `models.Track`.
+
+    duplicates : dict
+        Positions of the tracks to remove, mapped to the positions of the
+        tracks kept, see `sorting.find_duplicates()`.
+    '''
+    if not duplicates:
+        print(' No repeated tracks found.')
+        return
+
+    print(F"\n Will remove {len(duplicates)} repeated tracks:")
+    for i in sorted(duplicates):
+        print(F"  #{i + 1}: {track_description(tracks[i])}")
+        print(F"     kept #{duplicates[i] + 1}: {track_description(tracks[duplicates[i]])}")
+
+
+def confirm(args, prompt : str = ' Continue? (y/[N]) ') -> None:
+    '''Ask the user for confirmation, unless `args.yes` is set.
 
 
     Parameters
     ----------
     args : Namespace
-        Namespace containing the following information:
-            - reversed (boolean): If `True`, tracks will be sorted in reversed
-                                  order: oldest to latest.
-            - threshold (int): Number of songs that could be added together.
-                               For example, if `args.threshold = 5`, then songs
-                               will be added in chunks of 5. The bigger the
-                               threshold the faster the process, but note that
-                               songs inside a chunk might end up in random order.
-            - backup (boolean): If `True`, create a playlist to backup the library
-                                before sorting.
-    '''
-    # Read all tracks from library and sort them.
-    tracks = library.get_tracks()
-    tracks = sorted(tracks, key=track_sorting_key, reverse=args.reversed)
+        Namespace from `main`
 
-    print('\n'.join(track_sorting_key(track) for track in tracks))
+    prompt : str
+        Question for the user.
 
-    # Delete all tracks from library
-    print(F"\n Will delete all tracks from the library and "
-          F"then try to insert them back in sorted order.")
 
-    if input(' Continue? (y/[N]) ').strip()[:1] not in ('y', 'Y'):
+    Raises
+    ------
+    KeyboardInterrupt
+        If the user did not confirm.
+    '''
+    if getattr(args, 'yes', False):
+        return
+
+    if input(prompt).strip()[:1] not in ('y', 'Y'):
         raise KeyboardInterrupt()
 
-    if args.backup:
-        library_backup_playlist_name = 'Your Library [Backup]'
-        print(F"[+] Backing up library into playlist \"{library_backup_playlist_name}\"")
 
-        destination_playlist = playlists.create_playlist(
-            {'name': library_backup_playlist_name, 'description': '', 'public': False})
+def describe_request(request : dict) -> str:
+    '''Describe a planned request in a single line.
 
-        # Add all tracks
-        playlists.add_tracks(destination_playlist['id'], tracks)
 
+    Parameters
+    ----------
+    request : dict
+        The request, as recorded by `session.plan()`.
+
+
+    Returns
+    -------
+    str
+        Endpoint and parameters of the request. Lists are summarized by
+        their length.
+    '''
+    parameters = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(request['url']).query))
+    parameters.update(request['body'] or {})
+
+    def describe(value):
+        if isinstance(value, list):
+            return F"[{len(value)} items]"
+        if isinstance(value, str) and ',' in value:
+            return F"[{len(value.split(','))} items]"
+        return value
+
+    return ' '.join([request['endpoint']] + [F"{key}={describe(value)}"
+                                            for key, value in parameters.items()])
+
+
+def report_plan(args, planned : list, target : str) -> dict:
+    '''Print the requests a run would send, and estimate how long it would
+    take.
+
+    The estimate accounts for the configured rate limits and the average
+    latency of the requests sent so far, assuming none is throttled.
+
+
+    Parameters
+    ----------
+    args : Namespace
+        Namespace from `main`. The plan is also appended to `args.plans`, if
+        present, to be written as JSON.
+
+    planned : list
+        Requests, as recorded by `session.plan()`.
+
+    target : str
+        What the run would modify, e.g. the name of a playlist.
+
+
+    Returns
+    -------
+    dict
+        The plan: `target`, `requests`, number of requests by `endpoints` and
+        `estimated_seconds`.
+    '''
+    summary = session.stats.to_dict()
+    latency = summary['wire_seconds'] / summary['requests'] if summary['requests'] else 0.
+
+    endpoints = {}
+    for request in planned:
+        endpoints[request['endpoint']] = endpoints.get(request['endpoint'], 0) + 1
+
+    plan = {
+        'target': target,
+        'requests': planned,
+        'endpoints': endpoints,
+        'estimated_seconds': round(
+            session.limiter.estimate(len(planned)) + len(planned) * latency, 3),
+    }
+
+    lines = [F"\n Plan for {target}: {len(planned)} requests, "
+             F"about {plan['estimated_seconds']:.1f}s"]
+    lines += [F"   {i + 1:6d}) {describe_request(request)}"
+              for i, request in enumerate(planned)]
+    lines += [F"   {count:6d} x {endpoint}" for endpoint, count in endpoints.items()]
+    # A single call, so that plans of concurrent jobs do not get mixed up.
+    print('\n'.join(lines))
+
+    if getattr(args, 'plans', None) is not None:
+        args.plans.append(plan)
+
+    return plan
+
+
+def backup_library(tracks : list, verify : bool = True) -> None:
+    '''Copy tracks into a new playlist, to backup the library.
+
+
+    Parameters
+    ----------
+    tracks : list
+        List of tracks, as `models.Track`.
+
+    verify : bool
+        If `True`, make sure the tracks were added in the given order.
+    '''
+    library_backup_playlist_name = 'Your Library [Backup]'
+    print(F"[+] Backing up library into playlist \"{library_backup_playlist_name}\"")
+
+    destination_playlist = playlists.create_playlist(
+        {'name': library_backup_playlist_name, 'description': '', 'public': False})
+
+    # Add all tracks
+    playlists.add_tracks(destination_playlist['id'], tracks, position=0,
+                         verify=verify)
+
+
+@profiling.phased
+def sort_library_by_release(args) -> None:
+    '''Sort the user library by release date of tracks. Tracks that are out
+    of place are deleted from the library, and saved back in correct order.
+
+    The library is ordered by when tracks were saved, so most tracks already
+    in correct order are left alone, and the others are saved back at times
+    that fall between their neighbours, see `reorder.plan_resaves()`.
+    Progress is recorded in a journal, see `journal.Journal`, so that an
+    interrupted sort can be resumed where it stopped.
+
+
+    Parameters
+    ----------
+    args : Namespace
+        Namespace containing the following information:
+            - reversed (boolean): If `True`, tracks will be sorted in reversed
+                                  order: oldest to latest.
+            - secondary (list): Names of the keys to sort tracks of the same
+                                album by, see `sorting.SECONDARY_KEYS`.
+            - backup (boolean): If `True`, create a playlist to backup the library
+                                before sorting.
+            - resume (boolean): If `True`, resume an interrupted sort from its
+                                journal instead of starting a new one. A new
+                                one is refused while there is a journal.
+            - journal (string): Path of the journal. Defaults to
+                                `journal.default_path()`.
+            - plan (boolean): If `True`, only print the requests that would
+                              be sent, see `report_plan()`.
+            - snapshot (string): Optional. Path of a snapshot to read the
+                                 library from, instead of the API.
+    '''
+    journal_path = getattr(args, 'journal', None) or journal.default_path()
+
+    # Phases are marked for `--profile`, see `profiling.mark()`.
+    profiling.mark('fetch')
+
+    if getattr(args, 'resume', False):
+        # Everything needed is in the journal: neither fetch nor sort again.
+        # Nothing is written to the library before the plan is on disk, see
+        # below, so without a readable plan there is nothing to resume.
+        try:
+            log = journal.Journal.load(journal_path)
+        except FileNotFoundError:
+            print(F"\n Nothing to resume: no interrupted sort found at {journal_path}.")
+            return
+        except ValueError:
+            print(F"\n Nothing to resume: the sort was interrupted before changing "
+                  F"the library, as {journal_path} holds no plan.")
+            return
+        tracks = log.tracks
+
+        profiling.mark('preview')
+
+        print(F"\n Will resume sorting {len(tracks)} tracks: "
+              F"{len(log.done['delete'])} batches already deleted, "
+              F"{len(log.done['save'])} already saved.")
+
+        if getattr(args, 'plan', False):
+            with session.plan() as planned:
+                library.delete_tracks(tracks, done_batches=log.done['delete'])
+                library.save_tracks(tracks, verify=False, timestamps=log.timestamps,
+                                    done_batches=log.done['save'])
+            report_plan(args, planned, 'the library')
+            return
+
+        confirm(args)
+
+    else:
+        # The tracks deleted and not saved back yet by an interrupted sort are
+        # only in its journal: they would be lost by starting afresh.
+        if os.path.exists(journal_path):
+            raise journal.Unfinished(journal_path)
+
+        # Read all tracks from library, or from a snapshot of it, and sort
+        # them.
+        if getattr(args, 'snapshot', None):
+            saved = list(snapshot.read_tracks(args.snapshot, 'library'))
+        else:
+            saved = library.get_tracks(added_at=True)
+        tracks = [t for _, t in saved]
+        if not getattr(args, 'snapshot', None):
+            # Snapshots are enriched when exported, see `do_export()`.
+            tracks = albums.enrich(tracks)
+
+        profiling.mark('sort')
+        # The library is shown from the last track saved, so the tracks to
+        # show last are the first ones saved.
+        unresolved = getattr(args, 'unresolved', 'last')
+        order = sorting.SortKeys(tracks, args.secondary).argsort(
+            args.reversed, 'first' if unresolved == 'last' else 'last')
+        tracks = [tracks[i] for i in order]
+
+        # The library lists the most recently saved tracks first, while they
+        # are saved from the first to the last in sorted order.
+        saved.reverse()
+        positions, times = reorder.plan_resaves(
+            reorder.match_ranks([t.uri for _, t in saved], [t.uri for t in tracks]),
+            [added_at for added_at, _ in saved],
+            int(time.time()), library.TIMESTAMP_SPACING)
+
+        profiling.mark('preview')
+        print('\n'.join(map(track_description, tracks)))
+
+        if not positions:
+            print(F"\n The library is already sorted.")
+            return
+
+        # Delete all tracks from library
+        print(F"\n Will delete {len(positions)} of {len(tracks)} tracks from the "
+              F"library and then try to insert them back in sorted order.")
+
+        resaved = [tracks[i] for i in positions]
+        timestamps = list(map(library.format_timestamp, times))
+
+        if getattr(args, 'plan', False):
+            with session.plan() as planned:
+                if args.backup:
+                    backup_library(tracks, verify=False)
+                library.delete_tracks(resaved)
+                library.save_tracks(resaved, verify=False, timestamps=timestamps)
+            report_plan(args, planned, 'the library')
+            return
+
+        confirm(args)
+
+        if args.backup:
+            profiling.mark('write')
+            backup_library(tracks)
+
+        # Nothing is written to the library before the plan is on disk.
+        log = journal.Journal.create(journal_path, resaved, timestamps)
+        tracks = log.tracks
+
+    profiling.mark('delete')
     print(F"[+] Deleting tracks from library")
-    library.delete_tracks(tracks)
+    library.delete_tracks(tracks, done_batches=log.done['delete'],
+                          on_batch=lambda batch: log.record('delete', batch))
 
     # Add all tracks to library in correct order
+    profiling.mark('write')
     print(F"[+] Adding tracks back into library")
-    library.save_tracks(tracks, threshold=args.threshold)
+    library.save_tracks(tracks, timestamps=log.timestamps,
+                        done_batches=log.done['save'],
+                        on_batch=lambda batch: log.record('save', batch))
 
+    log.finish()
 
-def sort_playlist_by_release(args) -> None:
+
+@profiling.phased
+def sort_playlist_by_release(args) -> int:
     '''Sort a playlist by release date of tracks. A new playlist is created,
     and tracks are added to it in correct order.
 
@@ -100,38 +394,422 @@ def sort_playlist_by_release(args) -> None:
             - description (string): Description for the destination playlist.
             - reversed (boolean): If `True`, tracks will be sorted in reversed
                                   order: oldest to latest.
+            - secondary (list): Names of the keys to sort tracks of the same
+                                album by, see `sorting.SECONDARY_KEYS`.
+            - inplace (boolean): If `True`, the source playlist itself is
+                                 reordered by moving only the tracks that are
+                                 out of place.
+            - incremental (boolean): If `True`, assume the playlist was sorted
+                                     and only had tracks appended since, and
+                                     move just the new tracks into place.
+            - plan (boolean): If `True`, only print the requests that would
+                              be sent, see `report_plan()`.
+            - snapshot (string): Optional. Path of a snapshot to read the
+                                 playlist from, instead of the API.
+            - dedupe (string): Optional. Field telling repeated tracks apart,
+                               see `sorting.DEDUPE_KEYS`. If given, repeated
+                               tracks are removed.
+            - dedupe_policy (string): Which of the repeated tracks to keep,
+                                      see `sorting.find_duplicates()`.
+
+
+    Returns
+    -------
+    int
+        Number of tracks moved or copied.
     '''
-    # Read all tracks from source playlist and sort them.
-    tracks = playlists.get_playlist_tracks(args.playlist['id'])
-    tracks = sorted(tracks, key=track_sorting_key, reverse=not args.reversed)
+    # Read all tracks from source playlist and sort them. Phases are marked
+    # for `--profile`, see `profiling.mark()`.
+    profiling.mark('fetch')
+    if getattr(args, 'snapshot', None):
+        tracks = list(snapshot.read_tracks(args.snapshot, 'playlist',
+                                           args.playlist['id']))
+    elif args.incremental:
+        tracks = playlists.get_appended_playlist_tracks(args.playlist)
+    else:
+        tracks = playlists.get_playlist_tracks(args.playlist['id'],
+                                               args.playlist.get('snapshot_id'))
+    if not getattr(args, 'snapshot', None):
+        # Snapshots are enriched when exported, see `do_export()`.
+        tracks = albums.enrich(tracks)
+
+    profiling.mark('sort')
+    duplicates = {}
+    if getattr(args, 'dedupe', None):
+        duplicates = sorting.find_duplicates(tracks, args.dedupe,
+                                             getattr(args, 'dedupe_policy', 'first'))
+        report_duplicates(tracks, duplicates)
+
+    # Repeated tracks are removed before sorting, so that they are not moved
+    # or copied at all.
+    all_tracks = tracks
+    if duplicates:
+        tracks = [t for i, t in enumerate(tracks) if i not in duplicates]
+
+    keys = sorting.SortKeys(tracks, args.secondary)
+    unresolved = getattr(args, 'unresolved', 'last')
+    order = keys.argsort(reverse=not args.reversed, unresolved=unresolved)
 
     if args.inplace:
-        # If sorting is to be done in-place, the destination playlist is simply
-        # the same as the source playlist.
-        print(F"\n Will delete all tracks from {args.playlist['name']} and "
-              F"then try to insert them back in sorted order.")
+        # If sorting is to be done in-place, only move the tracks that are
+        # out of place, leaving the others where they are.
+        moves = None
+        if args.incremental:
+            moves = reorder.plan_insertions(
+                keys.placed(reverse=not args.reversed, unresolved=unresolved),
+                reverse=not args.reversed)
+
+            # Too many tracks out of place for them to be just new ones.
+            if len(moves) > len(tracks) // 2:
+                print(' Playlist is not mostly sorted, sorting it all.')
+                moves = None
+
+        if moves is None:
+            moves = reorder.plan_moves(sorting.ranks(order))
+
+        # The order the moves leave keeps the tracks with equal keys where
+        # they were.
+        sorted_tracks = reorder.apply_moves(tracks, moves)
+        moved = sum(m[1] for m in moves)
+
+        profiling.mark('preview')
+        print(F"\n Will reorder {args.playlist['name']} in {len(moves)} "
+              F"requests, moving {moved} tracks.")
+
+        def write():
+            snapshot_id = args.playlist.get('snapshot_id')
+            if duplicates:
+                profiling.mark('delete')
+                snapshot_id = playlists.delete_positions(
+                    args.playlist['id'], all_tracks, duplicates, snapshot_id)
+            profiling.mark('write')
+            return playlists.move_tracks(args.playlist['id'], moves, snapshot_id)
+
+        if getattr(args, 'plan', False):
+            with session.plan() as planned:
+                write()
+            profiling.mark('preview')
+            report_plan(args, planned, args.playlist['name'])
+            return moved
+
+        confirm(args)
+
+        snapshot_id = write()
+
+        # The new order is known, so the next run will not need to fetch it.
+        if moves or duplicates:
+            cache.put_playlist_tracks(args.playlist['id'], snapshot_id, sorted_tracks)
+            # Let the caller know the playlist as it was left.
+            args.playlist['snapshot_id'] = snapshot_id
+            args.playlist['tracks'] = {'total': len(tracks)}
+        return moved
+
+    # If sorting is not in-place, attempt to create the new playlist.
+    # This action may fail if the provided OAuth Token wasn't generated
+    # with the correct privileges.
+    profiling.mark('preview')
+    print((F"\n Will copy tracks from {args.playlist['name']} into new "
+           F"playlist {args.name} (description: '{args.description}')"))
+
+    # Local files and tracks removed from the catalog cannot be copied.
+    addable = [tracks[i] for i in order if models.is_addable(tracks[i])]
+    if len(addable) < len(tracks):
+        print(F" Skipping {len(tracks) - len(addable)} local or unavailable tracks.")
+
+    if getattr(args, 'plan', False):
+        with session.plan() as planned:
+            destination_playlist = playlists.create_playlist(
+                {'name': args.name, 'description': args.description, 'public': False})
+            playlists.add_tracks(destination_playlist['id'],
+                                 addable, position=0, verify=False)
+        report_plan(args, planned, args.playlist['name'])
+        return len(addable)
+
+    confirm(args)
+
+    profiling.mark('write')
+    destination_playlist = playlists.create_playlist(
+        {'name': args.name, 'description': args.description, 'public': False})
+
+    # Add all tracks
+    playlists.add_tracks(destination_playlist['id'], addable, position=0)
+
+    return len(addable)
+
+
+def sort_playlists_by_release(args, targets : list) -> list:
+    '''Sort many playlists concurrently, without asking for confirmation.
+
+    Sorted copies are named after the source playlists and keep their
+    descriptions. A failure only affects the playlist it happened on.
+
+
+    Parameters
+    ----------
+    args : Namespace
+        Namespace containing the same information required by
+        `sort_playlist_by_release`, except for the playlist, name and
+        description, plus:
+            - jobs (int): Number of playlists to sort at the same time.
+
+    targets : list
+        Playlists to sort, either as per the Spotify Web API documentation or
+        as identifiers.
+
+
+    Returns
+    -------
+    list
+        For each playlist, a dictionary with its `id` and `name`, the
+        `status` of the job (`'ok'` or `'failed'`), the number of `tracks`
+        moved or copied, the `error` if any and the `seconds` it took.
+    '''
+
+    def sort_one(playlist):
+        started_at = time.monotonic()
+        result = {'id': playlist if isinstance(playlist, str) else playlist['id'],
+                  'name': None, 'status': 'failed', 'tracks': 0, 'error': None}
 
-        if input(' Continue? (y/[N]) ').strip()[:1] not in ('y', 'Y'):
-            raise KeyboardInterrupt()
+        try:
+            if isinstance(playlist, str):
+                playlist = get_playlist(args, playlist)
+            result['name'] = playlist['name']
 
-        playlists.delete_tracks(args.playlist['id'], tracks)
-        destination_playlist = args.playlist
+            job = argparse.Namespace(**vars(args))
+            job.yes = True
+            job.playlist = playlist
+            job.name = F"SORTED: {playlist['name']}"
+            job.description = playlist.get('description') or ''
 
+            result['tracks'] = sort_playlist_by_release(job)
+            result['status'] = 'ok'
+
+        except Exception as e:
+            # Whatever goes wrong with a playlist, e.g. the cache cannot be
+            # written, the others are still sorted and reported on.
+            result['error'] = F"{type(e).__name__}: {e}"
+
+        result['seconds'] = round(time.monotonic() - started_at, 3)
+        return result
+
+    with concurrent.futures.ThreadPoolExecutor(args.jobs) as executor:
+        return list(executor.map(session.bind(sort_one), targets))
+
+
+def merge_playlists_by_release(args) -> int:
+    '''Merge playlists into a new playlist, sorted by release date of
+    tracks.
+
+    Sources are sorted separately and combined with a k-way merge, see
+    `sorting.merge()`, and the merged tracks are added to the new playlist in
+    order, a batch at a time, as they come out of the merge.
+
+
+    Parameters
+    ----------
+    args : Namespace
+        Namespace containing the following information:
+            - playlists (list): Identifiers of the playlists to merge.
+            - name (string): Name for the destination playlist.
+            - description (string): Description for the destination playlist.
+            - reversed (boolean): If `True`, tracks will be sorted in reversed
+                                  order: oldest to latest.
+            - secondary (list): Names of the keys to sort tracks of the same
+                                album by, see `sorting.SECONDARY_KEYS`.
+            - dedupe (string): Optional. Drop repeated tracks, the same
+                               according to this field, see
+                               `sorting.DEDUPE_KEYS`.
+            - presorted (boolean): If `True`, the playlists already are
+                                   sorted, so they are read a page at a time
+                                   while merging instead of all at once.
+            - plan (boolean): If `True`, only print the requests that would
+                              be sent, see `report_plan()`.
+            - snapshot (string): Optional. Path of a snapshot to read the
+                                 playlists from, instead of the API.
+
+
+    Returns
+    -------
+    int
+        Number of tracks in the new playlist.
+    '''
+    if getattr(args, 'snapshot', None):
+        sources = [snapshot.read_tracks(args.snapshot, 'playlist', playlist_id)
+                   for playlist_id in args.playlists]
+    elif args.presorted:
+        sources = list(map(playlists.iter_playlist_tracks, args.playlists))
     else:
-        # If sorting is not in-place, attempt to create the new playlist.
-        # This action may fail if the provided OAuth Token wasn't generated
-        # with the correct privileges.
-        print((F"\n Will copy tracks from {args.playlist['name']} into new "
-               F"playlist {args.name} (description: '{args.description}')"))
+        sources = [albums.enrich(playlists.get_playlist_tracks(playlist_id))
+                   for playlist_id in args.playlists]
+
+    # Local files and tracks removed from the catalog cannot be added.
+    merged = filter(models.is_addable, sorting.merge(
+        sources, args.secondary, reverse=not args.reversed, dedupe=args.dedupe,
+        presorted=args.presorted, unresolved=getattr(args, 'unresolved', 'last')))
 
-        if input(' Continue? (y/[N]) ').strip()[:1] not in ('y', 'Y'):
-            raise KeyboardInterrupt()
+    print((F"\n Will merge {len(args.playlists)} playlists into new "
+           F"playlist {args.name} (description: '{args.description}')"))
 
+    def write():
         destination_playlist = playlists.create_playlist(
             {'name': args.name, 'description': args.description, 'public': False})
 
-    # Add all tracks
-    playlists.add_tracks(destination_playlist['id'], tracks)
+        # Batches are added at explicit positions, one after the other, so
+        # they cannot end up out of order.
+        count = 0
+        while batch := list(itertools.islice(merged, MERGE_BATCH_SIZE)):
+            playlists.add_tracks(destination_playlist['id'], batch,
+                                 position=count, verify=False)
+            count += len(batch)
+            print(F"[*] Added {count} tracks", end='\r')
+
+        return count
+
+    if getattr(args, 'plan', False):
+        with session.plan() as planned:
+            count = write()
+        report_plan(args, planned, args.name)
+        return count
+
+    confirm(args)
+
+    return write()
+
+
+def view_by_release(args) -> int:
+    '''Fill a playlist with the tracks released within a range of dates,
+    sorted by release date. The user's playlist with the given name is
+    refreshed if there is one, otherwise a new playlist is created.
+
+    Tracks are read from the release index, see `index`, which is first
+    brought up to date, fetching only what changed since the last view.
+
+
+    Parameters
+    ----------
+    args : Namespace
+        Namespace containing the following information:
+            - start (string): First release date, as `YYYY`, `YYYY-MM` or
+                              `YYYY-MM-DD`, included.
+            - end (string): Optional. Last release date, in the same format,
+                            included. No limit if `None`.
+            - library (boolean): If `True`, take tracks from the library.
+            - playlists (list): Identifiers of playlists to take tracks from.
+                                Tracks are taken from the library if empty.
+            - name (string): Name of the playlist to fill.
+            - description (string): Description for a new playlist.
+            - reversed (boolean): If `True`, tracks will be sorted in reversed
+                                  order: oldest to latest.
+            - secondary (list): Names of the keys to sort tracks of the same
+                                album by, see `sorting.SECONDARY_KEYS`.
+            - user (dict): The current user.
+            - plan (boolean): If `True`, only print the requests that would
+                              be sent, see `report_plan()`.
+
+
+    Returns
+    -------
+    int
+        Number of tracks in the playlist.
+    '''
+    sources = []
+    if args.library or not args.playlists:
+        index.update_library()
+        sources.append(index.LIBRARY)
+    for playlist_id in args.playlists or []:
+        index.update_playlist(playlists.get_playlist(
+            playlist_id, 'id,snapshot_id,tracks(total)'))
+        sources.append(playlist_id)
+
+    tracks = index.get_tracks(
+        sources, index.date_bound(args.start),
+        index.date_bound(args.end, upper=True) if args.end else sys.maxsize)
+    order = sorting.SortKeys(tracks, args.secondary).argsort(reverse=not args.reversed)
+    tracks = [tracks[i] for i in order if models.is_addable(tracks[i])]
+
+    existing = next((p for p in playlists.get_my_playlists()
+                     if p['name'] == args.name and p['owner']['id'] == args.user['id']),
+                    None)
+
+    released = F"from {args.start} to {args.end}" if args.end else F"since {args.start}"
+    print(F"\n Will {'refresh' if existing else 'create'} playlist {args.name} "
+          F"with {len(tracks)} tracks released {released}")
+
+    def write():
+        if existing:
+            playlists.replace_tracks(existing['id'], tracks)
+        else:
+            destination_playlist = playlists.create_playlist(
+                {'name': args.name, 'description': args.description, 'public': False})
+            playlists.add_tracks(destination_playlist['id'], tracks,
+                                 position=0, verify=False)
+
+    if getattr(args, 'plan', False):
+        with session.plan() as planned:
+            write()
+        report_plan(args, planned, args.name)
+        return len(tracks)
+
+    confirm(args)
+    write()
+
+    return len(tracks)
+
+
+def get_playlist(args, playlist_id : str) -> dict:
+    '''Get a playlist to sort, from the snapshot if any, from the API
+    otherwise.
+
+
+    Parameters
+    ----------
+    args : Namespace
+        Namespace from `main`, with the path of the snapshot in `snapshot`.
+
+    playlist_id : str
+        Identifier of the playlist.
+
+
+    Returns
+    -------
+    dict
+        The playlist, with at least its `id`, `name`, `description` and
+        `snapshot_id`.
+
+
+    Raises
+    ------
+    KeyError
+        If the snapshot has no such playlist.
+    '''
+    if not getattr(args, 'snapshot', None):
+        return playlists.get_playlist(
+            playlist_id, 'id,name,description,snapshot_id,tracks(total)')
+
+    for playlist in snapshot_playlists(args):
+        if playlist['id'] == playlist_id:
+            return playlist
+
+    raise KeyError(F"No playlist {playlist_id} in snapshot {args.snapshot}")
+
+
+def snapshot_playlists(args) -> list:
+    '''Get the playlists in the snapshot.
+
+
+    Parameters
+    ----------
+    args : Namespace
+        Namespace from `main`, with the path of the snapshot in `snapshot`.
+
+
+    Returns
+    -------
+    list
+        The headers of the playlists, see `snapshot.write()`.
+    '''
+    return [header for header in snapshot.read_headers(args.snapshot)
+            if header['kind'] == 'playlist']
 
 
 def do_library(args) -> None:
@@ -144,11 +822,10 @@ def do_library(args) -> None:
         Namespace from `main`
     '''
     # Sort whole library is lit but risky, make sure the user understands.
-    if not args.backup:
+    if not args.backup and not args.resume and not args.plan:
         print(' Remember to backup your library before sorting!')
 
-        if input(' Continue anyway? (y/[N]) ').strip()[:1] not in ('y', 'Y'):
-            raise KeyboardInterrupt()
+        confirm(args, ' Continue anyway? (y/[N]) ')
 
     # Profit
     sort_library_by_release(args)
@@ -163,14 +840,32 @@ def do_playlist(args) -> None:
     args : Namespace
         Namespace from `main`
     '''
+    args.inplace = args.inplace or args.incremental
+
     # Sort in-place is lit but risky, make sure the user understands.
-    if args.inplace:
+    if args.inplace and not args.plan:
         print(' Remember to backup your playlist before sorting in-place!')
-        if input(' Continue anyway? (y/[N]) ').strip()[:1] not in ('y', 'Y'):
-            raise KeyboardInterrupt()
+        confirm(args, ' Continue anyway? (y/[N]) ')
+
+    if args.all or args.from_file:
+        do_playlist_batch(args)
+        return
 
     # Let user interactively choose the playlist to sort
-    if not args.playlist:
+    if not args.playlist and args.snapshot:
+        available_playlists = snapshot_playlists(args)
+
+        print(' Choose target playlist:')
+        for i, p in enumerate(available_playlists):
+            print(F"   {i+1:4d}) {p['name']:32.32}    [ID: {p['id']}]")
+        while not args.playlist:
+            choice = input('   > ')
+            try:
+                choice = int(choice)
+                args.playlist = available_playlists[choice - 1]
+            except (ValueError, IndexError):
+                pass
+    elif not args.playlist:
         print(" Playlist ID missing.")
         print("   1) Search my playlists")
         print("   2) Search user's playlists")
@@ -199,7 +894,7 @@ def do_playlist(args) -> None:
                 pass
     else:
         # Convert ID to the actual playlist item
-        args.playlist = playlists.get_playlist(args.playlist)
+        args.playlist = get_playlist(args, args.playlist)
 
     if not args.inplace:
         # Let user pick name/description for the new, sorted, playlist
@@ -220,6 +915,345 @@ def do_playlist(args) -> None:
     sort_playlist_by_release(args)
 
 
+def do_playlist_batch(args) -> None:
+    '''Handler for sub-command `playlist` with many playlists to sort.
+
+
+    Parameters
+    ----------
+    args : Namespace
+        Namespace from `main`
+    '''
+    if args.all and args.snapshot:
+        targets = snapshot_playlists(args)
+    elif args.all:
+        # Only the user's own playlists can be modified, and copying the
+        # playlists of others is likely not what the user wants.
+        targets = [p for p in playlists.get_my_playlists()
+                   if p['owner']['id'] == args.user['id']]
+    else:
+        # One playlist per line, as ID, URI or URL. Comments start with `#`.
+        with open(args.from_file) as f:
+            lines = [line.split('#')[0].strip() for line in f]
+        targets = [line.split('?')[0].split('/')[-1].split(':')[-1]
+                   for line in lines if line]
+
+    print(F"\n Will sort {len(targets)} playlists "
+          F"{'in-place' if args.inplace else 'into new playlists'}, "
+          F"{args.jobs} at a time.")
+
+    if not args.plan:
+        confirm(args)
+
+    results = sort_playlists_by_release(args, targets)
+
+    print('\n')
+    for result in results:
+        print(F"   {result['status']:6} {result['name'] or '':32.32}    "
+              F"[ID: {result['id']}] {result['tracks']:6d} tracks "
+              F"{result['seconds']:8.1f}s    {result['error'] or ''}")
+
+    failed = sum(1 for result in results if result['status'] != 'ok')
+    print(F"\n Sorted {len(results) - failed} playlists, {failed} failed.")
+
+
+def watch(args, playlist_ids : list, watch_library : bool) -> None:
+    '''Keep playlists and the library sorted, sorting them whenever they
+    change.
+
+    Every playlist is polled for its snapshot ID, and the library for its
+    size and most recently saved track, which costs a single request each
+    and is mostly answered with `304 Not Modified`. Whenever a poll finds a
+    change, the playlist or the library is sorted, playlists in-place and
+    incrementally. Targets that did not change are polled less and less
+    often, from `args.interval` up to `args.max_interval` seconds.
+
+
+    Parameters
+    ----------
+    args : Namespace
+        Namespace from `main`, with the polling `interval`, `max_interval`
+        and the maximum number of `polls`, `None` for no limit.
+
+    playlist_ids : list
+        Identifiers of the playlists to keep sorted.
+
+    watch_library : bool
+        If `True`, also keep the library sorted.
+    '''
+    job = argparse.Namespace(**vars(args))
+    job.yes = True
+    job.inplace = job.incremental = True
+    job.backup = job.resume = job.plan = False
+    job.journal = job.snapshot = None
+
+    targets = [('library', None)] * watch_library \
+        + [('playlist', playlist_id) for playlist_id in playlist_ids]
+
+    # What every target looked like after it was last sorted.
+    sorted_as = {}
+    intervals = {target: args.interval for target in targets}
+    queue = [(0., target) for target in targets]
+
+    polls = 0
+    while queue and (args.polls is None or polls < args.polls):
+        due, target = heapq.heappop(queue)
+        time.sleep(max(0., due - time.monotonic()))
+        polls += 1
+
+        kind, playlist_id = target
+        try:
+            if kind == 'library':
+                changed = library.get_signature() != sorted_as.get(target)
+                if changed:
+                    print(F"\n[+] {time.strftime('%X')} Library changed, sorting it")
+                    # A sort interrupted at a previous poll is finished first.
+                    job.resume = os.path.exists(journal.default_path())
+                    sort_library_by_release(job)
+                    sorted_as[target] = library.get_signature()
+            else:
+                playlist = playlists.get_playlist(
+                    playlist_id, 'id,name,description,snapshot_id,tracks(total)')
+                # Tracks added or removed while it was being sorted change
+                # the number of tracks, even if the snapshot is the last one
+                # left by the sort.
+                changed = (playlist['snapshot_id'], playlist['tracks']['total']) \
+                    != sorted_as.get(target)
+                if changed:
+                    print(F"\n[+] {time.strftime('%X')} {playlist['name']} changed, sorting it")
+                    job.playlist = playlist
+                    sort_playlist_by_release(job)
+                    sorted_as[target] = (playlist['snapshot_id'],
+                                         playlist['tracks']['total'])
+
+        except Exception as e:
+            # A target failing, e.g. when the budget runs out or the cache
+            # cannot be written, must not stop keeping the others sorted. It
+            # is tried again at its next poll.
+            print(F"\n[!] {time.strftime('%X')} Failed to sort {playlist_id or 'library'}: "
+                  F"{type(e).__name__}: {e}")
+            changed = False
+
+        intervals[target] = args.interval if changed \
+            else min(args.max_interval, intervals[target] * 2)
+        heapq.heappush(queue, (time.monotonic() + intervals[target], target))
+
+
+def do_watch(args) -> None:
+    '''Handler for sub-command `watch`.
+
+
+    Parameters
+    ----------
+    args : Namespace
+        Namespace from `main`
+    '''
+    playlist_ids = list(args.playlists or [])
+    if args.all:
+        playlist_ids += [p['id'] for p in playlists.get_my_playlists()
+                         if p['owner']['id'] == args.user['id']]
+
+    watch_library = args.library or not playlist_ids
+
+    print(F"\n Will keep {len(playlist_ids)} playlists "
+          F"{'and the library ' if watch_library else ''}sorted, "
+          F"sorting playlists in-place.")
+
+    confirm(args)
+
+    watch(args, playlist_ids, watch_library)
+
+
+def do_merge(args) -> None:
+    '''Handler for sub-command `merge`.
+
+
+    Parameters
+    ----------
+    args : Namespace
+        Namespace from `main`
+    '''
+    if args.name is None:
+        names = [get_playlist(args, playlist_id)['name'] for playlist_id in args.playlists]
+        args.name = F"SORTED: {' + '.join(names)}"
+
+    count = merge_playlists_by_release(args)
+    print(F"\n Merged {count} tracks into {args.name}")
+
+
+def do_view(args) -> None:
+    '''Handler for sub-command `view`.
+
+
+    Parameters
+    ----------
+    args : Namespace
+        Namespace from `main`
+    '''
+    today = datetime.date.today()
+    if args.days is not None:
+        args.start = (today - datetime.timedelta(days=args.days)).isoformat()
+        args.end = today.isoformat()
+        default_name = F"Released in the last {args.days} days"
+    elif args.end:
+        assert args.start, 'Either --from or --days is required'
+        default_name = F"Released from {args.start} to {args.end}"
+    else:
+        # Up to whatever is released next.
+        assert args.start, 'Either --from or --days is required'
+        default_name = F"Released since {args.start}"
+
+    # Views are refreshed by name, so the default one must not depend on
+    # the current day.
+    args.name = args.name or default_name
+
+    count = view_by_release(args)
+    print(F"\n {args.name} holds {count} tracks")
+
+
+def do_export(args) -> None:
+    '''Handler for sub-command `export`.
+
+
+    Parameters
+    ----------
+    args : Namespace
+        Namespace from `main`
+    '''
+    playlist_ids = list(args.playlists or [])
+    if args.all_playlists:
+        playlist_ids += [p['id'] for p in playlists.get_my_playlists()
+                         if p['owner']['id'] == args.user['id']]
+
+    def sections():
+        # Fetched one at a time, as they are written. Tracks are enriched, so
+        # that snapshots can be sorted offline.
+        if args.library or not playlist_ids:
+            print(F"[+] Exporting library")
+            saved = library.get_tracks(added_at=True)
+            yield {'kind': 'library'}, zip(
+                [added_at for added_at, _ in saved],
+                albums.enrich([t for _, t in saved]))
+
+        for playlist_id in playlist_ids:
+            playlist = playlists.get_playlist(
+                playlist_id, 'id,name,description,snapshot_id')
+            print(F"[+] Exporting playlist {playlist['name']}")
+            yield ({'kind': 'playlist', 'id': playlist['id'],
+                    'name': playlist['name'],
+                    'description': playlist.get('description') or '',
+                    'snapshot_id': playlist['snapshot_id']},
+                   albums.enrich(playlists.get_playlist_tracks(
+                       playlist['id'], playlist['snapshot_id'])))
+
+    count = snapshot.write(args.file, sections())
+    print(F"\n Exported {count} tracks to {args.file}")
+
+
+def do_import(args) -> None:
+    '''Handler for sub-command `import`.
+
+    Tracks of the library are saved back with the times they were saved at
+    when the snapshot was taken, which restores their order. Playlists are
+    restored as new playlists.
+
+
+    Parameters
+    ----------
+    args : Namespace
+        Namespace from `main`
+    '''
+    headers = snapshot.read_headers(args.file)
+
+    for header in headers:
+        print(F"   {header['kind']:8} {header.get('name', ''):32.32} "
+              F"{header['tracks']:6d} tracks")
+
+    if not args.plan:
+        print(F"\n Will restore the library and playlists above.")
+        confirm(args)
+
+    for header in headers:
+        if header['kind'] == 'library':
+            target = 'the library'
+            # The library lists the most recently saved tracks first.
+            saved = list(snapshot.read_tracks(args.file, 'library'))
+            saved.reverse()
+
+            def restore():
+                print(F"[+] Restoring library")
+                library.save_tracks(
+                    [t for _, t in saved], verify=not args.plan,
+                    timestamps=[library.format_timestamp(a) for a, _ in saved])
+        else:
+            target = header['name']
+            tracks = list(snapshot.read_tracks(args.file, 'playlist', header['id']))
+
+            def restore():
+                print(F"[+] Restoring playlist {header['name']}")
+                destination_playlist = playlists.create_playlist(
+                    {'name': header['name'], 'description': header['description'],
+                     'public': False})
+                playlists.add_tracks(destination_playlist['id'], tracks,
+                                     position=0, verify=not args.plan)
+
+        if args.plan:
+            with session.plan() as planned:
+                restore()
+            report_plan(args, planned, target)
+        else:
+            restore()
+
+
+def write_metrics(args) -> None:
+    '''Export the metrics of the requests sent so far.
+
+
+    Parameters
+    ----------
+    args : Namespace
+        Namespace from `main`, with the paths to write the metrics to in
+        `metrics` (JSON) and `metrics_prometheus` (Prometheus text format).
+    '''
+    if args.metrics:
+        with open(args.metrics, 'w') as f:
+            json.dump(session.stats.to_dict(), f, indent=2)
+
+    if args.metrics_prometheus:
+        with open(args.metrics_prometheus, 'w') as f:
+            f.write(session.stats.to_prometheus())
+
+
+def write_profile(args) -> None:
+    '''Stop profiling the run, if requested, and write its stats.
+
+
+    Parameters
+    ----------
+    args : Namespace
+        Namespace from `main`, with the prefix of the paths to write the
+        stats to in `profile`, see `profiling.Profile.write()`.
+    '''
+    if args.profile:
+        for path in profiling.stop(args.profile):
+            print(F" Profile written to {path}")
+
+
+def write_plans(args) -> None:
+    '''Export the plans of the runs, if requested.
+
+
+    Parameters
+    ----------
+    args : Namespace
+        Namespace from `main`, with the plans in `plans` and the path to
+        write them to in `plan_json`.
+    '''
+    if args.plan_json:
+        with open(args.plan_json, 'w') as f:
+            json.dump(args.plans, f, indent=2)
+
+
 def main() -> None:
     print("""\033[1;92m
                                           ..-::::::--.
@@ -251,17 +1285,58 @@ def main() -> None:
                         help='OAuth Token')
     parser.add_argument('--reversed', action='store_true', default=False,
                         help='Sort from oldest to newest')
+    parser.add_argument('--secondary', nargs='*', default=list(sorting.DEFAULT_SECONDARY_KEYS),
+                        choices=sorted(sorting.SECONDARY_KEYS),
+                        help='Keys to sort tracks of the same album by, before their names')
+    parser.add_argument('--unresolved', choices=sorting.UNRESOLVED_POSITIONS, default='last',
+                        help='Where to put tracks whose release date is unknown, '
+                             'like local files')
+    parser.add_argument('--no-cache', action='store_true', default=False,
+                        help='Do not use cached playlist tracks')
+    parser.add_argument('--http-cache', choices=('off', 'memory', 'disk'), default='memory',
+                        help='Where to keep responses to revalidate them with '
+                             'conditional requests')
+    parser.add_argument('-w', '--workers', type=int, default=8,
+                        help='Maximum number of concurrent requests')
+    parser.add_argument('--max-requests', type=int, default=None,
+                        help='Maximum number of requests to send overall')
+    parser.add_argument('--timeout', type=float, default=session.timeouts[1],
+                        help='Seconds to wait for a response of the API')
+    parser.add_argument('--connect-timeout', type=float, default=session.timeouts[0],
+                        help='Seconds to wait for a connection to the API')
+    parser.add_argument('--api-url', type=str, default=session.API_URL,
+                        help='Base URL of the Spotify Web API')
+    parser.add_argument('--metrics', type=str, default=None,
+                        help='Write request metrics to this JSON file at exit')
+    parser.add_argument('--metrics-prometheus', type=str, default=None,
+                        help='Write request metrics to this file at exit, '
+                             'in Prometheus text format')
+    parser.add_argument('-y', '--yes', action='store_true', default=False,
+                        help='Do not ask for confirmation')
+    parser.add_argument('--snapshot', type=str, default=None,
+                        help='Read the library and playlists to sort from this '
+                             'snapshot, see the export sub-command')
+    parser.add_argument('--plan', action='store_true', default=False,
+                        help='Only print the requests that would modify anything, '
+                             'and how long they would take')
+    parser.add_argument('--plan-json', type=str, default=None,
+                        help='Also write the plan to this JSON file. Implies --plan.')
+    parser.add_argument('--profile', type=str, default=None,
+                        help='Profile the run, writing the CPU stats and the peak memory '
+                             'of every phase to files starting with this path')
 
     subparsers = parser.add_subparsers(help='sub-command help', dest='command')
 
     # Subparser for library sorting
     parser_l = subparsers.add_parser('library', help='Sort user library')
 
-    parser_l.add_argument('--threshold', type=int, default=3,
-                          help='Maximum number of tracks to add at once')
-
     parser_l.add_argument('--backup', action='store_true', default=False,
                           help='Backup your library before sorting')
+    parser_l.add_argument('--resume', action='store_true', default=False,
+                          help='Resume an interrupted sort from its journal')
+    parser_l.add_argument('--journal', type=str, default=None,
+                          help='Path of the journal of the sort, '
+                               'in the cache directory by default')
 
     # Subparser for playlist sorting
     parser_p = subparsers.add_parser('playlist', help='Sort a playlist')
@@ -273,28 +1348,145 @@ def main() -> None:
     parser_p.add_argument('-d', '--description', type=str, default=None,
                           help='Description of the new playlist')
     parser_p.add_argument('--inplace', action='store_true', default=False,
-                          help='Sort playlist in-place.')
+                          help='Sort playlist in-place, moving only the tracks out of '
+                               'place.')
+    parser_p.add_argument('--incremental', action='store_true', default=False,
+                          help='Sort playlist in-place, only moving tracks '
+                               'added since the last sort. Implies --inplace.')
+    parser_p.add_argument('--all', action='store_true', default=False,
+                          help='Sort all playlists owned by the user')
+    parser_p.add_argument('--from-file', type=str, default=None,
+                          help='Sort the playlists listed in a file, one per line')
+    parser_p.add_argument('-j', '--jobs', type=int, default=4,
+                          help='Number of playlists to sort at the same time')
+    parser_p.add_argument('--dedupe', choices=sorted(sorting.DEDUPE_KEYS), default=None,
+                          help='Remove the tracks that are the same according to '
+                               'this field, reporting them')
+    parser_p.add_argument('--dedupe-policy', choices=sorting.DEDUPE_POLICIES,
+                          default='first', help='Which of the same tracks to keep: the '
+                          'first in the playlist or the earliest released')
+
+    # Subparser for watching
+    parser_w = subparsers.add_parser('watch', help='Keep playlists and the '
+                                     'library sorted as they change')
+
+    parser_w.add_argument('--library', action='store_true', default=False,
+                          help='Keep the library sorted. Default if no playlist is given.')
+    parser_w.add_argument('-p', '--playlist', type=str, action='append',
+                          dest='playlists', help='Playlist ID of a playlist to keep sorted')
+    parser_w.add_argument('--all', action='store_true', default=False,
+                          help='Keep all playlists owned by the user sorted')
+    parser_w.add_argument('--interval', type=float, default=60.,
+                          help='Seconds between polls of a target that changed')
+    parser_w.add_argument('--max-interval', type=float, default=900.,
+                          help='Maximum seconds between polls of an idle target')
+    parser_w.add_argument('--polls', type=int, default=None,
+                          help='Stop after this many polls')
+
+    # Subparser for merging
+    parser_m = subparsers.add_parser('merge', help='Merge playlists into a new '
+                                     'sorted playlist')
+
+    parser_m.add_argument('-p', '--playlist', type=str, action='append', required=True,
+                          dest='playlists', help='Playlist ID of a playlist to merge')
+    parser_m.add_argument('-n', '--name', type=str, default=None,
+                          help='Name of the new playlist with merged tracks')
+    parser_m.add_argument('-d', '--description', type=str, default='',
+                          help='Description of the new playlist')
+    parser_m.add_argument('--dedupe', choices=sorted(sorting.DEDUPE_KEYS), default='uri',
+                          help='Keep only the first of the tracks that are the same '
+                               'according to this field')
+    parser_m.add_argument('--keep-duplicates', action='store_const', const=None,
+                          dest='dedupe', help='Keep repeated tracks')
+    parser_m.add_argument('--presorted', action='store_true', default=False,
+                          help='The playlists already are sorted: read them a page '
+                               'at a time while merging')
+
+    # Subparser for views
+    parser_v = subparsers.add_parser('view', help='Fill a playlist with the tracks '
+                                     'released within a range of dates')
+
+    parser_v.add_argument('--from', type=str, default=None, dest='start',
+                          help='First release date, as YYYY, YYYY-MM or YYYY-MM-DD')
+    parser_v.add_argument('--to', type=str, default=None, dest='end',
+                          help='Last release date, included. No limit by default.')
+    parser_v.add_argument('--days', type=int, default=None,
+                          help='Take the tracks released in this many last days')
+    parser_v.add_argument('--library', action='store_true', default=False,
+                          help='Take tracks from the library. Default if no playlist is given.')
+    parser_v.add_argument('-p', '--playlist', type=str, action='append',
+                          dest='playlists', help='Playlist ID of a playlist to take tracks from')
+    parser_v.add_argument('-n', '--name', type=str, default=None,
+                          help='Name of the playlist to create or refresh')
+    parser_v.add_argument('-d', '--description', type=str, default='',
+                          help='Description of a new playlist')
+
+    # Subparser for snapshot export
+    parser_e = subparsers.add_parser('export', help='Export the library and '
+                                     'playlists to a snapshot file')
+
+    parser_e.add_argument('file', type=str,
+                          help='Path of the snapshot, compressed if it ends in .gz')
+    parser_e.add_argument('--library', action='store_true', default=False,
+                          help='Export the library. Default if no playlist is given.')
+    parser_e.add_argument('-p', '--playlist', type=str, action='append',
+                          dest='playlists', help='Playlist ID of a playlist to export')
+    parser_e.add_argument('--all-playlists', action='store_true', default=False,
+                          help='Export all playlists owned by the user')
+
+    # Subparser for snapshot import
+    parser_i = subparsers.add_parser('import', help='Restore the library and '
+                                     'playlists from a snapshot file')
+
+    parser_i.add_argument('file', type=str, help='Path of the snapshot')
 
     args = parser.parse_args()
+    args.plan = args.plan or bool(args.plan_json)
+    args.plans = []
 
+    if args.profile:
+        profiling.start()
 
+    failed = False
     try:
+        # Planning from a snapshot needs no API call at all.
+        offline = bool(args.snapshot) and args.plan \
+            and args.command in ('library', 'playlist', 'merge')
+
         # OAuth Token is required by almost every API call, so user can't omit it.
-        if not args.oauth:
+        if not args.oauth and not offline:
             print(' OAuth Token Missing.')
             while not args.oauth:
                 args.oauth = input('  > ').strip()
 
-        session.init(args.oauth)
+        session.init(args.oauth, max_workers=args.workers,
+                     max_requests=args.max_requests,
+                     pool_size=args.workers * getattr(args, 'jobs', 1),
+                     api_url=args.api_url,
+                     timeout=(args.connect_timeout, args.timeout))
+        cache.enabled = not args.no_cache
+        session.responses = None if args.http_cache == 'off' else \
+            httpcache.ResponseCache(disk=args.http_cache == 'disk')
 
-        current_user = users.get_current_user()
-        print((F"\n Welcome {current_user['display_name']} "
-               F"(ID: {current_user['id']})\n"))
+        if not offline:
+            current_user = args.user = users.get_current_user()
+            print((F"\n Welcome {current_user['display_name']} "
+                   F"(ID: {current_user['id']})\n"))
 
         if 'library' == args.command:
             do_library(args)
         elif 'playlist' == args.command:
             do_playlist(args)
+        elif 'watch' == args.command:
+            do_watch(args)
+        elif 'merge' == args.command:
+            do_merge(args)
+        elif 'view' == args.command:
+            do_view(args)
+        elif 'export' == args.command:
+            do_export(args)
+        elif 'import' == args.command:
+            do_import(args)
 
         print('\n All done :)')
 
@@ -311,6 +1503,34 @@ def main() -> None:
                                    |___/
         """ + '\033[0m')
 
+    except (session.BudgetExhausted, journal.Unfinished) as e:
+        failed = True
+        print(F"\n [!] {e}.")
+
+    except AssertionError as e:
+        # Requests the API refused, and playlists said to be sorted that are
+        # not, see `sorting.merge()`.
+        failed = True
+        print(F"\n [!] {e}")
+        if 'merge' == args.command and args.presorted:
+            print(F" Merge again without --presorted. The playlist {args.name} "
+                  F"may hold part of the tracks.")
+
+    finally:
+        write_metrics(args)
+        write_plans(args)
+        write_profile(args)
+
+        # However the library sort stopped, it must be finished before the
+        # library is sorted again.
+        journal_path = getattr(args, 'journal', None) or journal.default_path()
+        if 'library' == args.command and os.path.exists(journal_path):
+            print(' The library sort was interrupted: run `library --resume` '
+                  'to finish it.')
+
+    if failed:
+        sys.exit(1)
+
 
 if __name__ == '__main__':
     main()
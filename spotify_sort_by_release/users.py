@@ -15,7 +15,7 @@ def get_current_user() -> dict:
     dict
         The current user, as per the Spotify Web API documentation.
     '''
-    response = session.s.get('https://api.spotify.com/v1/me')
+    response = session.get(F"{session.API_URL}/me")
     assert response.status_code is requests.codes.OK, response.text
 
     return json.loads(response.text)
@@ -36,11 +36,31 @@ def get_user(user_id : str) -> dict:
     dict
         The user, as per the Spotify Web API documentation.
     '''
-    response = session.s.get(F"https://api.spotify.com/v1/users/{user_id}")
+    response = session.get(F"{session.API_URL}/users/{user_id}")
     assert response.status_code is requests.codes.OK, response.text
     return json.loads(response.text)
 
 
+# Asynchronous variants, for use within an event loop. They send requests
+# with `session.arequest()` and otherwise behave as their blocking versions.
+
+
+async def aget_current_user() -> dict:
+    '''Get Current User's Profile. See `get_current_user()`.'''
+    response = await session.aget(F"{session.API_URL}/me")
+    assert response.status_code is requests.codes.OK, response.text
+
+    return json.loads(response.text)
+
+
+async def aget_user(user_id : str) -> dict:
+    '''Get a User's Profile. See `get_user()`.'''
+    response = await session.aget(F"{session.API_URL}/users/{user_id}")
+    assert response.status_code is requests.codes.OK, response.text
+
+    return json.loads(response.text)
+
+
 if __name__ == '__main__':
     import argparse
     try:
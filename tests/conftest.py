@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+import pytest
+
+from spotify_sort_by_release import mockapi
+from spotify_sort_by_release import session
+
+
+@pytest.fixture
+def api(monkeypatch, tmp_path):
+    '''Serve a mock API with a library of 300 tracks and a playlist of 200,
+    and send requests to it, with an empty cache and no rate limit.'''
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    monkeypatch.setattr(session, 'API_URL', session.API_URL)
+    monkeypatch.setattr(session, 'limiter', session.RateLimiter(
+        rate=1000., max_rate=1000., burst=1000.))
+
+    mock = mockapi.MockSpotify(library_size=300, playlist_sizes=(200,))
+    session.init('mock-token', api_url=mock.start())
+    yield mock
+    mock.stop()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+import argparse
+
+import pytest
+
+from spotify_sort_by_release import journal
+from spotify_sort_by_release import library
+from spotify_sort_by_release import models
+from spotify_sort_by_release import sorting
+from spotify_sort_by_release.spotify_sort_by_release import sort_library_by_release
+
+
+class Interrupted(Exception):
+    pass
+
+
+def args(**options) -> argparse.Namespace:
+    # Arguments of a library sort, as given by `main`.
+    return argparse.Namespace(**{
+        'reversed': False, 'secondary': list(sorting.DEFAULT_SECONDARY_KEYS),
+        'unresolved': 'last', 'backup': False, 'yes': True, 'plan': False,
+        'snapshot': None, 'resume': False, 'journal': None, **options})
+
+
+def is_sorted(tracks : list) -> bool:
+    # The library lists the latest releases first.
+    return list(sorting.SortKeys(tracks).argsort(reverse=True)) == list(range(len(tracks)))
+
+
+def test_interrupted_sort_is_resumed_not_restarted(api, monkeypatch):
+    uris = {t.uri for t in library.get_tracks()}
+    save_tracks = library.save_tracks
+
+    def interrupted(*arguments, on_batch, **options):
+        # Stop right after the first batch is saved.
+        def record(batch):
+            on_batch(batch)
+            raise Interrupted()
+        save_tracks(*arguments, on_batch=record, **options)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(library, 'save_tracks', interrupted)
+        with pytest.raises(Interrupted):
+            sort_library_by_release(args())
+
+    # Tracks deleted and not saved back yet are only in the journal.
+    left = {t.uri for t in library.get_tracks()}
+    assert left < uris
+
+    with pytest.raises(journal.Unfinished):
+        sort_library_by_release(args())
+    assert {t.uri for t in library.get_tracks()} == left
+
+    sort_library_by_release(args(resume=True))
+    tracks = library.get_tracks()
+    assert {t.uri for t in tracks} == uris
+    assert is_sorted(tracks)
+
+    # Once finished, sorts start afresh.
+    sort_library_by_release(args())
+    assert library.get_tracks() == tracks
+
+
+def test_journal_is_never_replaced(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    tracks = [models.parse_track({'uri': 'spotify:track:a'})]
+
+    log = journal.Journal.create(path, tracks, ['2001-01-01T00:00:00Z'])
+    log.record('delete', 0)
+
+    with pytest.raises(journal.Unfinished):
+        journal.Journal.create(path, [], [])
+
+    resumed = journal.Journal.load(path)
+    assert resumed.tracks == tracks
+    assert resumed.done == {'delete': {0}, 'save': set()}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['journal.jsonl']
+
+
+def test_tracks_saved_at_the_same_time_keep_their_order(api):
+    tracks = library.get_tracks()[:60]
+    library.delete_tracks(tracks)
+
+    # Tracks without a URI, like the ones removed from the catalog, are left
+    # out.
+    saved = tracks[:30] + [models.parse_track(None)] + tracks[30:]
+    timestamps = ['2001-01-01T00:00:00Z'] * len(saved)
+    library.save_tracks(saved, timestamps=timestamps)
+
+    added = library.get_tracks(added_at=True)
+    assert [t for _, t in added[-60:]] == list(reversed(tracks))
+    assert added[-1][0] == library.parse_timestamp(timestamps[0])
+    assert added[-60][0] == added[-1][0] + 59
+
+    library.delete_tracks(saved)
+    assert len(library.get_tracks()) == 240
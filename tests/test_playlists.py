@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+import random
+
+import pytest
+
+from spotify_sort_by_release import cache
+from spotify_sort_by_release import models
+from spotify_sort_by_release import playlists
+from spotify_sort_by_release import reorder
+from spotify_sort_by_release import session
+from spotify_sort_by_release import sorting
+
+
+def api_tracks(count : int, start : int = 0) -> list:
+    # Tracks as the API returns them.
+    return [{'uri': F"spotify:track:{i}", 'name': F"Track {i}",
+             'album': {'name': 'Album', 'release_date': str(2000 + i)}}
+            for i in range(start, start + count)]
+
+
+@pytest.fixture
+def remote(monkeypatch, tmp_path):
+    '''Serve the tracks of a playlist from a list, recording which fields
+    and from which offset they were requested, with an empty cache.'''
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+
+    class Remote:
+        items = []
+        requested = []
+
+    def get_paged(url, limit, params=None, parse=None, offset=0):
+        Remote.requested.append((params['fields'], offset))
+        return [parse({'track': t}) for t in Remote.items[offset:]]
+
+    monkeypatch.setattr(session, 'get_paged', get_paged)
+    return Remote
+
+
+def playlist(snapshot_id : str, items : list) -> dict:
+    return {'id': 'playlist', 'snapshot_id': snapshot_id,
+            'tracks': {'total': len(items)}}
+
+
+def parsed(items : list) -> list:
+    return [models.parse_track(t) for t in items]
+
+
+URIS = 'total,items(track(uri))'
+
+TRACKS = F"total,items(track({models.TRACK_FIELDS}))"
+
+
+def test_appended_tracks_are_fetched_alone(remote):
+    cache.put_playlist_tracks('playlist', 'sorted', parsed(api_tracks(10)))
+    remote.items = api_tracks(13)
+
+    tracks = playlists.get_appended_playlist_tracks(playlist('appended', remote.items))
+
+    assert tracks == parsed(remote.items)
+    assert remote.requested == [(URIS, 0), (TRACKS, 10)]
+    assert cache.get_playlist_tracks('playlist', 'appended') == tracks
+
+
+def test_reordered_tracks_are_fetched_again(remote):
+    # The same tracks past the cached ones, but the cached ones moved.
+    cached = api_tracks(10)
+    cache.put_playlist_tracks('playlist', 'sorted', parsed(cached))
+    remote.items = [cached[1], cached[0]] + cached[2:] + api_tracks(3, start=10)
+
+    tracks = playlists.get_appended_playlist_tracks(playlist('reordered', remote.items))
+
+    assert tracks == parsed(remote.items)
+    assert remote.requested == [(URIS, 0), (TRACKS, 0)]
+
+
+def test_replaced_tracks_are_fetched_again(remote):
+    # As many tracks as cached, the last one replaced.
+    cache.put_playlist_tracks('playlist', 'sorted', parsed(api_tracks(10)))
+    remote.items = api_tracks(9) + api_tracks(1, start=20)
+
+    tracks = playlists.get_appended_playlist_tracks(playlist('replaced', remote.items))
+
+    assert tracks == parsed(remote.items)
+    assert remote.requested == [(URIS, 0), (TRACKS, 0)]
+
+
+def test_removed_tracks_are_fetched_again(remote):
+    cache.put_playlist_tracks('playlist', 'sorted', parsed(api_tracks(10)))
+    remote.items = api_tracks(8)
+
+    tracks = playlists.get_appended_playlist_tracks(playlist('removed', remote.items))
+
+    assert tracks == parsed(remote.items)
+    assert remote.requested == [(TRACKS, 0)]
+
+
+def test_cached_snapshot_is_reused(remote):
+    remote.items = api_tracks(10)
+    cache.put_playlist_tracks('playlist', 'sorted', parsed(remote.items))
+
+    tracks = playlists.get_appended_playlist_tracks(playlist('sorted', remote.items))
+
+    assert tracks == parsed(remote.items)
+    assert remote.requested == []
+
+
+def test_uncached_playlist_is_fetched(remote):
+    remote.items = api_tracks(10)
+
+    tracks = playlists.get_appended_playlist_tracks(playlist('new', remote.items))
+
+    assert tracks == parsed(remote.items)
+    assert remote.requested == [(TRACKS, 0)]
+
+
+def test_duplicates_are_deleted_around_removed_tracks(api):
+    playlist_id = next(iter(api.playlists))
+    items = api.playlists[playlist_id]['items']
+    # Tracks removed from the catalog, and tracks repeated, the first one
+    # right after a removed track.
+    for position in (3, 10, 11):
+        items[position][1] = None
+    for position, repeated in ((12, 4), (20, 4), (30, 11)):
+        items[position][1] = items[repeated][1]
+    uris = [uri for _, uri in items]
+
+    tracks = playlists.get_playlist_tracks(playlist_id)
+    duplicates = sorting.find_duplicates(tracks)
+    assert duplicates == {12: 4, 20: 4}
+
+    with pytest.raises(AssertionError):
+        playlists.delete_positions(playlist_id, tracks, [10, *duplicates])
+    assert [uri for _, uri in items] == uris
+
+    playlists.delete_positions(playlist_id, tracks, list(duplicates))
+    assert [uri for _, uri in api.playlists[playlist_id]['items']] == \
+        [uri for i, uri in enumerate(uris) if i not in duplicates]
+
+
+def test_mock_moves_tracks_as_the_api(api):
+    playlist_id = next(iter(api.playlists))
+    uris = [uri for _, uri in api.playlists[playlist_id]['items']]
+    rng = random.Random(0)
+
+    moves = []
+    while len(moves) < 50:
+        range_start = rng.randrange(len(uris))
+        range_length = rng.randrange(1, len(uris) - range_start + 1)
+        insert_before = rng.randrange(len(uris) + 1)
+        if not range_start < insert_before < range_start + range_length:
+            moves.append((range_start, range_length, insert_before))
+    playlists.move_tracks(playlist_id, moves)
+
+    assert [uri for _, uri in api.playlists[playlist_id]['items']] == \
+        reorder.apply_moves(uris, moves)
+
+    # Tracks cannot be inserted within themselves.
+    with pytest.raises(AssertionError):
+        playlists.reorder_tracks(playlist_id, 10, 12, range_length=5)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+import concurrent.futures
+import threading
+
+from spotify_sort_by_release import profiling
+
+
+def busy(count : int) -> int:
+    return sum(range(count))
+
+
+def profile_pool(prefix : str) -> list:
+    # Profile work done by a thread pool, and return its results.
+    profiling.start()
+    try:
+        profiling.mark('sort')
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(busy, [10 ** 5] * 8))
+    finally:
+        paths = profiling.stop(prefix)
+
+    assert paths == [F"{prefix}.pstats", F"{prefix}.txt", F"{prefix}.memory.txt"]
+    return results
+
+
+def test_thread_pools_are_profiled(tmp_path):
+    prefix = str(tmp_path / 'run')
+
+    assert profile_pool(prefix) == [busy(10 ** 5)] * 8
+    with open(F"{prefix}.txt") as f:
+        assert 'busy' in f.read()
+    with open(F"{prefix}.memory.txt") as f:
+        assert 'sort' in f.read()
+
+
+def test_threads_run_when_they_cannot_be_profiled(tmp_path, monkeypatch):
+    # As when a profiler is already active for all the threads, e.g. since
+    # Python 3.12.
+    class Profile(profiling.cProfile.Profile):
+        def enable(self, *args, **kwargs):
+            if threading.current_thread() is not threading.main_thread():
+                raise ValueError('Another profiling tool is already active')
+            super().enable(*args, **kwargs)
+
+    monkeypatch.setattr(profiling.cProfile, 'Profile', Profile)
+
+    assert profile_pool(str(tmp_path / 'run')) == [busy(10 ** 5)] * 8
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+import itertools
+import random
+
+import pytest
+
+from spotify_sort_by_release import reorder
+
+
+def test_longest_increasing_subsequence():
+    for sequence in itertools.permutations(range(6)):
+        positions = sorted(reorder.longest_increasing_subsequence(sequence))
+        items = [sequence[i] for i in positions]
+
+        assert items == sorted(items)
+        assert len(positions) == max(
+            len(subsequence)
+            for length in range(len(sequence) + 1)
+            for subsequence in itertools.combinations(sequence, length)
+            if list(subsequence) == sorted(subsequence))
+
+
+def test_apply_moves_as_the_api():
+    items = ['a', 'b', 'c', 'd', 'e']
+
+    # Examples of the "Reorder a Playlist's Items" endpoint.
+    assert reorder.apply_moves(items, [(0, 1, 3)]) == ['b', 'c', 'a', 'd', 'e']
+    assert reorder.apply_moves(items, [(3, 2, 0)]) == ['d', 'e', 'a', 'b', 'c']
+    assert reorder.apply_moves(items, [(1, 2, 5)]) == ['a', 'd', 'e', 'b', 'c']
+    assert items == ['a', 'b', 'c', 'd', 'e']
+
+
+@pytest.mark.parametrize('length', range(8))
+def test_plan_moves_sorts_every_permutation(length):
+    for ranks in itertools.permutations(range(length)):
+        moves = reorder.plan_moves(list(ranks))
+
+        assert reorder.apply_moves(ranks, moves) == list(range(length))
+        assert len(moves) <= length - len(reorder.longest_increasing_subsequence(ranks))
+
+
+@pytest.mark.parametrize('length', [50, 500])
+def test_plan_moves_round_trip(length):
+    rng = random.Random(length)
+    for _ in range(20):
+        ranks = list(range(length))
+        rng.shuffle(ranks)
+
+        assert reorder.apply_moves(ranks, reorder.plan_moves(ranks)) == sorted(ranks)
+
+
+def test_plan_moves_moves_ranges():
+    assert reorder.plan_moves(list(range(10))) == []
+    assert reorder.plan_moves([3, 4, 5, 0, 1, 2]) == [(0, 3, 6)]
+    assert len(reorder.plan_moves(list(reversed(range(10))))) == 9
+
+
+def test_match_ranks_with_repeated_items():
+    current = ['a', 'b', 'a', 'c', 'b']
+    target = ['b', 'a', 'c', 'a', 'b']
+
+    ranks = reorder.match_ranks(current, target)
+    assert ranks == [1, 0, 3, 2, 4]
+    assert reorder.apply_moves(current, reorder.plan_moves(ranks)) == target
+
+    with pytest.raises(AssertionError):
+        reorder.match_ranks(['a', 'b'], ['a', 'c'])
+
+
+def test_sorted_prefix_length():
+    assert reorder.sorted_prefix_length([]) == 0
+    assert reorder.sorted_prefix_length([1, 2, 2, 5, 3, 6]) == 4
+    assert reorder.sorted_prefix_length([5, 3, 3, 4], reverse=True) == 3
+
+
+@pytest.mark.parametrize('reverse', [False, True])
+def test_plan_insertions_matches_a_full_sort(reverse):
+    rng = random.Random(reverse)
+    for _ in range(200):
+        prefix = sorted((rng.randrange(10) for _ in range(rng.randrange(30))),
+                        reverse=reverse)
+        keys = prefix + [rng.randrange(10) for _ in range(rng.randrange(10))]
+
+        moves = reorder.plan_insertions(keys, reverse)
+        # A stable sort keeps tracks with equal keys in their current order.
+        assert reorder.apply_moves(range(len(keys)), moves) == \
+            sorted(range(len(keys)), key=keys.__getitem__, reverse=reverse)
+        assert len(moves) <= len(keys) - len(prefix)
+
+
+def test_plan_resaves_orders_by_time():
+    rng = random.Random(0)
+    for _ in range(200):
+        length = rng.randrange(1, 40)
+        ranks = list(range(length))
+        rng.shuffle(ranks)
+        # Tracks saved close together leave little room between them.
+        times = list(itertools.accumulate(rng.randrange(1, 4) for _ in range(length)))
+        now = times[-1] + rng.randrange(3)
+
+        positions, resave_times = reorder.plan_resaves(ranks, times, now, spacing=60)
+
+        time_by_rank = dict(zip(ranks, times))
+        time_by_rank.update(zip(positions, resave_times))
+        ordered = [time_by_rank[rank] for rank in range(length)]
+
+        assert positions == sorted(set(positions))
+        assert ordered == sorted(set(ordered))
+        assert max(resave_times, default=now) <= now
+        assert len(positions) >= length - len(reorder.longest_increasing_subsequence(ranks))
+
+
+def test_plan_resaves_leaves_sorted_items():
+    assert reorder.plan_resaves([0, 1, 2], [10, 20, 30], 40) == ([], [])
+    # The track saved first must come second, so it is saved again between
+    # the other two.
+    assert reorder.plan_resaves([1, 0, 2], [10, 20, 30], 40, spacing=5) == ([1], [25])
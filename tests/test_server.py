@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+import time
+
+import pytest
+
+from spotify_sort_by_release import server
+from spotify_sort_by_release import session
+from spotify_sort_by_release import users
+
+
+def wait(jobs : server.JobServer, job : dict) -> dict:
+    # The status of a job once it is finished, and its tenant released.
+    while jobs.status(job['id'])['finished_at'] is None:
+        time.sleep(.01)
+    return jobs.status(job['id'])
+
+
+def test_budget_of_a_token_is_renewed(api):
+    tenant = session.Tenant('mock-token', max_requests=2, period=3600.)
+
+    with session.use(tenant):
+        users.get_current_user()
+        users.get_current_user()
+        with pytest.raises(session.BudgetExhausted):
+            users.get_current_user()
+
+        # The next period.
+        tenant.period_started -= 3600.
+        users.get_current_user()
+
+    assert tenant.requests_sent == 3
+    tenant.close()
+
+
+def test_idle_tokens_are_forgotten(api):
+    playlist = next(iter(api.playlists))
+    jobs = server.JobServer(workers=1, budget_period=None, idle_seconds=3600.)
+    jobs.start()
+    try:
+        job = wait(jobs, jobs.submit('mock-token', 'playlist', {'playlist': playlist}))
+        assert job['status'] == 'done', job['error']
+        assert list(jobs.tenants) == ['mock-token']
+
+        # Past the idle time, the session is closed after the next job.
+        jobs.idle_seconds = 0
+        wait(jobs, jobs.submit('other-token', 'playlist', {'playlist': playlist}))
+        assert jobs.tenants == {}
+        assert jobs.stats()['tokens'] == 0
+    finally:
+        jobs.stop()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+import email.utils
+import time
+
+import pytest
+import requests
+
+from spotify_sort_by_release import metrics
+from spotify_sort_by_release import session
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    '''A fresh rate limiter, and metrics, for the requests of a test.'''
+    monkeypatch.setattr(session, 'stats', metrics.RequestMetrics())
+    monkeypatch.setattr(session, 'limiter', session.RateLimiter(rate=10.))
+    return session.limiter
+
+
+def response(status : int, **headers) -> requests.Response:
+    # An empty response of the API.
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers)
+    response._content = b''
+    return response
+
+
+def outcome(response : requests.Response, attempt : int = 1,
+            idempotent : bool = True) -> float:
+    # Seconds to wait before trying a request again, after this response.
+    return session._outcome('GET /me', attempt, idempotent, time.perf_counter(),
+                            0, response=response)
+
+
+def test_retry_after_in_seconds_or_as_a_date(limiter):
+    assert outcome(response(429, **{'Retry-After': '2'})) == 0.
+    assert 1.5 < limiter._take() <= 2.
+
+    date = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert outcome(response(429, **{'Retry-After': date})) == 0.
+    assert 25. < limiter._take() <= 30.
+
+
+def test_unreadable_retry_after_backs_off(limiter, monkeypatch):
+    monkeypatch.setattr(session.random, 'uniform', lambda low, high: high)
+
+    assert outcome(response(429, **{'Retry-After': 'soon'})) == 1.
+    assert limiter.rate == 5.
+
+
+def test_server_errors_are_no_success(limiter):
+    # Given up on, or not to be repeated.
+    assert outcome(response(503), attempt=session.max_attempts) is None
+    assert outcome(response(503), idempotent=False) is None
+    assert limiter.rate == 10.
+
+    assert outcome(response(200)) is None
+    assert limiter.rate == 11.
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+import random
+
+import pytest
+
+from spotify_sort_by_release import models
+from spotify_sort_by_release import reorder
+from spotify_sort_by_release import sorting
+
+
+def track(uri : str, release_date : str = '', album : str = 'Album',
+          name : str = 'Track', track_number : int = 1) -> models.Track:
+    # A track as the API would return it, with an unknown release date if
+    # none is given.
+    return models.parse_track({
+        'uri': uri, 'name': name, 'track_number': track_number,
+        'album': {'name': album, 'release_date': release_date}})
+
+
+def random_tracks(rng : random.Random, count : int) -> list:
+    # Tracks released on a few dates, some of them unknown, so that many
+    # tracks have the same date.
+    dates = ['', '1999', '2001-05', '2001-05-20', '2001-06-01', '2010']
+    return [track(F"spotify:track:{rng.randrange(10 ** 6)}", rng.choice(dates),
+                  album=rng.choice('ab'), track_number=rng.randrange(1, 4))
+            for _ in range(count)]
+
+
+def test_release_date_ordinal():
+    assert sorting.release_date_ordinal('', 'day') == 0
+    assert sorting.release_date_ordinal('2001', 'year') == 20010000
+    assert sorting.release_date_ordinal('2001-05', 'month') == 20010500
+    assert sorting.release_date_ordinal('2001-05-20', 'day') == 20010520
+    # Parts beyond the precision are ignored.
+    assert sorting.release_date_ordinal('2001-05-20', 'year') == 20010000
+
+
+def test_sort_key_breaks_ties():
+    first = track('spotify:track:1', '2001', track_number=1, name='Z')
+    second = track('spotify:track:2', '2001', track_number=2, name='A')
+
+    assert sorting.sort_key(first) < sorting.sort_key(second)
+    assert sorting.sort_key(first, secondary=()) > sorting.sort_key(second, secondary=())
+
+
+@pytest.mark.parametrize('reverse', [False, True])
+@pytest.mark.parametrize('unresolved', sorting.UNRESOLVED_POSITIONS)
+def test_argsort(reverse, unresolved):
+    tracks = random_tracks(random.Random(0), 100)
+    keys = sorting.SortKeys(tracks)
+    order = list(keys.argsort(reverse, unresolved))
+
+    resolved = [i for i in order if tracks[i].release_date]
+    unknown = [i for i in order if not tracks[i].release_date]
+
+    # Unresolved tracks are kept together, in their current order.
+    assert order == (unknown + resolved if unresolved == 'first' else resolved + unknown)
+    assert unknown == sorted(unknown)
+    assert resolved == sorted(resolved, key=keys.__getitem__, reverse=reverse)
+    assert sorting.ranks(order) == reorder.match_ranks(range(len(order)), order)
+
+
+@pytest.mark.parametrize('reverse', [False, True])
+@pytest.mark.parametrize('unresolved', sorting.UNRESOLVED_POSITIONS)
+def test_insertions_match_argsort(reverse, unresolved):
+    rng = random.Random(1)
+    for _ in range(50):
+        # A sorted playlist, and then tracks appended to it.
+        tracks = random_tracks(rng, rng.randrange(40))
+        tracks = [tracks[i] for i in sorting.SortKeys(tracks).argsort(reverse, unresolved)]
+        tracks += random_tracks(rng, rng.randrange(10))
+
+        keys = sorting.SortKeys(tracks)
+        moves = reorder.plan_insertions(keys.placed(reverse, unresolved), reverse)
+
+        assert reorder.apply_moves(range(len(tracks)), moves) == \
+            list(keys.argsort(reverse, unresolved))
+
+
+@pytest.mark.parametrize('reverse', [False, True])
+def test_merge(reverse):
+    rng = random.Random(2)
+    sources = [random_tracks(rng, rng.randrange(30)) for _ in range(4)]
+    tracks = [t for source in sources for t in source]
+    expected = [tracks[i] for i in sorting.SortKeys(tracks).argsort(reverse)]
+
+    assert list(sorting.merge(sources, reverse=reverse)) == expected
+
+    presorted = [[source[i] for i in sorting.SortKeys(source).argsort(reverse)]
+                 for source in sources]
+    merged = list(sorting.merge(presorted, reverse=reverse, presorted=True))
+    assert [sorting.sort_key(t) for t in merged if t.release_date] == \
+        [sorting.sort_key(t) for t in expected if t.release_date]
+    assert sorted(merged) == sorted(expected)
+
+
+def test_merge_dedupe():
+    a = track('spotify:track:a', '2001')
+    b = track('spotify:track:b', '1999')
+
+    assert list(sorting.merge([[a, b], [b, a]], dedupe='uri')) == [b, a]
+    assert list(sorting.merge([[a, b], [b, a]])) == [b, b, a, a]
+
+
+def test_merge_checks_presorted_sources():
+    unsorted = [track('spotify:track:a', '2001'), track('spotify:track:b', '1999')]
+
+    with pytest.raises(AssertionError):
+        list(sorting.merge([unsorted], presorted=True))
+    with pytest.raises(AssertionError):
+        list(sorting.merge([], presorted=True, unresolved='first'))
+
+
+def test_find_duplicates():
+    tracks = [track('spotify:track:a', '2001'),
+              track('spotify:track:b', '1999'),
+              track('spotify:track:a', '2001'),
+              track(None),
+              track(None),
+              track('spotify:track:a', '2001')]
+
+    assert sorting.find_duplicates(tracks) == {2: 0, 5: 0}
+    assert sorting.find_duplicates(tracks[:2]) == {}
+
+
+def test_find_duplicates_by_isrc():
+    single = models.parse_track({'uri': 'spotify:track:single',
+                                 'external_ids': {'isrc': 'X1'},
+                                 'album': {'release_date': '2001-05-20'}})
+    album = models.parse_track({'uri': 'spotify:track:album',
+                                'external_ids': {'isrc': 'X1'},
+                                'album': {'release_date': '2001-05'}})
+    unknown = models.parse_track({'uri': 'spotify:track:unknown',
+                                  'external_ids': {'isrc': 'X1'}})
+    tracks = [unknown, single, album]
+
+    assert sorting.find_duplicates(tracks, 'uri') == {}
+    assert sorting.find_duplicates(tracks, 'isrc') == {1: 0, 2: 0}
+    # Unknown release dates come last, equal ones keep the first track.
+    assert sorting.find_duplicates(tracks, 'isrc', 'earliest') == {0: 2, 1: 2}
+    assert sorting.find_duplicates([single, single], 'isrc', 'earliest') == {1: 0}
+
+    with pytest.raises(AssertionError):
+        sorting.find_duplicates(tracks, 'isrc', 'latest')